@@ -0,0 +1,1275 @@
+import os
+import sys
+import time
+import threading
+import random
+import math
+import statistics
+import tempfile
+from types import SimpleNamespace
+from mapper_module import AppConfig, InterceptionBridge, MapperEventDispatcher, KeyMapper, TouchEvent
+from mapper_module.utils import (
+    KEYBOARD_DEVICE, MOUSE_DEVICE, SINK_NULL, SINK_RECORDING, SHORT_DELAY, MAIN_HEARTBEAT_TIMEOUT, CIRCLE, RECT, CACHE_FOLDER,
+    DOWN, UP, PRESSED, SCANCODES, LEFT_BUTTON_DOWN, LEFT_BUTTON_UP, RIGHT_BUTTON_DOWN, RIGHT_BUTTON_UP,
+    MIDDLE_BUTTON_DOWN, MIDDLE_BUTTON_UP, is_in_circle, is_in_rect, stop_process, precise_sleep_until
+)
+from mapper_module.layout import CompiledLayout
+from mapper_module.scheduler import TimerWheel
+from mapper_module.shaper import MotionShaper
+from mapper_module.sinks import RecordingSink, STROKE_KEY, STROKE_MOVE_REL, STROKE_MOVE_ABS, read_recording
+from mapper_module.zone_index import ZoneGrid, zone_bounds, load_zone_raster, raster_shape, RASTER_VERSION
+from mapper_module.wasd_mapper import WASDMapper, State, SECTOR_STATES, SPRINT_OFFSET, octant, sector_windows, build_transitions
+from mapper_module.motion import OneEuroFilter, compile_accel_curve, piecewise_gain, ACCEL_SPEED_WINDOW
+from mapper_module.mouse_mapper import MouseMapper
+from mapper_module.pipeline import compile_pipeline
+from mapper_module.rates import RatePolicy, ROLE_WASD
+from mapper_module.telemetry import (
+    BridgeTelemetry, K_ENQUEUED, M_ENQUEUED, BUTTON_LATENCY, KEY_LATENCY, MOVE_LATENCY, MOVES_DROPPED
+)
+
+# Virtual-clock runs are exact up to float rounding of the scripted times
+VIRTUAL_TOLERANCE_MS = 0.01
+# Correctness checks that failed in this run (the script exits non-zero if any did)
+FAILURES = []
+
+
+def check(passed:bool, what:str):
+    """Records a failed correctness check; benchmarks keep running so the report stays complete."""
+    if not passed:
+        FAILURES.append(what)
+        print(f"        [FAIL] {what}")
+    return passed
+
+
+def windowed_jitter(records, window=0.004):
+    """Returns (mean motion per window, coefficient of variation) of recorded relative motion in fixed windows."""
+    moves = [(t / 1e9, dx, dy) for t, kind, dx, dy in records if kind == STROKE_MOVE_REL]
+    if not moves:
+        return 0.0, 0.0
+    start = moves[0][0]
+    bins = [0.0] * (int((moves[-1][0] - start) / window) + 1)
+    for t, dx, dy in moves:
+        bins[int((t - start) / window)] += (dx*dx + dy*dy) ** 0.5
+
+    mean = statistics.fmean(bins)
+    return mean, (statistics.pstdev(bins) / mean if mean else 0.0)
+
+
+def jittered_touch_stream(duration=2.0, velocity=(1800.0, 600.0), seed=7):
+    """
+    Integer deltas of a steady swipe sampled at 120-250Hz: (arrival time, dx, dy, sample time).
+    Transport delay varies per sample, so arrivals bunch up the way ADB delivers them.
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    last_arrival = 0.0
+    acc_x = acc_y = 0.0
+    samples = []
+    while t < duration:
+        gap = rng.uniform(1 / 250, 1 / 120)
+        t += gap
+        acc_x += velocity[0] * gap
+        acc_y += velocity[1] * gap
+        dx, dy = int(acc_x), int(acc_y)
+        acc_x -= dx
+        acc_y -= dy
+        last_arrival = max(last_arrival, t + rng.uniform(0.0, 0.012))
+        samples.append((last_arrival, dx, dy, t))
+    return samples
+
+
+def bench_shaper(output_hz=1000, latency_ms=8.0):
+    samples = jittered_touch_stream()
+    clock = [0.0]
+    virtual_ns = lambda: int(clock[0] * 1e9)
+
+    # Direct path: each delta is injected as it arrives
+    direct = RecordingSink(MOUSE_DEVICE, clock=virtual_ns)
+    for t, dx, dy, _ in samples:
+        clock[0] = t
+        direct.move_rel(dx, dy)
+
+    # Shaped path: the worker clock drives injection, inputs are pushed as they arrive
+    shaped = RecordingSink(MOUSE_DEVICE, clock=virtual_ns)
+    shaper = MotionShaper(output_hz, latency_ms)
+    end = samples[-1][0] + latency_ms / 1000 + shaper.tick_interval
+    clock[0] = 0.0
+    i = 0
+    while clock[0] < end:
+        while i < len(samples) and samples[i][0] <= clock[0]:
+            shaper.push(samples[i][1], samples[i][2], samples[i][0])
+            i += 1
+        dx, dy = shaper.tick()
+        if dx or dy:
+            shaped.move_rel(dx, dy)
+        clock[0] += shaper.tick_interval
+
+    total_in = (sum(s[1] for s in samples), sum(s[2] for s in samples))
+    total_out = (sum(r[2] for r in shaped.records), sum(r[3] for r in shaped.records))
+
+    print(f"[Bench] Mouse shaper @ {output_hz}Hz, budget {latency_ms}ms ({len(samples)} input samples)")
+    for label, sink in (("direct", direct), ("shaped", shaped)):
+        per_window, cv = windowed_jitter(sink.records)
+        print(f"        {label:<7} strokes: {len(sink.records):>5} | motion/4ms: {per_window:6.2f}px | jitter (CV): {cv:6.3f}")
+    print(f"        Total motion in: {total_in} | out: {total_out}")
+    # Whatever the clock hasn't sent yet is still owed, not lost
+    rest = shaper.flush()
+    check((total_out[0] + rest[0], total_out[1] + rest[1]) == total_in, f"shaper: motion out {total_out} + pending {rest} != in {total_in}")
+
+
+def bench_bridge_throughput(strokes=20000):
+    """Pushes key strokes through the real bridge and keyboard worker into the null sink."""
+    config = AppConfig(MapperEventDispatcher())
+    bridge = InterceptionBridge(config, sink=SINK_NULL)
+    time.sleep(SHORT_DELAY) # Let the workers come up
+
+    start = time.perf_counter()
+    for i in range(strokes // 2):
+        code = 0x10 + (i % 16)
+        bridge.key_down(code)
+        bridge.key_up(code)
+    enqueued = time.perf_counter()
+    while not bridge.k_queue.empty():
+        time.sleep(0.001)
+    drained = time.perf_counter()
+
+    print(f"[Bench] Bridge -> null sink: {strokes} key strokes")
+    print(f"        Enqueue: {strokes / (enqueued - start):>10.0f} strokes/s | End-to-end: {strokes / (drained - start):>10.0f} strokes/s")
+    bridge.running = False
+    stop_process(bridge.k_proc)
+    stop_process(bridge.m_proc)
+
+
+def bench_click_latency(clicks=40, move_hz=5000):
+    """Click-to-inject latency with and without a flood of relative moves competing for the mouse worker."""
+    config = AppConfig(MapperEventDispatcher())
+    bridge = InterceptionBridge(config, sink=SINK_NULL)
+    time.sleep(SHORT_DELAY) # Let the workers come up
+
+    print(f"[Bench] Click-to-inject latency ({clicks} clicks, null sink)")
+    for label, flood in (("idle", False), (f"{move_hz}Hz moves", True)):
+        flooding = flood
+        def flood_moves():
+            while flooding:
+                bridge.mouse_move_rel(1, 0)
+                time.sleep(1 / move_hz)
+
+        if flood:
+            threading.Thread(target=flood_moves, daemon=True).start()
+            time.sleep(0.2) # Let the motion queue fill
+
+        before = bridge.telemetry.snapshot()
+        for _ in range(clicks):
+            bridge.left_click_down()
+            time.sleep(0.05)
+            bridge.left_click_up()
+            time.sleep(0.02)
+        time.sleep(0.1)
+        flooding = False
+
+        window = BridgeTelemetry.diff(bridge.telemetry.snapshot(), before)
+        avg = BridgeTelemetry.mean_ms(window, BUTTON_LATENCY)
+        p99 = BridgeTelemetry.percentile_ms(window, BUTTON_LATENCY, 0.99)
+        move_p99 = BridgeTelemetry.percentile_ms(window, MOVE_LATENCY, 0.99)
+        print(f"        {label:<15} click avg: {avg:6.2f}ms | click p99 <= {p99:6.2f}ms | move p99 <= {move_p99:6.2f}ms | dropped moves: {int(window[MOVES_DROPPED])}")
+
+    bridge.running = False
+    stop_process(bridge.k_proc)
+    stop_process(bridge.m_proc)
+
+
+def random_layout(count, seed=11):
+    """Zone dicts shaped like JSONLoader output: HUD-sized circles and rectangles in normalized space."""
+    rng = random.Random(seed)
+    zones = []
+    for i in range(count):
+        if i % 2:
+            r = rng.uniform(0.015, 0.05)
+            zones.append({'type': CIRCLE, 'cx': rng.random(), 'cy': rng.random(), 'r': r})
+        else:
+            x1, y1 = rng.random(), rng.random()
+            zones.append({'type': RECT, 'x1': x1, 'y1': y1,
+                          'x2': x1 + rng.uniform(0.02, 0.08), 'y2': y1 + rng.uniform(0.02, 0.08)})
+    return zones
+
+
+def zone_hit(value, nx, ny):
+    if value['type'] == CIRCLE:
+        return is_in_circle(nx, ny, value['cx'], value['cy'], value['r'])
+    return is_in_rect(nx, ny, value['x1'], value['x2'], value['y1'], value['y2'])
+
+
+def bench_zone_grid(touches=20000):
+    rng = random.Random(3)
+    points = [(rng.random(), rng.random()) for _ in range(touches)]
+
+    print(f"[Bench] Touch-down hit testing ({touches} touches)")
+    for count in (10, 100, 1000):
+        zones = random_layout(count)
+        grid = ZoneGrid([zone_bounds(z) for z in zones])
+
+        start = time.perf_counter()
+        linear_hits = [[i for i, z in enumerate(zones) if zone_hit(z, nx, ny)] for nx, ny in points]
+        linear = time.perf_counter() - start
+
+        start = time.perf_counter()
+        grid_hits = [[i for i in grid.candidates(nx, ny) if zone_hit(zones[i], nx, ny)] for nx, ny in points]
+        indexed = time.perf_counter() - start
+
+        status = "identical" if grid_hits == linear_hits else "MISMATCH"
+        print(f"        {count:>5} zones | linear: {linear / touches * 1e6:8.2f}us | "
+              f"grid {grid.cells}x{grid.cells}: {indexed / touches * 1e6:6.2f}us | hits {status}")
+        check(grid_hits == linear_hits, f"zone_grid ({count} zones): grid hits differ from linear scan")
+
+
+def zone_edge_points(zones, per_zone=16, seed=5):
+    """Points on, just inside and just outside every zone outline (including rect corners)."""
+    rng = random.Random(seed)
+    points = []
+    for z in zones:
+        if z['type'] == CIRCLE:
+            outline = [(z['cx'] + z['r'] * math.cos(a), z['cy'] + z['r'] * math.sin(a))
+                       for a in (rng.uniform(0, 2 * math.pi) for _ in range(per_zone))]
+        else:
+            outline = [(x, y) for x in (z['x1'], z['x2']) for y in (z['y1'], z['y2'])]
+            outline += [(rng.uniform(z['x1'], z['x2']), rng.choice((z['y1'], z['y2']))) for _ in range(per_zone // 2)]
+            outline += [(rng.choice((z['x1'], z['x2'])), rng.uniform(z['y1'], z['y2'])) for _ in range(per_zone // 2)]
+        for x, y in outline:
+            for offset in (0.0, 1e-12, -1e-12, 1e-7, -1e-7):
+                points.append((x + offset, y + offset))
+    return points
+
+
+def bench_zone_raster(touches=20000, width=2400, height=1080, downsample=4):
+    """Zone raster accuracy at zone edges against is_in_circle/is_in_rect, lookup cost and cache reloads."""
+    rng = random.Random(3)
+    points = [(rng.random(), rng.random()) for _ in range(touches)]
+    rows, cols = raster_shape(width, height, downsample)
+
+    print(f"[Bench] Zone raster {cols}x{rows} ({width}x{height} / {downsample})")
+    for count in (10, 100, 1000):
+        zones = random_layout(count)
+        grid = ZoneGrid([zone_bounds(z) for z in zones])
+        digest = f"benchmark{count}"
+
+        start = time.perf_counter()
+        raster = load_zone_raster(zones, grid, digest, width, height, downsample)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        raster = load_zone_raster(zones, grid, digest, width, height, downsample)
+        mapped = time.perf_counter() - start
+
+        def raster_hits(nx, ny):
+            return [i for i, needs_test in raster.lookup(nx, ny) if not needs_test or zone_hit(zones[i], nx, ny)]
+
+        edges = zone_edge_points(zones)
+        mismatches = sum(
+            raster_hits(nx, ny) != [i for i, z in enumerate(zones) if zone_hit(z, nx, ny)]
+            for nx, ny in edges
+        )
+
+        start = time.perf_counter()
+        for nx, ny in points:
+            [i for i in grid.candidates(nx, ny) if zone_hit(zones[i], nx, ny)]
+        gridded = time.perf_counter() - start
+        start = time.perf_counter()
+        tests = 0
+        for nx, ny in points:
+            entries = raster.lookup(nx, ny)
+            tests += sum(needs_test for _, needs_test in entries)
+            [i for i, needs_test in entries if not needs_test or zone_hit(zones[i], nx, ny)]
+        rastered = time.perf_counter() - start
+
+        print(f"        {count:>5} zones | build: {built * 1000:7.1f}ms | cached: {mapped * 1000:5.1f}ms | "
+              f"grid: {gridded / touches * 1e6:5.2f}us | raster: {rastered / touches * 1e6:5.2f}us "
+              f"({tests / touches:.2f} exact tests/touch) | edge mismatches: {mismatches}/{len(edges)}")
+        check(mismatches == 0, f"zone_raster ({count} zones): {mismatches} edge mismatches")
+
+        del raster
+        for ext in (".npy", ".json"):
+            path = os.path.join(CACHE_FOLDER, f"zones_v{RASTER_VERSION}_{digest}_{cols}x{rows}{ext}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class RecordingBridge:
+    """Bridge stand-in that writes key and button strokes straight into a RecordingSink."""
+    def __init__(self, sink:RecordingSink):
+        self.sink = sink
+
+    def key_down(self, code): self.sink.key(code, 0)
+    def key_up(self, code): self.sink.key(code, 1)
+    def send_keys(self, strokes):
+        for code, state in strokes: self.sink.key(code, state)
+    def left_click_down(self): self.sink.button(LEFT_BUTTON_DOWN)
+    def left_click_up(self): self.sink.button(LEFT_BUTTON_UP)
+    def right_click_down(self): self.sink.button(RIGHT_BUTTON_DOWN)
+    def right_click_up(self): self.sink.button(RIGHT_BUTTON_UP)
+    def middle_click_down(self): self.sink.button(MIDDLE_BUTTON_DOWN)
+    def middle_click_up(self): self.sink.button(MIDDLE_BUTTON_UP)
+    def mouse_move_rel(self, dx, dy): self.sink.move_rel(dx, dy)
+    def begin_frame(self): pass
+    def end_frame(self): pass
+
+
+def bench_abs_follow(rate_hz=2000, duration=1.0):
+    """Menu-mode absolute moves through the real bridge and mouse worker into a recording sink."""
+    config = AppConfig(MapperEventDispatcher())
+    with tempfile.TemporaryDirectory() as folder:
+        config.config_data.setdefault('output', {})['recording_path'] = os.path.join(folder, "abs.bin")
+        bridge = InterceptionBridge(config, sink=SINK_RECORDING)
+        time.sleep(SHORT_DELAY) # Let the workers come up
+
+        # Position i is written at written[i]; x = i identifies it in the recording
+        written = []
+        calls = 0.0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            t = time.perf_counter()
+            bridge.mouse_move_abs(len(written), 0)
+            calls += time.perf_counter() - t
+            written.append(t)
+            precise_sleep_until(t + 1 / rate_hz)
+        time.sleep(0.1)
+
+        # The worker closes (flushes) its recording once main stops beating
+        bridge.running = False
+        bridge.m_proc.join(MAIN_HEARTBEAT_TIMEOUT + 2.0)
+        stop_process(bridge.k_proc)
+        stop_process(bridge.m_proc)
+        records = [(t_ns / 1e9, a) for t_ns, kind, a, _ in read_recording(os.path.join(folder, f"abs.{MOUSE_DEVICE}.bin"))
+                   if kind == STROKE_MOVE_ABS]
+
+    positions = [a for _, a in records]
+    replays = sum(1 for prev, a in zip(positions, positions[1:]) if a <= prev)
+    # How long the newest position waited at each injection
+    ages = [t - written[a] for t, a in records]
+    print(f"[Bench] Absolute follow: {len(written)} positions at {rate_hz}Hz -> {len(records)} injections")
+    print(f"        mouse_move_abs: {calls / len(written) * 1e6:5.1f}us/call | stale or repeated injections: {replays}"
+          f" | last injected is newest: {bool(positions) and positions[-1] == len(written) - 1}"
+          f" | age at injection avg {statistics.fmean(ages) * 1000:.2f}ms, worst {max(ages) * 1000:.2f}ms")
+
+
+def scripted_key_mapper(zones, wheel, sink, width=2400, height=1080, bridge=None):
+    """A KeyMapper over the given zone dicts, sending into `sink` (or a real `bridge`) and timed by `wheel`."""
+    bridge = bridge or RecordingBridge(sink)
+    loader = SimpleNamespace(json_data=zones, json_digest=None, width=width, height=height)
+    mapper = SimpleNamespace(
+        config={}, mapper_event_dispatcher=MapperEventDispatcher(), interception_bridge=bridge,
+        layout=CompiledLayout(loader, bridge, None, 0), timer_wheel=wheel,
+        device_width=width, device_height=height, wasd_block=0,
+    )
+    return KeyMapper(mapper)
+
+
+def run_touch_script(key_mapper, script, wheel, clock, virtual:bool):
+    """
+    Feeds (t, action, slot, x, y) touches to the KeyMapper at their times. With a virtual clock
+    time jumps from event to timer deadline; otherwise the wheel runs on its own thread
+    (the feeder sleeps instead of spinning, so it doesn't compete with the wheel for the GIL).
+    """
+    t0 = clock[0] if virtual else time.perf_counter()
+    end = script[-1][0] + 0.5
+    for t, action, slot, x, y in script:
+        if virtual:
+            deadline = wheel.next_deadline()
+            while deadline is not None and deadline <= t0 + t:
+                clock[0] = deadline
+                wheel.advance(deadline)
+                deadline = wheel.next_deadline()
+            clock[0] = t0 + t
+        else:
+            time.sleep(max(0.0, t0 + t - time.perf_counter()))
+        key_mapper.process_touch(action, TouchEvent(slot, slot, x, y, x, y, False, False), False)
+
+    if virtual:
+        while wheel.next_deadline() is not None:
+            clock[0] = wheel.next_deadline()
+            wheel.advance(clock[0])
+    else:
+        time.sleep(max(0.0, t0 + end - time.perf_counter()))
+    return t0
+
+
+def scripted_clock(virtual:bool):
+    """
+    (clock, wheel, sink) of a scripted run. Virtual: the script sets clock[0] and the wheel and
+    sink read it, so timings are exact. Real: perf_counter and a running wheel thread.
+    """
+    clock = [100.0]
+    if virtual:
+        wheel = TimerWheel(clock=lambda: clock[0])
+        sink = RecordingSink(KEYBOARD_DEVICE, clock=lambda: round(clock[0] * 1e9))
+    else:
+        wheel = TimerWheel()
+        wheel.start()
+        sink = RecordingSink(KEYBOARD_DEVICE)
+    return clock, wheel, sink
+
+
+def compare_key_records(records, expected, t0):
+    """Max |error| (ms) between recorded key strokes and expected (t, code, state); None if they differ in sequence."""
+    keys = [(t / 1e9 - t0, a, b) for t, kind, a, b in records if kind == STROKE_KEY]
+    if [(code, state) for _, code, state in keys] != [(code, state) for _, code, state in expected]:
+        return None, keys
+    return max(abs(got[0] - want[0]) for got, want in zip(keys, expected)) * 1000, keys
+
+
+def bench_gestures():
+    """Tap, double-tap and long-press zones through KeyMapper and the timer wheel, virtual and real clock."""
+    zones = [
+        {'scancode': '0x13', 'name': 'tap', 'type': CIRCLE, 'cx': 0.2, 'cy': 0.5, 'r': 0.05,
+         'gesture': {'tap_ms': 40}},
+        {'scancode': '0x10', 'name': 'multi', 'type': CIRCLE, 'cx': 0.6, 'cy': 0.5, 'r': 0.05,
+         'gesture': {'tap_ms': 30, 'hold_key': '0x2A', 'hold_ms': 300, 'double_key': '0x21', 'double_ms': 200}},
+    ]
+    a, b = (480, 540), (1440, 540)
+    script = [
+        (0.000, DOWN, 0, *a), (0.050, UP, 0, *a),                           # tap
+        (0.200, DOWN, 1, *b), (0.260, UP, 1, *b),                           # tap after the double window
+        (0.600, DOWN, 1, *b), (0.650, UP, 1, *b), (0.700, DOWN, 2, *b), (0.760, UP, 2, *b),  # double-tap
+        (1.000, DOWN, 1, *b), (1.500, UP, 1, *b),                           # long-press
+    ]
+    expected = [
+        (0.050, 0x13, 0), (0.090, 0x13, 1),
+        (0.460, 0x10, 0), (0.490, 0x10, 1),
+        (0.700, 0x21, 0), (0.730, 0x21, 1),
+        (1.300, 0x2A, 0), (1.500, 0x2A, 1),
+    ]
+
+    name = "gestures"
+    print(f"[Bench] Gesture zones ({len(expected)} expected key strokes)")
+    for label, virtual in (("virtual clock", True), ("real clock", False)):
+        clock, wheel, sink = scripted_clock(virtual)
+        t0 = run_touch_script(scripted_key_mapper(zones, wheel, sink), script, wheel, clock, virtual)
+        wheel.stop()
+        error, keys = compare_key_records(sink.records, expected, t0)
+        print(f"        {label:<13} | " + (f"max timing error: {error:.3f}ms" if error is not None else f"WRONG SEQUENCE: {keys}"))
+        if check(error is not None, f"{name} ({label}): key sequence") and virtual:
+            check(error < VIRTUAL_TOLERANCE_MS, f"{name} ({label}): timing off by {error:.3f}ms")
+
+
+def repeat_edge_errors(records, t0, lifts, rates, duty=0.5):
+    """
+    Per-edge offsets (s) from each turbo key's phase grid (anchored at its first press), and presses
+    sent after the key's finger lifted. The release sent by the lift itself is off-grid by design and is left out.
+    """
+    errors = []
+    late = 0
+    starts = {}
+    for t, kind, code, state in records:
+        if kind == STROKE_KEY and state == 0 and code not in starts:
+            starts[code] = t / 1e9 - t0
+    for t, kind, code, state in records:
+        if kind != STROKE_KEY:
+            continue
+        t = t / 1e9 - t0
+        if t >= lifts[code] - 0.0005:
+            late += state == 0 and t > lifts[code] + 0.0005
+            continue
+        period = 1.0 / rates[code]
+        phase = (t - starts[code]) - (duty * period if state else 0.0)
+        errors.append(phase - round(phase / period) * period)
+    return errors, late
+
+
+def bench_repeat(hold=1.01):
+    """Eight turbo zones held at once: edge jitter against each zone's phase grid, and stop-on-lift."""
+    rates = {0x02 + i: hz for i, hz in enumerate((10, 12, 15, 16, 20, 24, 25, 30))}
+    zones = [{'scancode': code, 'name': f"turbo{hz}", 'type': CIRCLE, 'cx': 0.1 + i * 0.1, 'cy': 0.5, 'r': 0.04, 'repeat_hz': hz}
+             for i, (code, hz) in enumerate(rates.items())]
+    script = []
+    lifts = {}
+    for i, code in enumerate(rates):
+        x = int((0.1 + i * 0.1) * 2400)
+        lifts[code] = i * 0.013 + hold
+        script += [(i * 0.013, DOWN, i, x, 540), (lifts[code], UP, i, x, 540)]
+    script.sort(key=lambda step: step[0])
+
+    print(f"[Bench] Turbo zones ({len(rates)} held for {hold}s, {min(rates.values())}-{max(rates.values())}Hz)")
+    for label, virtual in (("virtual clock", True), ("real clock", False)):
+        clock, wheel, sink = scripted_clock(virtual)
+        t0 = run_touch_script(scripted_key_mapper(zones, wheel, sink), script, wheel, clock, virtual)
+        wheel.stop()
+
+        errors, late = repeat_edge_errors(sink.records, t0, lifts, rates)
+        jitter = sorted(abs(e) * 1000 for e in errors)
+        print(f"        {label:<13} | edges: {len(errors):>4} | jitter p99: {jitter[int(len(jitter) * 0.99)]:.3f}ms "
+              f"max: {jitter[-1]:.3f}ms | presses after lift: {late}")
+        check(late == 0, f"repeat ({label}): {late} presses after lift")
+        if virtual:
+            check(jitter[-1] < VIRTUAL_TOLERANCE_MS, f"repeat ({label}): edge off its phase grid by {jitter[-1]:.3f}ms")
+
+
+def bench_macros():
+    """Two overlapping macro zones, one cut short by its finger lifting, virtual and real clock."""
+    zones = [
+        {'scancode': '0x03', 'name': 'swap_reload', 'type': CIRCLE, 'cx': 0.2, 'cy': 0.5, 'r': 0.05,
+         'macro': [["2", "down", 0], ["r", "down", 30], ["r", "up", 20], ["2", "up", 10]]},
+        {'scancode': '0x2E', 'name': 'crouch_jump', 'type': CIRCLE, 'cx': 0.6, 'cy': 0.5, 'r': 0.05,
+         'macro': [["c", "down", 0], ["SPACE", "down", 15], ["SPACE", "up", 40], ["c", "up", 5]]},
+    ]
+    a, b = (480, 540), (1440, 540)
+    script = [(0.000, DOWN, 0, *a), (0.010, DOWN, 1, *b), (0.040, UP, 1, *b), (0.200, UP, 0, *a)]
+    expected = [
+        (0.000, 0x03, 0), (0.010, 0x2E, 0), (0.025, 0x39, 0), (0.030, 0x13, 0),
+        (0.040, 0x2E, 1), (0.040, 0x39, 1),   # crouch_jump cancelled by the lift
+        (0.050, 0x13, 1), (0.060, 0x03, 1),
+    ]
+
+    name = "macros"
+    print(f"[Bench] Macro zones ({len(expected)} expected key strokes)")
+    for label, virtual in (("virtual clock", True), ("real clock", False)):
+        clock, wheel, sink = scripted_clock(virtual)
+        t0 = run_touch_script(scripted_key_mapper(zones, wheel, sink), script, wheel, clock, virtual)
+        wheel.stop()
+        error, keys = compare_key_records(sink.records, expected, t0)
+        print(f"        {label:<13} | " + (f"max timing error: {error:.3f}ms" if error is not None else f"WRONG SEQUENCE: {keys}"))
+        if check(error is not None, f"{name} ({label}): key sequence") and virtual:
+            check(error < VIRTUAL_TOLERANCE_MS, f"{name} ({label}): timing off by {error:.3f}ms")
+
+
+def reference_sector(vx, vy, last_sector, hysteresis):
+    """The joystick sector as WASDMapper computed it with atan2."""
+    angle_rad = math.atan2(vy, vx)
+    if angle_rad < 0: angle_rad += 2 * math.pi
+    new_sector = int((angle_rad + math.pi / 8) * (1.0 / (math.pi / 4.0))) % 8
+    if last_sector is not None:
+        angle_diff = (angle_rad - last_sector * (math.pi / 4) + math.pi) % (2 * math.pi) - math.pi
+        if abs(angle_diff) < (math.pi / 8 + hysteresis):
+            new_sector = last_sector
+    return new_sector
+
+
+def slope_sector(vx, vy, last_sector, windows):
+    """Same decision as WASDMapper.touch_pressed makes it now."""
+    if last_sector is not None:
+        if windows is None:
+            return last_sector
+        ux, uy, px, py, sign = windows[last_sector]
+        across = vx * px + vy * py
+        if vx * ux + vy * uy > sign * (across if across >= 0 else -across):
+            return last_sector
+    return octant(vx, vy)
+
+
+def bench_octants(samples=200000, seed=9):
+    rng = random.Random(seed)
+    # Pixel deltas as the joystick sees them, plus every integer vector of a small disc (exact edge slopes)
+    vectors = [(rng.uniform(-400.0, 400.0), rng.uniform(-400.0, 400.0)) for _ in range(samples)]
+    vectors += [(float(x), float(y)) for x in range(-60, 61) for y in range(-60, 61) if x or y]
+    lasts = [rng.choice((None, 0, 1, 2, 3, 4, 5, 6, 7)) for _ in vectors]
+
+    print(f"[Bench] Joystick sector classification ({len(vectors)} vectors)")
+    for degrees in (0.0, 5.0, 15.0, 22.5, 45.0, 80.0, 200.0, -30.0):
+        hysteresis = math.radians(degrees)
+        windows = sector_windows(hysteresis)
+        mismatches = sum(1 for (vx, vy), last in zip(vectors, lasts)
+                         if reference_sector(vx, vy, last, hysteresis) != slope_sector(vx, vy, last, windows))
+        status = "identical" if mismatches == 0 else f"{mismatches} MISMATCHES"
+        print(f"        hysteresis {degrees:6.1f}deg | decisions {status}")
+        check(mismatches == 0, f"octants (hysteresis {degrees}deg): {mismatches} decisions differ from atan2")
+
+    hysteresis = math.radians(5.0)
+    windows = sector_windows(hysteresis)
+    pairs = list(zip(vectors, lasts))
+    start = time.perf_counter()
+    for (vx, vy), last in pairs:
+        reference_sector(vx, vy, last, hysteresis)
+    trig = time.perf_counter() - start
+    start = time.perf_counter()
+    for (vx, vy), last in pairs:
+        slope_sector(vx, vy, last, windows)
+    slopes = time.perf_counter() - start
+    print(f"        atan2 + modular diff: {trig / len(pairs) * 1e9:6.0f}ns | "
+          f"slope bounds: {slopes / len(pairs) * 1e9:6.0f}ns | speedup: {trig / slopes:.2f}x")
+
+
+def reference_strokes(current_mask, sprinting, target_mask, sprint, keys, sprint_code):
+    """Strokes of one joystick change as WASDMapper.apply_keys derived them from IntFlag masks."""
+    strokes = []
+    for k in current_mask & ~target_mask:
+        if k.value > 0:
+            strokes.append((keys[k.value], 1))
+    if sprinting and not sprint:
+        strokes.append((sprint_code, 1))
+    elif not sprinting and sprint:
+        strokes.append((sprint_code, 0))
+    for k in target_mask & ~current_mask:
+        if k.value > 0:
+            strokes.append((keys[k.value], 0))
+    return strokes
+
+
+def bench_wasd_transitions(changes=100000, seed=13):
+    keys = {State.W.value: 0x11, State.A.value: 0x1E, State.S.value: 0x1F, State.D.value: 0x20}
+    sprint_code = 0x2A
+    table = build_transitions({State(value): code for value, code in keys.items()}, sprint_code)
+    masks = (State.NONE,) + SECTOR_STATES
+    count = len(table)
+
+    def unpack(state):
+        return masks[state % SPRINT_OFFSET], state >= SPRINT_OFFSET
+
+    mismatches = sum(1 for a in range(count) for b in range(count)
+                     if list(table[a][b]) != reference_strokes(*unpack(a), *unpack(b), keys, sprint_code))
+    status = "identical" if mismatches == 0 else f"{mismatches} MISMATCHES"
+    print(f"[Bench] WASD key transitions ({count}x{count} table, {changes} changes)")
+    print(f"        strokes vs IntFlag diff: {status}")
+    check(mismatches == 0, f"wasd_transitions: {mismatches} table entries differ from the IntFlag diff")
+
+    rng = random.Random(seed)
+    targets = [rng.randrange(count) for _ in range(changes)]
+    unpacked = [unpack(t) for t in targets]
+
+    start = time.perf_counter()
+    current_mask, sprinting = State.NONE, False
+    for target_mask, sprint in unpacked:
+        reference_strokes(current_mask, sprinting, target_mask, sprint, keys, sprint_code)
+        current_mask, sprinting = target_mask, sprint
+    flags = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state = 0
+    for target in targets:
+        table[state][target]
+        state = target
+    lookups = time.perf_counter() - start
+    print(f"        IntFlag diff: {flags / changes * 1e9:6.0f}ns | table lookup: {lookups / changes * 1e9:6.0f}ns | "
+          f"speedup: {flags / lookups:.1f}x")
+
+
+def scripted_wasd_mapper(wheel, sink, joystick:dict, inner=100.0, ring=50.0, bridge=None):
+    """A WASDMapper (sprint on LSHIFT) sending into `sink` (or a real `bridge`), timed by `wheel`, with the given [joystick] settings."""
+    bridge = bridge or RecordingBridge(sink)
+    config = SimpleNamespace(config_lock=threading.RLock(), config_data={'joystick': joystick, 'mouse': {'sensitivity': 1.0}})
+    mapper = SimpleNamespace(
+        config=config, mapper_event_dispatcher=MapperEventDispatcher(), interception_bridge=bridge,
+        json_loader=SimpleNamespace(get_mouse_wheel_info=lambda: (inner, ring)),
+        emulator={'sprint_key': 'LSHIFT'}, timer_wheel=wheel, wasd_block=0,
+    )
+    return WASDMapper(mapper)
+
+
+def held_direction(records, t_start, t_end, directions):
+    """Time-averaged unit movement direction (degrees) of the held keys over [t_start, t_end], and each key's held share."""
+    held = set()
+    shares = {}
+    sum_x = sum_y = 0.0
+    last = t_start
+    for t, kind, code, state in records + [(t_end * 1e9, STROKE_KEY, None, None)]:
+        if kind != STROKE_KEY:
+            continue
+        t = min(max(t / 1e9, t_start), t_end)
+        dx = sum(directions[c][0] for c in held if c in directions)
+        dy = sum(directions[c][1] for c in held if c in directions)
+        norm = math.hypot(dx, dy)
+        if norm:
+            sum_x += (t - last) * dx / norm
+            sum_y += (t - last) * dy / norm
+        for c in held:
+            shares[c] = shares.get(c, 0.0) + (t - last) / (t_end - t_start)
+        last = t
+        if code is not None:
+            (held.add if state == 0 else held.discard)(code)
+    return math.degrees(math.atan2(sum_y, sum_x)) % 360, shares
+
+
+def bench_analog(pwm_hz=20.0, hold=1.0, settle=0.1):
+    """Analog joystick through WASDMapper and the timer wheel: reproduced angle, sprint share and pulse timing."""
+    w, a, s_, d, shift = (int(SCANCODES[k], 16) if isinstance(SCANCODES[k], str) else int(SCANCODES[k])
+                          for k in ("w", "a", "s", "d", "LSHIFT"))
+    directions = {w: (0, -1), a: (-1, 0), s_: (0, 1), d: (1, 0)}
+    # (angle in screen degrees, deflection px): walk range is 10-100px, sprint ramps up to the 150px leash
+    strokes = [(0.0, 60), (10.0, 60), (22.5, 60), (30.0, 60), (45.0, 60), (70.0, 60), (100.0, 60),
+               (200.0, 60), (260.0, 60), (333.0, 60), (15.0, 125), (15.0, 140)]
+    center = (1000.0, 500.0)
+
+    print(f"[Bench] Analog joystick ({pwm_hz:.0f}Hz pulses, {len(strokes)} strokes of {hold:.1f}s)")
+    for label, virtual in (("virtual clock", True), ("real clock", False)):
+        clock, wheel, sink = scripted_clock(virtual)
+        wasd = scripted_wasd_mapper(wheel, sink, {'analog': True, 'pwm_hz': pwm_hz, 'deadzone': 0.1})
+
+        # Every stroke: touch down, then 100Hz samples at the target point, then lift
+        script = []
+        for i, (angle, deflection) in enumerate(strokes):
+            t = i * (hold + 0.2)
+            x = center[0] + deflection * math.cos(math.radians(angle))
+            y = center[1] + deflection * math.sin(math.radians(angle))
+            script.append((t, DOWN, 0, *center))
+            script += [(t + 0.01 * k, PRESSED, 0, x, y) for k in range(1, int(hold * 100))]
+            script.append((t + hold, UP, 0, x, y))
+        t0 = run_touch_script(wasd, script, wheel, clock, virtual)
+        wheel.stop()
+
+        worst_angle = worst_sprint = 0.0
+        for i, (angle, deflection) in enumerate(strokes):
+            t_start = t0 + i * (hold + 0.2) + settle
+            got, shares = held_direction(sink.records, t_start, t_start + hold - settle, directions)
+            worst_angle = max(worst_angle, abs((got - angle + 180) % 360 - 180))
+            if deflection > 100:
+                worst_sprint = max(worst_sprint, abs(shares.get(shift, 0.0) - min(1.0, (deflection - 100) / 50)))
+
+        # Pulse period: spacing of diagonal presses while one stroke holds still
+        presses = [t / 1e9 for t, kind, code, state in sink.records if kind == STROKE_KEY and code == s_ and state == 0
+                   and t0 + settle <= t / 1e9 <= t0 + 3 * (hold + 0.2)]
+        gaps = [(b - a_) * 1000 for a_, b in zip(presses, presses[1:]) if b - a_ < 2 / pwm_hz]
+        period = (f"period {statistics.mean(gaps):.2f}ms (max off by {max(abs(g - 1000 / pwm_hz) for g in gaps):.3f}ms)"
+                  if gaps else "no pulses")
+        print(f"        {label:<13} | worst angle error: {worst_angle:5.2f}deg | "
+              f"worst sprint share error: {worst_sprint * 100:4.1f}% | {period}")
+        check(bool(gaps), f"analog ({label}): no diagonal pulses")
+        if virtual:
+            check(worst_angle < 0.01 and worst_sprint < 0.001, f"analog ({label}): angle off by {worst_angle:.3f}deg, sprint share by {worst_sprint * 100:.2f}%")
+            check(not gaps or max(abs(g - 1000 / pwm_hz) for g in gaps) < VIRTUAL_TOLERANCE_MS, f"analog ({label}): pulse period drifts")
+
+
+def bench_wasd_rates(sample_hz=480, cap_hz=60.0, duration=3.0, revolutions_per_s=1.5, radius=60.0, seed=17):
+    """Key-change latency of a circling WASD finger behind the movement rate cap, with and without change detection."""
+    rng = random.Random(seed)
+    center = (1000.0, 500.0)
+    samples = []
+    for k in range(int(duration * sample_hz)):
+        t = k / sample_hz
+        angle = 2 * math.pi * revolutions_per_s * t
+        t += 1.0 # The policy's dispatch clock starts at 0
+        r = radius + rng.uniform(-3.0, 3.0)
+        samples.append((t, center[0] + r * math.cos(angle), center[1] + r * math.sin(angle)))
+
+    def run(rates):
+        clock = [0.0]
+        sink = RecordingSink(KEYBOARD_DEVICE, clock=lambda: round(clock[0] * 1e9))
+        wasd = scripted_wasd_mapper(TimerWheel(clock=lambda: clock[0]), sink, {'deadzone': 0.1, 'hysteresis': 5.0})
+        config = SimpleNamespace(config_lock=threading.RLock(), get=lambda key, default=None: {'rates': rates}.get(key, default))
+        policy = RatePolicy(config, cap_hz, 1)
+        policy.update_config(config)
+        policy.bind_change_detector(wasd.would_change)
+
+        wasd.process_touch(DOWN, TouchEvent(0, 0, *center, *center, False, True), False)
+        dispatched = 0
+        for t, x, y in samples:
+            clock[0] = t
+            if policy.admit(0, ROLE_WASD, t, x, y):
+                dispatched += 1
+                wasd.process_touch(PRESSED, TouchEvent(0, 0, x, y, *center, False, True), False)
+        return [(t / 1e9, code, state) for t, kind, code, state in sink.records if kind == STROKE_KEY], dispatched
+
+    reference, _ = run({'wasd_hz': 1e9, 'wasd_on_change': False})
+    print(f"[Bench] WASD key-change latency ({sample_hz}Hz samples, {cap_hz:.0f}Hz cap, {len(reference)} key strokes)")
+    for label, rates in (("cap only", {'wasd_on_change': False}), ("cap + on change", {'wasd_on_change': True})):
+        strokes, dispatched = run(rates)
+        if [s[1:] for s in strokes] != [s[1:] for s in reference]:
+            print(f"        {label:<15} | KEY SEQUENCE DIFFERS from uncapped dispatch ({len(strokes)} strokes)")
+            check(False, f"wasd_rates ({label}): key sequence differs from uncapped dispatch")
+            continue
+        delays = [(got[0] - want[0]) * 1000 for got, want in zip(strokes, reference)]
+        print(f"        {label:<15} | dispatches: {dispatched / duration:5.0f}/s | "
+              f"key delay mean: {statistics.mean(delays):5.2f}ms, max: {max(delays):5.2f}ms")
+
+
+def aim_trace(noise_px=0.7, seed=21):
+    """
+    (t, x, y, true_x, true_y) mouse finger samples: hold still, slow aim, flick, hold still.
+    Samples arrive every 4-8ms and carry digitizer noise, rounded to whole device pixels.
+    Returns the samples and the [start, end) time of each segment by name.
+    """
+    rng = random.Random(seed)
+    # (name, duration, velocity px/s)
+    plan = [("still", 0.5, (0.0, 0.0)), ("slow", 1.0, (30.0, 10.0)), ("flick", 0.1, (4000.0, 800.0)), ("still", 0.5, (0.0, 0.0))]
+    samples, segments = [], []
+    t, x, y = 0.0, 1000.0, 500.0
+    for name, duration, (vx, vy) in plan:
+        start = t
+        while t < start + duration:
+            gap = rng.uniform(1 / 250, 1 / 120)
+            t += gap
+            x += vx * gap
+            y += vy * gap
+            samples.append((t, round(x + rng.gauss(0.0, noise_px)), round(y + rng.gauss(0.0, noise_px)), x, y))
+        segments.append((name, start, t))
+    return samples, segments
+
+
+def smoothing_errors(samples, segments, make_filter):
+    """(still RMS error px, slow-aim RMS delta error px, flick lag ms) of a filter over an aim trace."""
+    f = make_filter()
+    t0, x0, y0 = samples[0][:3]
+    if f is not None:
+        f.reset(x0, y0, t0)
+    out = []
+    for t, x, y, _, _ in samples:
+        if f is not None:
+            f.update(x, y, t)
+            x, y = f.x, f.y
+        out.append((x, y))
+
+    def in_segment(name, t, settle=0.0):
+        return any(n == name and start + settle <= t < end for n, start, end in segments)
+
+    still = [math.hypot(ox - tx, oy - ty) for (t, _, _, tx, ty), (ox, oy) in zip(samples, out) if in_segment("still", t, 0.2)]
+    slow = [math.hypot((ox - px) - (tx - ptx), (oy - py) - (ty - pty))
+            for (t, _, _, tx, ty), (ox, oy), (_, _, _, ptx, pty), (px, py) in zip(samples[1:], out[1:], samples, out)
+            if in_segment("slow", t, 0.2)]
+    flick_speed = math.hypot(4000.0, 800.0)
+    flick = [math.hypot(ox - tx, oy - ty) / flick_speed * 1000
+             for (t, _, _, tx, ty), (ox, oy) in zip(samples, out) if in_segment("flick", t, 0.02)]
+    rms = lambda values: math.sqrt(statistics.fmean(v * v for v in values))
+    return rms(still), rms(slow), statistics.fmean(flick)
+
+
+def bench_one_euro(min_cutoff=1.0, beta=0.007, d_cutoff=1.0, fixed_cutoff=5.0):
+    samples, segments = aim_trace()
+    print(f"[Bench] Mouse finger smoothing ({len(samples)} samples: still / slow aim / 4000px/s flick / still)")
+    for label, make_filter in (("raw", lambda: None),
+                               (f"fixed {fixed_cutoff:.0f}Hz low-pass", lambda: OneEuroFilter(fixed_cutoff, 0.0, d_cutoff)),
+                               ("One Euro", lambda: OneEuroFilter(min_cutoff, beta, d_cutoff))):
+        still, slow, lag = smoothing_errors(samples, segments, make_filter)
+        print(f"        {label:<18} | still jitter: {still:5.2f}px | slow-aim delta jitter: {slow:5.2f}px | flick lag: {lag:5.2f}ms")
+
+    f = OneEuroFilter(min_cutoff, beta, d_cutoff)
+    f.reset(*samples[0][1:3], samples[0][0])
+    start = time.perf_counter()
+    for _ in range(20):
+        for t, x, y, _, _ in samples:
+            f.update(x, y, t)
+    cost = (time.perf_counter() - start) / (20 * len(samples))
+    print(f"        One Euro update: {cost * 1e9:.0f}ns per sample")
+
+
+def scripted_mouse_mapper(mouse_cfg:dict, move_rel, wheel, screen_w=2400, width=2400):
+    """A MouseMapper with the given [mouse] settings, moving through `move_rel(dx, dy)` and timed by `wheel`."""
+    config = SimpleNamespace(config_lock=threading.RLock(), config_data={'mouse': mouse_cfg})
+    bridge = SimpleNamespace(mouse_move_rel=move_rel)
+    mapper = SimpleNamespace(config=config, mapper_event_dispatcher=MapperEventDispatcher(), interception_bridge=bridge,
+                             screen_w=screen_w, json_loader=SimpleNamespace(width=width), timer_wheel=wheel)
+    return MouseMapper(mapper)
+
+
+def bench_accel(samples=50000, seed=23):
+    """Per-sample cost of MouseMapper.touch_pressed with a compiled acceleration curve, and its error against the exact curve."""
+    rng = random.Random(seed)
+    curves = {
+        "power": ({'accel': 'power', 'accel_exponent': 1.4, 'accel_ref_speed': 1000.0, 'accel_cap': 4.0},
+                  lambda v: min(4.0, (max(v, 1.0) / 1000.0) ** 0.4)),
+        "classic": ({'accel': 'classic', 'accel_gain': 0.8, 'accel_ref_speed': 1000.0, 'accel_cap': 3.0},
+                    lambda v: min(3.0, 1.0 + 0.8 * v / 1000.0)),
+        "points": ({'accel': 'points', 'accel_points': [[0, 0.6], [400, 1.0], [2500, 2.2], [6000, 2.5]]},
+                   lambda v: piecewise_gain([(0.0, 0.6), (400.0, 1.0), (2500.0, 2.2), (6000.0, 2.5)], v)),
+    }
+    # Error is measured over the whole range, with as many slow speeds (where power curves bend) as fast ones
+    speeds = [rng.uniform(0.0, 12000.0) for _ in range(samples)] + [10.0 ** rng.uniform(-2.0, 2.0) for _ in range(samples)]
+    stream = []
+    t, x, y = 1.0, 1000.0, 500.0
+    for _ in range(samples):
+        gap = rng.uniform(1 / 250, 1 / 120)
+        t += gap
+        x += rng.uniform(-3000.0, 3000.0) * gap
+        y += rng.uniform(-3000.0, 3000.0) * gap
+        stream.append(TouchEvent(0, 0, x, y, x, y, True, False, t))
+
+    def per_sample(mouse_cfg, repeats=5):
+        """Best of several passes (the least disturbed by other load)."""
+        mouse = scripted_mouse_mapper(mouse_cfg, lambda dx, dy: None, TimerWheel(), screen_w=1920)
+        best = None
+        for _ in range(repeats):
+            mouse.touch_down(stream[0], False)
+            start = time.perf_counter()
+            for event in stream:
+                mouse.touch_pressed(event, False)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / samples
+
+    print(f"[Bench] Mouse acceleration curves ({samples} samples)")
+    linear = per_sample({})
+    print(f"        {'linear':<8} | touch_pressed: {linear * 1e9:6.0f}ns")
+    for name, (mouse_cfg, exact) in curves.items():
+        cost = per_sample(mouse_cfg)
+        curve = compile_accel_curve(mouse_cfg)
+        worst = max(abs(curve.gain(v) - exact(v)) / exact(v) for v in speeds)
+        print(f"        {name:<8} | touch_pressed: {cost * 1e9:6.0f}ns (+{(cost - linear) * 1e9:4.0f}ns)"
+              f" | max gain error vs exact: {worst * 100:.3f}%")
+        check(worst < 0.005, f"accel ({name}): gain error {worst * 100:.3f}%")
+
+    # Speed the curve is looked up with, on a steady swipe delivered in ADB-like bunches
+    swipe = jittered_touch_stream()
+    true_speed = math.hypot(1800.0, 600.0)
+    single_gap = []
+    prev_arrival = 0.0
+    for arrival, dx, dy, _ in swipe:
+        if arrival > prev_arrival:
+            single_gap.append(math.hypot(dx, dy) / (arrival - prev_arrival))
+        prev_arrival = arrival
+    estimates = {"single arrival gap": single_gap}
+    for label, kernel in (("windowed arrival", False), ("windowed kernel", True)):
+        mouse = scripted_mouse_mapper(curves["power"][0], lambda dx, dy: None, TimerWheel(), screen_w=1920)
+        # Times start at 1s: a zero kernel time means "not known"
+        x = y = 0.0
+        mouse.touch_down(TouchEvent(0, 0, x, y, x, y, True, False, 1.0, 1.0 if kernel else 0.0), False)
+        speeds = []
+        for arrival, dx, dy, sampled in swipe:
+            x += dx
+            y += dy
+            mouse.touch_pressed(TouchEvent(0, 0, x, y, 0, 0, True, False, 1.0 + arrival, 1.0 + sampled if kernel else 0.0), False)
+            if sampled >= ACCEL_SPEED_WINDOW:
+                speeds.append(mouse.speed)
+        estimates[label] = speeds
+    print(f"        speed of a steady {true_speed:.0f}px/s swipe ({len(swipe)} samples, window {ACCEL_SPEED_WINDOW * 1000:g}ms):")
+    for label, speeds in estimates.items():
+        speeds = sorted(speeds)
+        print(f"        {label:<18} | median {statistics.median(speeds):6.0f} | p5 {speeds[len(speeds) // 20]:6.0f}"
+              f" | p95 {speeds[len(speeds) * 19 // 20]:6.0f} | max {speeds[-1]:7.0f}px/s")
+
+
+def predict_trace(delay=0.02, noise_px=0.5, seed=29):
+    """
+    Mouse finger samples (received time, x, y) that reach the mapper `delay` after they were taken,
+    the true position truth(t) at any time, and the times the finger stops. The finger ramps up and
+    eases to a stop, flicks and stops dead, then tracks at a steady speed and stops dead.
+    """
+    rng = random.Random(seed)
+    # (duration, velocity at start, velocity at end) px/s; the velocity ramps linearly in between
+    plan = [
+        (0.2, (0.0, 0.0), (0.0, 0.0)),
+        (0.3, (0.0, 0.0), (800.0, 300.0)), (0.3, (800.0, 300.0), (800.0, 300.0)), (0.2, (800.0, 300.0), (0.0, 0.0)),
+        (0.3, (0.0, 0.0), (0.0, 0.0)),
+        (0.05, (0.0, 0.0), (5000.0, -1500.0)), (0.08, (5000.0, -1500.0), (5000.0, -1500.0)),
+        (0.3, (0.0, 0.0), (0.0, 0.0)),
+        (0.4, (-600.0, 400.0), (-600.0, 400.0)),
+        (0.3, (0.0, 0.0), (0.0, 0.0)),
+    ]
+    step = 0.0005
+    times, xs, ys, stops = [0.0], [1000.0], [500.0], []
+    for duration, (vx0, vy0), (vx1, vy1) in plan:
+        start = times[-1]
+        moving = times[-1] > 0 and (vx0 or vy0 or vx1 or vy1)
+        if not moving and len(times) > 1 and (xs[-1] != xs[-2] or ys[-1] != ys[-2]):
+            stops.append(start)
+        n = max(1, round(duration / step))
+        for i in range(n):
+            f = (i + 0.5) / n
+            xs.append(xs[-1] + (vx0 + (vx1 - vx0) * f) * step)
+            ys.append(ys[-1] + (vy0 + (vy1 - vy0) * f) * step)
+            times.append(start + (i + 1) * step)
+
+    def truth(t):
+        i = min(max(0, int(t / step)), len(times) - 2)
+        f = min(max(0.0, (t - times[i]) / step), 1.0)
+        return xs[i] + (xs[i + 1] - xs[i]) * f, ys[i] + (ys[i + 1] - ys[i]) * f
+
+    samples = []
+    t = 0.0
+    while t < times[-1]:
+        x, y = truth(t)
+        samples.append((t + delay, round(x + rng.gauss(0.0, noise_px)), round(y + rng.gauss(0.0, noise_px))))
+        t += rng.uniform(1 / 250, 1 / 120)
+    return samples, truth, stops
+
+
+def bench_predict(delay_ms=20.0, max_shift_ms=40):
+    """Cursor path of MouseMapper with and without prediction over a trace delivered delay_ms late."""
+    samples, truth, stops = predict_trace(delay_ms / 1000)
+    predictors = {
+        "off": {},
+        "cv": {'predict': 'cv', 'predict_horizon_ms': delay_ms},
+        "kalman": {'predict': 'kalman', 'predict_horizon_ms': delay_ms},
+        "kalman auto": {'predict': 'kalman', 'predict_horizon_ms': 0.0},
+    }
+    t0, x0, y0 = samples[0]
+
+    def replay(mouse_cfg):
+        """Cursor position (relative to the first sample) right after every sample and at 1ms steps in between, and where it ends."""
+        clock = SimpleNamespace(now=0.0)
+        wheel = TimerWheel(clock=lambda: clock.now)
+        cursor = [0, 0]
+
+        def move_rel(dx, dy):
+            cursor[0] += dx
+            cursor[1] += dy
+
+        mouse = scripted_mouse_mapper(mouse_cfg, move_rel, wheel)
+        clock.now = t0
+        mouse.touch_down(TouchEvent(0, 0, x0, y0, x0, y0, True, False, t0), False)
+        path = []
+        for t, x, y in samples[1:]:
+            while clock.now + 0.001 < t:
+                clock.now += 0.001
+                wheel.advance(clock.now)
+                path.append((clock.now, cursor[0], cursor[1]))
+            clock.now = t
+            wheel.advance(t)
+            mouse.touch_pressed(TouchEvent(0, 0, x, y, x, y, True, False, t), False)
+            path.append((t, cursor[0], cursor[1]))
+        clock.now += 0.2
+        wheel.advance(clock.now)
+        mouse.touch_up()
+        return path, cursor
+
+    print(f"[Bench] Mouse motion prediction ({len(samples)} samples delivered {delay_ms:g}ms late)")
+    for name, mouse_cfg in predictors.items():
+        path, cursor = replay(mouse_cfg)
+        drift = math.hypot(cursor[0] - (samples[-1][1] - x0), cursor[1] - (samples[-1][2] - y0))
+
+        def rms_at(shift):
+            return math.sqrt(statistics.fmean(
+                (x0 + cx - tx) ** 2 + (y0 + cy - ty) ** 2
+                for t, cx, cy in path for tx, ty in (truth(t - shift),)))
+
+        # Effective latency: the delay of the true path that the cursor follows best
+        latency = min(range(max_shift_ms + 1), key=lambda ms: rms_at(ms / 1000))
+        overshoot = 0.0
+        for stop in stops:
+            sx, sy = truth(stop)
+            px, py = truth(stop - 0.01)
+            length = math.hypot(sx - px, sy - py)
+            ux, uy = (sx - px) / length, (sy - py) / length
+            for t, cx, cy in path:
+                if stop <= t < stop + 0.3:
+                    overshoot = max(overshoot, (x0 + cx - sx) * ux + (y0 + cy - sy) * uy)
+        print(f"        {name:<11} | effective latency {latency:2d}ms | RMS error {rms_at(0.0):5.1f}px"
+              f" | worst overshoot past a stop {overshoot:5.1f}px | net drift over the stroke {drift:.1f}px")
+        check(drift < 1.5, f"predict ({name}): cursor drifted {drift:.1f}px from the real travel")
+
+    # Bunched delivery: a steady swipe sampled every 4ms arrives three samples at a time, 50us apart.
+    # The lead must follow the sample clock (kernel times), not the bunched arrivals.
+    speed, interval, bunch, moving, still = 500.0, 0.004, 3, 125, 50
+    end_x = speed * moving * interval
+    for name, mouse_cfg in predictors.items():
+        if not mouse_cfg:
+            continue
+        for timing, kernel in (("kernel times", True), ("arrival only", False)):
+            clock = SimpleNamespace(now=1.0)
+            wheel = TimerWheel(clock=lambda: clock.now)
+            cursor = [0, 0]
+
+            def move_rel(dx, dy):
+                cursor[0] += dx
+                cursor[1] += dy
+
+            mouse = scripted_mouse_mapper(mouse_cfg, move_rel, wheel)
+            # A horizon of 0 predicts one sample interval ahead
+            true_lead = speed * (mouse.predictor.horizon or interval)
+            mouse.touch_down(TouchEvent(0, 0, 0.0, 0.0, 0.0, 0.0, True, False, 1.0, 1.0 if kernel else 0.0), False)
+            leads = []
+            overshoot = 0.0
+            for k in range(1, moving + still):
+                sampled = 1.0 + k * interval
+                x = speed * min(k, moving) * interval
+                clock.now = 1.0 + delay_ms / 1000 + ((k // bunch) * bunch + bunch - 1) * interval + (k % bunch) * 0.00005
+                wheel.advance(clock.now)
+                mouse.touch_pressed(TouchEvent(0, 0, x, 0.0, 0.0, 0.0, True, False, clock.now, sampled if kernel else 0.0), False)
+                if 2 * bunch * 5 <= k < moving:
+                    leads.append(mouse.predictor.x - x)
+                overshoot = max(overshoot, cursor[0] - end_x)
+            mean_lead = statistics.fmean(leads)
+            print(f"        {name + ' bunched':<19} | {timing:<12} | lead mean {mean_lead:5.1f}px, max {max(leads):5.1f}px"
+                  f" (true {true_lead:.1f}px) | overshoot past the stop {overshoot:5.1f}px")
+            if kernel:
+                check(abs(mean_lead - true_lead) < 0.1 * true_lead and max(leads) < 1.25 * true_lead,
+                      f"predict ({name} bunched): lead {mean_lead:.1f}px (max {max(leads):.1f}px) vs true {true_lead:.1f}px")
+                check(overshoot < 1.25 * true_lead, f"predict ({name} bunched): overshoot {overshoot:.1f}px")
+
+    # With acceleration the lead goes out amplified; settling must take back exactly that much
+    accel = {'accel': 'power', 'accel_exponent': 1.5, 'accel_ref_speed': 500.0, 'accel_cap': 4.0}
+    _, reference = replay(accel)
+    for name, mouse_cfg in predictors.items():
+        if not mouse_cfg:
+            continue
+        _, cursor = replay({**accel, **mouse_cfg})
+        drift = math.hypot(cursor[0] - reference[0], cursor[1] - reference[1])
+        print(f"        {name + ' + accel':<19} | net drift against accel without prediction {drift:.1f}px")
+        check(drift < 1.5, f"predict ({name} + accel): cursor drifted {drift:.1f}px from the unpredicted path")
+
+
+def touch_session(duration=2.0, frame_hz=240, width=2400, height=1080):
+    """
+    (t, [(action, TouchEvent), ...]) sync frames of a play session: the mouse finger aims,
+    the joystick finger circles, and two more fingers tap chords of key zones.
+    Returns the frames and the key zones they tap.
+    """
+    zones = [{'scancode': hex(0x10 + i), 'name': f"key{i}", 'type': CIRCLE, 'cx': 0.55 + 0.08 * (i % 3), 'cy': 0.3 + 0.2 * (i // 3), 'r': 0.03}
+             for i in range(6)]
+    center = (400.0, 700.0)
+    frames = []
+    for n in range(int(duration * frame_hz)):
+        t = n / frame_hz
+        frame = []
+        mx, my = 1700.0 + 150 * math.sin(t * 3), 500.0 + 80 * math.sin(t * 5)
+        frame.append((DOWN if n == 0 else PRESSED, TouchEvent(0, 0, mx, my, 1700.0, 500.0, True, False, t)))
+        angle = t * 2 * math.pi
+        wx, wy = center[0] + 60 * math.cos(angle), center[1] + 60 * math.sin(angle)
+        frame.append((DOWN if n == 0 else PRESSED, TouchEvent(1, 1, wx, wy, *center, False, True, t)))
+        # A two-finger chord every 100ms, held for 50ms
+        tap, phase = divmod(n, frame_hz // 10)
+        for slot in (2, 3):
+            zone = zones[(2 * tap + slot) % len(zones)]
+            zx, zy = zone['cx'] * width, zone['cy'] * height
+            if phase == 0:
+                frame.append((DOWN, TouchEvent(slot, slot, zx, zy, zx, zy, False, False, t)))
+            elif phase == frame_hz // 20:
+                frame.append((UP, TouchEvent(slot, slot, zx, zy, zx, zy, False, False, t)))
+        frames.append((t, frame))
+    return frames, zones
+
+
+def bench_frames(duration=2.0, frame_hz=240):
+    """One processor call per finger vs one per sync frame (batched bridge output), through the real bridge."""
+    config = AppConfig(MapperEventDispatcher())
+    bridge = InterceptionBridge(config, sink=SINK_NULL)
+    time.sleep(SHORT_DELAY) # Let the workers come up
+    frames, zones = touch_session(duration, frame_hz)
+    events = sum(len(frame) for _, frame in frames)
+
+    print(f"[Bench] Sync frames ({len(frames)} frames, {events} finger events at {frame_hz}Hz, null sink)")
+    for label, batched in (("per finger", False), ("per frame", True)):
+        wheel = TimerWheel()
+        wheel.start()
+        key_mapper = scripted_key_mapper(zones, wheel, None, bridge=bridge)
+        wasd_mapper = scripted_wasd_mapper(wheel, None, {}, bridge=bridge)
+        mouse_mapper = scripted_mouse_mapper({}, bridge.mouse_move_rel, wheel)
+
+        def process_touch_event(action, touch_event):
+            if touch_event.is_mouse:
+                mouse_mapper.process_touch(action, touch_event, False)
+            key_mapper.process_touch(action, touch_event, False)
+            if touch_event.is_wasd:
+                wasd_mapper.process_touch(action, touch_event, False)
+
+        def process_frame(frame):
+            bridge.begin_frame()
+            try:
+                for action, touch_event in frame:
+                    process_touch_event(action, touch_event)
+            finally:
+                bridge.end_frame()
+
+        before = bridge.telemetry.snapshot()
+        costs = []
+        calls = 0
+        start = time.perf_counter()
+        for t, frame in frames:
+            precise_sleep_until(start + t)
+            t_sync = time.perf_counter()
+            if batched:
+                process_frame(frame)
+                calls += 1
+            else:
+                for action, touch_event in frame:
+                    process_touch_event(action, touch_event)
+                    calls += 1
+            costs.append(time.perf_counter() - t_sync)
+        mouse_mapper.touch_up()
+        wasd_mapper.touch_up()
+        key_mapper.release_all()
+        time.sleep(0.1)
+        wheel.stop()
+
+        window = BridgeTelemetry.diff(bridge.telemetry.snapshot(), before)
+        puts = int(window[K_ENQUEUED] + window[M_ENQUEUED])
+        costs.sort()
+        print(f"        {label:<10} | processor calls/s: {calls / duration:6.0f} | bridge puts: {puts:5d}"
+              f" | sync -> output queued avg {statistics.fmean(costs) * 1e6:6.1f}us, p99 {costs[int(len(costs) * 0.99)] * 1e6:6.1f}us"
+              f" | queue -> inject avg key {BridgeTelemetry.mean_ms(window, KEY_LATENCY):.3f}ms, move {BridgeTelemetry.mean_ms(window, MOVE_LATENCY):.3f}ms")
+
+    bridge.running = False
+    stop_process(bridge.k_proc)
+    stop_process(bridge.m_proc)
+
+
+def bench_pipeline(duration=200.0, frame_hz=240, runs=30):
+    """
+    Branching per-event dispatch vs the compiled pipeline over a replayed session: cost per finger
+    event, same output. Runs alternate between the two so drift in machine load hits both alike.
+    """
+    frames, zones = touch_session(duration, frame_hz)
+    events = sum(len(frame) for _, frame in frames)
+
+    variants = {}
+    for label, compiled in (("branching", False), ("compiled", True)):
+        sink = RecordingSink(KEYBOARD_DEVICE, clock=lambda: 0)
+        bridge = RecordingBridge(sink)
+        wheel = TimerWheel()
+        key_mapper = scripted_key_mapper(zones, wheel, sink, bridge=bridge)
+        wasd_mapper = scripted_wasd_mapper(wheel, sink, {}, bridge=bridge)
+        mouse_mapper = scripted_mouse_mapper({}, bridge.mouse_move_rel, wheel)
+        mapper = SimpleNamespace(interception_bridge=bridge, event_count=0)
+        is_visible = False
+
+        if compiled:
+            process_frame = compile_pipeline(mapper, mouse_mapper, key_mapper, wasd_mapper, is_visible)
+        else:
+            def process_frame(frame, mapper=mapper, bridge=bridge, mouse_mapper=mouse_mapper,
+                              key_mapper=key_mapper, wasd_mapper=wasd_mapper, is_visible=is_visible):
+                # The dispatch main.py used before the pipeline
+                local_visible = is_visible
+                mapper.event_count += len(frame)
+                bridge.begin_frame()
+                try:
+                    for action, touch_event in frame:
+                        if touch_event.is_mouse:
+                            mouse_mapper.process_touch(action, touch_event, local_visible)
+                        key_mapper.process_touch(action, touch_event, local_visible)
+                        if touch_event.is_wasd:
+                            wasd_mapper.process_touch(action, touch_event, local_visible)
+                finally:
+                    bridge.end_frame()
+        variants[label] = (process_frame, sink)
+
+    timings = {label: [] for label in variants}
+    outputs = {}
+    for run in range(runs):
+        for label, (process_frame, sink) in (reversed(variants.items()) if run % 2 else variants.items()):
+            sink.records.clear()
+            start = time.perf_counter()
+            for _, frame in frames:
+                process_frame(frame)
+            timings[label].append((time.perf_counter() - start) / events)
+            outputs[label] = [record[1:] for record in sink.records]
+
+    print(f"[Bench] Touch pipeline ({len(frames)} frames, {events} finger events, median of {runs} runs)")
+    base = timings["branching"]
+    for label, costs in timings.items():
+        # Saving of each run against the branching run next to it, then its spread across runs
+        savings = sorted((1 - cost / base_cost) * 100 for cost, base_cost in zip(costs, base))
+        same = outputs[label] == outputs["branching"]
+        print(f"        {label:<10} | {statistics.median(costs) * 1e9:6.0f}ns per finger event"
+              f" | saved vs the paired branching run: median {statistics.median(savings):+5.1f}%,"
+              f" interquartile {savings[len(savings) // 4]:+5.1f}% to {savings[len(savings) * 3 // 4]:+5.1f}%"
+              f" | {len(outputs[label])} strokes, {'identical output' if same else 'OUTPUT DIFFERS'}")
+        check(same, f"pipeline ({label}): output differs from branching dispatch")
+
+
+BENCHMARKS = {
+    "shaper": bench_shaper,
+    "throughput": bench_bridge_throughput,
+    "click_latency": bench_click_latency,
+    "abs_follow": bench_abs_follow,
+    "zone_grid": bench_zone_grid,
+    "zone_raster": bench_zone_raster,
+    "gestures": bench_gestures,
+    "repeat": bench_repeat,
+    "macros": bench_macros,
+    "octants": bench_octants,
+    "wasd_transitions": bench_wasd_transitions,
+    "analog": bench_analog,
+    "wasd_rates": bench_wasd_rates,
+    "one_euro": bench_one_euro,
+    "accel": bench_accel,
+    "predict": bench_predict,
+    "frames": bench_frames,
+    "pipeline": bench_pipeline,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"[!] Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+
+    if FAILURES:
+        print(f"[!] {len(FAILURES)} correctness check(s) failed:")
+        for what in FAILURES:
+            print(f"    {what}")
+        sys.exit(1)
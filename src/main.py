@@ -7,10 +7,9 @@ import threading
 import time
 from mapper_module.utils import (
     DEFAULT_ADB_RATE_CAP, SHORT_DELAY,
-    PPS, EMULATORS, ADB_EXE, UP,
-    DEF_EMULATOR_ID, TouchEvent,
-    set_high_priority, stop_process,
-    maintain_bridge_health
+    PPS, EMULATORS, ADB_EXE,
+    DEF_EMULATOR_ID,
+    set_high_priority, stop_process
 )
 
 from mapper_module import (
@@ -24,6 +23,7 @@ from mapper_module import (
     KeyMapper, 
     WASDMapper,
 )
+from mapper_module.pipeline import compile_pipeline
 
 
 FOREGROUND_WINDOW = win32gui.GetForegroundWindow()
@@ -43,26 +43,22 @@ def set_is_visible(_is_visible):
 
     with lock:
         is_visible = _is_visible
+        install_pipeline()
         # Clean up keys and state
-        with interception_bridge.bridge_lock:
-            maintain_bridge_health(interception_bridge)
         mouse_mapper.touch_up()
         key_mapper.release_all()
         wasd_mapper.touch_up()
 
 
-def process_touch_event(action, touch_event: TouchEvent):
-    local_visible = is_visible
-    mapper_logic.event_count += 1
-    
-    if touch_event.is_mouse:
-        mouse_mapper.process_touch(action, touch_event, local_visible)
-        
-    key_mapper.process_touch(action, touch_event, local_visible)
-        
-    if touch_event.is_wasd:
-        wasd_mapper.process_touch(action, touch_event, is_visible)
-        
+def install_pipeline():
+    """Swaps a touch pipeline compiled for the current layout and menu mode into the reader (lock held)."""
+    touch_reader.bind_frame_processor(compile_pipeline(mapper_logic, mouse_mapper, key_mapper, wasd_mapper, is_visible))
+
+
+def reload_pipeline():
+    with lock:
+        install_pipeline()
+
 
 def select_emulator():
     print("Touch2Key Emulator Selector")
@@ -130,7 +126,7 @@ def main():
     config = AppConfig(mapper_event_dispatcher)
 
     # Initialize Bridge (This spawns TWO processes: k_proc and m_proc)
-    interception_bridge = InterceptionBridge()
+    interception_bridge = InterceptionBridge(config)
     
     if hasattr(interception_bridge, 'm_proc'):
         set_high_priority(interception_bridge.m_proc.pid, "Mouse")
@@ -147,7 +143,13 @@ def main():
     key_mapper = KeyMapper(mapper_logic)
     wasd_mapper = WASDMapper(mapper_logic)
         
-    touch_reader.bind_touch_event(process_touch_event)
+    with lock:
+        install_pipeline()
+    # Registered after the mappers, so the pipeline is compiled against the layout they just switched to
+    mapper_event_dispatcher.register_callback("ON_CONFIG_RELOAD", reload_pipeline)
+    mapper_event_dispatcher.register_callback("ON_JSON_RELOAD", reload_pipeline)
+    touch_reader.bind_sync_end(key_mapper.publish_wasd_block)
+    touch_reader.bind_change_detector(wasd_mapper.would_change)
     mapper_event_dispatcher.register_callback("ON_MENU_MODE_TOGGLE", set_is_visible)
     keyboard.wait()
     
@@ -168,6 +170,9 @@ def shutdown():
         print("Exiting all spawned threads...")
         touch_reader.stop()
         mapper_logic.running = False
+        # No timed key output may follow the final release
+        mapper_logic.timer_wheel.stop()
+        interception_bridge.running = False
         interception_bridge.release_all()
         print("Stopping Mouse and Keyboard child processes...")
         stop_process(interception_bridge.k_proc)
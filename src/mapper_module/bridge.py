@@ -1,74 +1,437 @@
-import ctypes
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
 import multiprocessing
+import os
+import queue
 import threading
+import time
+from datetime import datetime as _datetime
 from .utils import (
-    SCANCODES, M_LEFT, M_RIGHT, M_MIDDLE,
-    LEFT_BUTTON_DOWN, LEFT_BUTTON_UP,
-    RIGHT_BUTTON_DOWN, RIGHT_BUTTON_UP,
-    MIDDLE_BUTTON_DOWN, MIDDLE_BUTTON_UP,
-    mouse_worker, keyboard_worker, maintain_bridge_health
+    LEFT_BUTTON_DOWN, RIGHT_BUTTON_DOWN, MIDDLE_BUTTON_DOWN,
+    BUTTON_UP_FLAGS,
+    DEFAULT_MOUSE_OUTPUT_HZ, DEFAULT_MOUSE_OUTPUT_LATENCY_MS,
+    DEFAULT_SINK, SINK_RECORDING, DEFAULT_RECORDING_PATH, KEYBOARD_DEVICE, MOUSE_DEVICE,
+    HB_MAIN, HB_KEYBOARD, HB_MOUSE, HEARTBEAT_TIMEOUT,
+    ABS_SEQ, ABS_X, ABS_Y, ABS_T, ABS_WAKE, ABS_SLOT_SIZE,
+    SUPERVISOR_POLL_INTERVAL, WORKER_STARTUP_GRACE,
+    RESTART_BACKOFF, RESTART_BACKOFF_MAX, RESTART_LIMIT, RESTART_STABLE_AFTER, SINK_NULL,
+    get_desktop_size, set_high_priority, mouse_worker, keyboard_worker
+    )
+from .sinks import SINKS
+from .telemetry import (
+    BridgeTelemetry, K_ENQUEUED, M_ENQUEUED, B_ENQUEUED, BUTTON_LATENCY
     )
 
+if TYPE_CHECKING:
+    from .config import AppConfig
+
 
 class InterceptionBridge:
-    def __init__(self):
-        self.screen_w = ctypes.windll.user32.GetSystemMetrics(0)
-        self.screen_h = ctypes.windll.user32.GetSystemMetrics(1)
+    def __init__(self, config:AppConfig, sink:str|None=None):
+        self.config = config
+        self.screen_w, self.screen_h = get_desktop_size()
         self.bridge_lock = threading.Lock()
 
+        # Held-input ledger: what the workers were last told is down
+        self.ledger_lock = threading.Lock()
+        self.held_keys = set()
+        self.held_buttons = 0 # Bitmap of *_BUTTON_DOWN flags
+
+        # Open sync frame (begin_frame/end_frame): key strokes and relative motion wait here
+        # and go out as one batch each. None = no frame, send immediately.
+        self.frame_keys = None
+        self.frame_dx = 0
+        self.frame_dy = 0
+        self.frame_t = 0.0
+
+        # Mouse output shaping (read before the worker spawns so it starts in the right mode)
+        self.shaper_settings = (DEFAULT_MOUSE_OUTPUT_HZ, DEFAULT_MOUSE_OUTPUT_LATENCY_MS)
+        self.shaper_settings = self.read_shaper_settings()
+
+        # Output backend (explicit argument wins over [output] sink); a worker that keeps
+        # failing on it falls back to the null sink on its own
+        self.sink_spec = self.read_sink_spec(sink)
+        self.worker_sinks = {KEYBOARD_DEVICE: self.sink_spec, MOUSE_DEVICE: self.sink_spec}
+        if self.sink_spec[0] == SINK_RECORDING:
+            print(f"[Bridge] Recording output to {self.sink_spec[1]['path']} (one file per device)")
+
+        # Restart bookkeeping per worker: failed restarts in a row, last restart, earliest next one
+        self.restart_failures = {KEYBOARD_DEVICE: 0, MOUSE_DEVICE: 0}
+        self.restarted_at = {KEYBOARD_DEVICE: 0.0, MOUSE_DEVICE: 0.0}
+        self.next_restart = {KEYBOARD_DEVICE: 0.0, MOUSE_DEVICE: 0.0}
+        self.abandoned = set()
+
         # Setup Keyboard Channel (Infinite queue - never drop keys)
         self.k_queue = multiprocessing.Queue()
-        self.k_proc = multiprocessing.Process(
-            target=keyboard_worker, name="Keyboard Worker", args=(self.k_queue,), daemon=True
-        )
         
         # Setup Mouse Channel (Capped queue - drop frames if lagging)
         self.m_queue = multiprocessing.Queue(maxsize=64)
-        self.m_proc = multiprocessing.Process(
-            target=mouse_worker, name="Mouse Worker", args=(self.m_queue,), daemon=True
-        )
+
+        # Button lane (never dropped, always served before queued motion)
+        self.b_queue = multiprocessing.Queue()
+
+        # Absolute moves: one latest-value slot instead of queued positions (see mouse_worker)
+        self.abs_slot = multiprocessing.RawArray('d', ABS_SLOT_SIZE)
+        self.abs_lock = threading.Lock()
+
+        # Shared counters: queue depths, drops and latency histograms
+        self.telemetry = BridgeTelemetry()
+
+        # Shared-memory heartbeats (perf_counter stamps): main <-> each worker
+        self.heartbeats = multiprocessing.RawArray('d', 3)
+        self.heartbeats[HB_MAIN] = time.perf_counter()
 
         # Start both engines
-        self.k_proc.start()
-        self.m_proc.start()
+        self.k_proc = self.spawn_keyboard_worker()
+        self.m_proc = self.spawn_mouse_worker()
         
-        print(f"[Bridge] Dual Engine Started. K-PID: {self.k_proc.pid} | M-PID: {self.m_proc.pid}")
+        print(f"[Bridge] Dual Engine Started ({self.sink_spec[0]} sink). K-PID: {self.k_proc.pid} | M-PID: {self.m_proc.pid}")
+
+        self.config.mapper_event_dispatcher.register_callback("ON_CONFIG_RELOAD", self.update_config)
+
+        # Start the supervisor thread
+        self.running = True
+        self.supervisor_thread = threading.Thread(target=self.supervise, daemon=True)
+        self.supervisor_thread.start()
+
+    def spawn_keyboard_worker(self):
+        # Startup grace: the new process can't beat until it has imported everything
+        self.heartbeats[HB_KEYBOARD] = time.perf_counter() + WORKER_STARTUP_GRACE
+        proc = multiprocessing.Process(
+            target=keyboard_worker, name="Keyboard Worker", args=(self.k_queue, self.heartbeats, self.telemetry, self.worker_sinks[KEYBOARD_DEVICE]), daemon=True
+        )
+        proc.start()
+        return proc
+
+    def spawn_mouse_worker(self):
+        self.heartbeats[HB_MOUSE] = time.perf_counter() + WORKER_STARTUP_GRACE
+        proc = multiprocessing.Process(
+            target=mouse_worker, name="Mouse Worker", args=(self.m_queue, self.b_queue, self.abs_slot, self.heartbeats, self.telemetry, self.shaper_settings, self.worker_sinks[MOUSE_DEVICE]), daemon=True
+        )
+        proc.start()
+        return proc
+
+    # Worker Supervision
+
+    def supervise(self):
+        """Background thread - beats for main and restarts dead or hung workers."""
+        while self.running:
+            now = time.perf_counter()
+            self.heartbeats[HB_MAIN] = now
+
+            try:
+                self.check_worker(KEYBOARD_DEVICE, self.k_proc, HB_KEYBOARD, now)
+                self.check_worker(MOUSE_DEVICE, self.m_proc, HB_MOUSE, now)
+            except Exception as e:
+                print(f"[ERROR] Bridge supervisor error: {e}")
+
+            time.sleep(SUPERVISOR_POLL_INTERVAL)
+
+    def check_worker(self, device:str, proc, hb_index:int, now:float):
+        """Restarts an unhealthy worker, backing off exponentially while it keeps failing."""
+        if device in self.abandoned:
+            return
+        if proc.is_alive() and now - self.heartbeats[hb_index] <= HEARTBEAT_TIMEOUT:
+            if self.restart_failures[device] and now - self.restarted_at[device] > RESTART_STABLE_AFTER:
+                self.restart_failures[device] = 0
+            return
+        if now < self.next_restart[device]:
+            return
+
+        failures = self.restart_failures[device]
+        if failures >= RESTART_LIMIT:
+            if self.worker_sinks[device][0] == SINK_NULL:
+                # Even the null sink fails: the worker itself is broken, stop trying
+                self.abandoned.add(device)
+                print(f"[ERROR] {proc.name} failed {failures} restarts in a row. Giving up; {device} output is disabled.")
+                return
+            print(f"[ERROR] {proc.name} failed {failures} restarts on the '{self.worker_sinks[device][0]}' sink. Falling back to the null sink.")
+            self.worker_sinks[device] = (SINK_NULL, {})
+            failures = 0
+
+        self.restart_failures[device] = failures + 1
+        self.restarted_at[device] = now
+        self.next_restart[device] = now + min(RESTART_BACKOFF * 2 ** failures, RESTART_BACKOFF_MAX)
+        self.restart_worker(device)
+
+    def restart_worker(self, device:str):
+        """Replaces a worker (and its queues) and resyncs it with the held-input ledger."""
+        with self.bridge_lock:
+            if not self.running:
+                return
+            is_keyboard = device == KEYBOARD_DEVICE
+            proc = self.k_proc if is_keyboard else self.m_proc
+            reason = "Died" if not proc.is_alive() else "Stopped Responding"
+            print(f"\n[CRITICAL] {_datetime.now().strftime('%H:%M:%S')} - {proc.name} {reason}! Restarting...")
+            if proc.is_alive():
+                proc.kill()
+
+            # A worker killed inside Queue.get can leave the queue's read lock held, so the
+            # new worker gets fresh queues. The ledger is authoritative; the stale backlog goes.
+            with self.ledger_lock:
+                if is_keyboard:
+                    stale_queues = ((self.k_queue, K_ENQUEUED),)
+                    self.k_queue = multiprocessing.Queue()
+                else:
+                    stale_queues = ((self.m_queue, M_ENQUEUED), (self.b_queue, B_ENQUEUED))
+                    self.m_queue = multiprocessing.Queue(maxsize=64)
+                    self.b_queue = multiprocessing.Queue()
+                for stale_queue, enq_index in stale_queues:
+                    self.telemetry.abandoned(enq_index)
+                    # Nobody reads it any more: don't let its feeder thread block exit
+                    stale_queue.cancel_join_thread()
+                    stale_queue.close()
 
-    # Keyboard API
-    def key_down(self, code): self.k_queue.put((code, 0))
-    def key_up(self, code): self.k_queue.put((code, 1))
+                # Resync goes in first, so later strokes stay ordered after it
+                now = time.perf_counter()
+                if is_keyboard:
+                    held = [(code, 0, now) for code in self.held_keys]
+                    if held:
+                        self.k_queue.put(held)
+                        self.telemetry.enqueued(K_ENQUEUED)
+                elif self.held_buttons:
+                    self.b_queue.put(("button", self.held_buttons, now))
+                    self.telemetry.enqueued(B_ENQUEUED)
+
+            if is_keyboard:
+                self.k_proc = new_proc = self.spawn_keyboard_worker()
+            else:
+                # Its wake token went with the old queue
+                with self.abs_lock:
+                    self.abs_slot[ABS_WAKE] = 0.0
+                self.m_proc = new_proc = self.spawn_mouse_worker()
+
+            # Re-apply High Priority to the new PID
+            set_high_priority(new_proc.pid, f"Revived {device.capitalize()}")
+
+    def read_sink_spec(self, sink:str|None=None):
+        with self.config.config_lock:
+            output_cfg = self.config.config_data.get('output', {})
+            name = sink or output_cfg.get('sink', DEFAULT_SINK)
+            if name not in SINKS:
+                print(f"[Error] Unknown output sink '{name}' (available: {', '.join(SINKS)}), using '{DEFAULT_SINK}'.")
+                name = DEFAULT_SINK
+            options = {}
+            if name == SINK_RECORDING:
+                # Workers can't hand back an in-memory recording, so they always write a file
+                options['path'] = output_cfg.get('recording_path', '') or DEFAULT_RECORDING_PATH
+        if name == SINK_RECORDING:
+            os.makedirs(os.path.dirname(os.path.abspath(options['path'])), exist_ok=True)
+        return name, options
+
+    def read_shaper_settings(self):
+        try:
+            with self.config.config_lock:
+                mouse_cfg = self.config.config_data.get('mouse', {})
+                output_hz = float(mouse_cfg.get('output_hz', DEFAULT_MOUSE_OUTPUT_HZ))
+                latency_ms = float(mouse_cfg.get('output_latency_ms', DEFAULT_MOUSE_OUTPUT_LATENCY_MS))
+        except (TypeError, ValueError) as e:
+            print(f"[Error] Invalid mouse output settings, keeping previous: {e}")
+            return self.shaper_settings
+
+        return max(0.0, output_hz), max(0.0, latency_ms)
+
+    def update_config(self):
+        """Pushes changed output shaping settings to the running mouse worker."""
+        if self.read_sink_spec()[0] != self.sink_spec[0]:
+            print("[Bridge] Output sink changes take effect after a restart.")
+
+        new_settings = self.read_shaper_settings()
+        if new_settings == self.shaper_settings:
+            return
+
+        self.shaper_settings = new_settings
+        try:
+            self.m_queue.put_nowait(("shaper", new_settings, time.perf_counter()))
+            self.telemetry.enqueued(M_ENQUEUED)
+        except queue.Full:
+            # A hung worker must not block the reload; a respawned one starts from shaper_settings
+            pass
+
+        output_hz, latency_ms = new_settings
+        if output_hz > 0:
+            print(f"[Bridge] Mouse output shaped at {output_hz:.0f}Hz (latency budget {latency_ms:.1f}ms)")
+        else:
+            print("[Bridge] Mouse output shaping disabled.")
+
+    # Sync frames
+
+    def begin_frame(self):
+        """
+        Collects output until end_frame: key strokes become one keyboard batch and relative
+        moves one summed move. Strokes from other threads (timer wheel) in the meantime join
+        the batch; buttons still go straight out, after the frame's motion so far.
+        """
+        with self.ledger_lock:
+            self.frame_keys = []
+
+    def end_frame(self):
+        with self.ledger_lock:
+            self.flush_frame_keys()
+            self.flush_frame_motion()
+            self.frame_keys = None
+
+    def flush_frame_keys(self):
+        """Sends the frame's key strokes so far (ledger_lock held)."""
+        if self.frame_keys:
+            self.k_queue.put(self.frame_keys)
+            self.telemetry.enqueued(K_ENQUEUED)
+            self.frame_keys = []
+
+    def flush_frame_motion(self):
+        """Sends the frame's relative motion so far (ledger_lock held)."""
+        if self.frame_dx or self.frame_dy:
+            try:
+                self.m_queue.put_nowait(("move_rel", (self.frame_dx, self.frame_dy), self.frame_t))
+                self.telemetry.enqueued(M_ENQUEUED)
+            except:
+                self.telemetry.dropped_move()
+            self.frame_dx = 0
+            self.frame_dy = 0
+
+    def queue_key(self, stroke:tuple):
+        """Sends one (code, state, t) stroke, or adds it to the open frame (ledger_lock held)."""
+        if self.frame_keys is not None:
+            self.frame_keys.append(stroke)
+        else:
+            self.k_queue.put(stroke)
+            self.telemetry.enqueued(K_ENQUEUED)
+
+    # Keyboard API (redundant downs/ups are dropped by the ledger)
+    def key_down(self, code):
+        with self.ledger_lock:
+            if code in self.held_keys:
+                return
+            self.held_keys.add(code)
+            self.queue_key((code, 0, time.perf_counter()))
+
+    def key_up(self, code):
+        with self.ledger_lock:
+            if code not in self.held_keys:
+                return
+            self.held_keys.discard(code)
+            self.queue_key((code, 1, time.perf_counter()))
+
+    def send_keys(self, strokes):
+        """Queues (code, state) strokes (0 = Down, 1 = Up) as one batch; the ledger drops redundant ones."""
+        with self.ledger_lock:
+            now = time.perf_counter()
+            batch = []
+            for code, state in strokes:
+                if state == 0:
+                    if code in self.held_keys:
+                        continue
+                    self.held_keys.add(code)
+                else:
+                    if code not in self.held_keys:
+                        continue
+                    self.held_keys.discard(code)
+                batch.append((code, state, now))
+            if self.frame_keys is not None:
+                self.frame_keys.extend(batch)
+            elif batch:
+                self.k_queue.put(batch)
+                self.telemetry.enqueued(K_ENQUEUED)
 
     # Mouse API
     def mouse_move_rel(self, dx, dy):
+        if self.frame_keys is not None:
+            with self.ledger_lock:
+                if self.frame_keys is not None:
+                    if not self.frame_dx and not self.frame_dy:
+                        self.frame_t = time.perf_counter()
+                    self.frame_dx += dx
+                    self.frame_dy += dy
+                    return
         try:
-            self.m_queue.put_nowait(("move_rel", (dx, dy)))
-        except: pass # Drop move if flooded
+            self.m_queue.put_nowait(("move_rel", (dx, dy), time.perf_counter()))
+            self.telemetry.enqueued(M_ENQUEUED)
+        except:
+            self.telemetry.dropped_move() # Drop move if flooded
 
     def mouse_move_abs(self, x, y):
-        abs_x = int((x * 65535) / self.screen_w)
-        abs_y = int((y * 65535) / self.screen_h)
-        self.m_queue.put(("move_abs", (abs_x, abs_y)))
+        """
+        x/y are absolute desktop units (0 - ABS_UNITS), see Mapper.device_to_game_abs. Only the
+        newest position is kept for the worker; a wake token is queued when it has taken the last one.
+        """
+        now = time.perf_counter()
+        slot = self.abs_slot
+        with self.abs_lock:
+            slot[ABS_SEQ] += 1
+            slot[ABS_X] = x
+            slot[ABS_Y] = y
+            slot[ABS_T] = now
+            slot[ABS_SEQ] += 1
+            if slot[ABS_WAKE]:
+                return
+            slot[ABS_WAKE] = 1.0
+        try:
+            self.m_queue.put_nowait(("move_abs", None, now))
+            self.telemetry.enqueued(M_ENQUEUED)
+        except: pass # Full queue: the worker checks the slot once it has drained it
+
+    def post_button(self, flags):
+        """Queues a button on the priority lane and wakes the mouse worker if it is idle (ledger_lock held)."""
+        # Motion of the open frame happened before this button
+        self.flush_frame_motion()
+        now = time.perf_counter()
+        self.b_queue.put(("button", flags, now))
+        self.telemetry.enqueued(B_ENQUEUED)
+        try:
+            self.m_queue.put_nowait(("wake", None, now))
+            self.telemetry.enqueued(M_ENQUEUED)
+        except: pass # Full queue means the worker is busy and will see the button next
 
-    def left_click_down(self): self.m_queue.put(("button", LEFT_BUTTON_DOWN))
-    def left_click_up(self): self.m_queue.put(("button", LEFT_BUTTON_UP))
-    def right_click_down(self): self.m_queue.put(("button", RIGHT_BUTTON_DOWN))
-    def right_click_up(self): self.m_queue.put(("button", RIGHT_BUTTON_UP))
-    def middle_click_down(self): self.m_queue.put(("button", MIDDLE_BUTTON_DOWN))
-    def middle_click_up(self): self.m_queue.put(("button", MIDDLE_BUTTON_UP))
+    def button_down(self, down_flag):
+        with self.ledger_lock:
+            if self.held_buttons & down_flag:
+                return
+            self.held_buttons |= down_flag
+            self.post_button(down_flag)
+
+    def button_up(self, down_flag):
+        with self.ledger_lock:
+            if not self.held_buttons & down_flag:
+                return
+            self.held_buttons &= ~down_flag
+            self.post_button(BUTTON_UP_FLAGS[down_flag])
+
+    def left_click_down(self): self.button_down(LEFT_BUTTON_DOWN)
+    def left_click_up(self): self.button_up(LEFT_BUTTON_DOWN)
+    def right_click_down(self): self.button_down(RIGHT_BUTTON_DOWN)
+    def right_click_up(self): self.button_up(RIGHT_BUTTON_DOWN)
+    def middle_click_down(self): self.button_down(MIDDLE_BUTTON_DOWN)
+    def middle_click_up(self): self.button_up(MIDDLE_BUTTON_DOWN)
+
+    def click_latency(self):
+        """Returns (clicks, average ms, worst ms) of click-to-inject latency since start."""
+        snapshot = self.telemetry.snapshot()
+        return (BridgeTelemetry.count(snapshot, BUTTON_LATENCY),
+                BridgeTelemetry.mean_ms(snapshot, BUTTON_LATENCY),
+                BridgeTelemetry.worst_ms(snapshot, BUTTON_LATENCY))
 
     def release_all(self):
-        """Sends 'UP' signals for all critical keys and mouse buttons."""
+        """Sends 'UP' signals for every key and mouse button the ledger holds, as one batch per worker."""
         print("[Bridge] Emergency Release: Clearing all input states...")
-        with self.bridge_lock:
-            maintain_bridge_health(self)
-            
-            # Clear Mouse buttons
-            for btn_up in [LEFT_BUTTON_UP, RIGHT_BUTTON_UP, MIDDLE_BUTTON_UP]:
-                self.m_queue.put(("button", btn_up))
-
-            internal_mouse_codes = {M_LEFT, M_RIGHT, M_MIDDLE}
-            unique_codes = set(SCANCODES.values()) - internal_mouse_codes
-            for code in unique_codes:
-                self.k_queue.put((code, 1))
+        with self.ledger_lock:
+            # Downs waiting in an open frame must reach the worker before their ups
+            self.flush_frame_keys()
+            now = time.perf_counter()
+            key_ups = [(code, 1, now) for code in self.held_keys]
+            self.held_keys.clear()
+
+            # Combined up flags release every held button in a single stroke
+            button_ups = 0
+            for down_flag, up_flag in BUTTON_UP_FLAGS.items():
+                if self.held_buttons & down_flag:
+                    button_ups |= up_flag
+            self.held_buttons = 0
+
+            if key_ups:
+                self.k_queue.put(key_ups)
+                self.telemetry.enqueued(K_ENQUEUED)
+            if button_ups:
+                self.post_button(button_ups)
             
-        print("[Bridge] Release signals dispatched.")
\ No newline at end of file
+        print(f"[Bridge] Release signals dispatched ({len(key_ups)} keys, buttons: {button_ups:#06x}).")
@@ -0,0 +1,152 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .key_mapper import KeyMapper
+    from .scheduler import TimerWheel
+
+# Gesture timings used when a layout entry leaves them out (milliseconds)
+DEFAULT_TAP_MS = 40
+DEFAULT_HOLD_MS = 400
+DEFAULT_DOUBLE_MS = 250
+
+
+class GestureSpec:
+    """
+    Compiled "gesture" entry of a zone. Keys are (scancode, press, release) tuples.
+
+    A lift before hold_ms is a tap: the zone's own key is pressed for tap_ms (after double_ms
+    when a double-tap key is set, to rule out a second tap). Staying down for hold_ms presses
+    the hold key until the lift. A second touch within double_ms of a tap pulses the double key.
+    """
+    def __init__(self, gesture:dict, tap_key:tuple, hold_key:tuple|None, double_key:tuple|None):
+        self.tap_s = float(gesture.get('tap_ms', DEFAULT_TAP_MS)) / 1000
+        self.hold_s = float(gesture.get('hold_ms', DEFAULT_HOLD_MS)) / 1000
+        self.double_s = float(gesture.get('double_ms', DEFAULT_DOUBLE_MS)) / 1000
+        self.tap_key = tap_key
+        self.hold_key = hold_key
+        self.double_key = double_key
+
+
+class GestureState:
+    __slots__ = ('hold_timer', 'tap_timer', 'holding', 'consumed')
+
+    def __init__(self):
+        self.hold_timer = None
+        self.tap_timer = None
+        self.holding = False
+        self.consumed = False
+
+
+class GestureTracker:
+    """
+    Per-zone gesture state machines for KeyMapper. Touch handlers call down()/up() with
+    events_lock held; timer callbacks run on the wheel thread and take the lock themselves.
+    Every emitted key goes through KeyMapper.press_key/release_key, so it shares the key
+    reference counts with plain zones.
+    """
+    def __init__(self, key_mapper:KeyMapper, wheel:TimerWheel):
+        self.key_mapper = key_mapper
+        self.wheel = wheel
+        self.states = {}
+        # { slot_int: [zone_index, ...] } gesture zones under each finger
+        self.fingers = {}
+        # Fixed-length presses in flight: { pulse id: (timer, scancode, release) }
+        self.pulses = {}
+        self.next_pulse = 0
+        # Bumped by cancel_all, so callbacks that already left the wheel can tell they are stale
+        self.generation = 0
+
+    # Touch side (events_lock held)
+
+    def down(self, slot:int, index:int):
+        spec = self.key_mapper.layout.gestures[index]
+        state = self.states.get(index)
+        if state is None:
+            state = self.states[index] = GestureState()
+        self.fingers.setdefault(slot, []).append(index)
+
+        if spec.double_key is not None and state.tap_timer is not None:
+            # Second touch inside the window: the pending tap becomes a double-tap
+            self.wheel.cancel(state.tap_timer)
+            state.tap_timer = None
+            state.consumed = True
+            self.pulse(spec.double_key, spec.tap_s)
+            return
+
+        state.consumed = False
+        if spec.hold_key is not None:
+            state.hold_timer = self.wheel.schedule(spec.hold_s, self.on_hold, index, self.generation)
+
+    def up(self, slot:int):
+        for index in self.fingers.pop(slot, ()):
+            spec = self.key_mapper.layout.gestures[index]
+            state = self.states[index]
+
+            if state.consumed:
+                state.consumed = False
+            elif state.holding:
+                state.holding = False
+                self.key_mapper.release_key(spec.hold_key[0], spec.hold_key[2])
+            else:
+                self.wheel.cancel(state.hold_timer)
+                state.hold_timer = None
+                if spec.double_key is not None:
+                    state.tap_timer = self.wheel.schedule(spec.double_s, self.on_tap, index, self.generation)
+                else:
+                    self.pulse(spec.tap_key, spec.tap_s)
+
+    def pulse(self, key:tuple, duration:float):
+        scancode, press, release = key
+        self.key_mapper.press_key(scancode, press)
+        self.next_pulse += 1
+        timer = self.wheel.schedule(duration, self.on_pulse_end, self.next_pulse, self.generation)
+        self.pulses[self.next_pulse] = (timer, scancode, release)
+
+    def cancel_all(self):
+        """Drops pending gestures and lets go of every key they hold (events_lock held)."""
+        self.generation += 1
+        for state in self.states.values():
+            self.wheel.cancel(state.hold_timer)
+            self.wheel.cancel(state.tap_timer)
+        for index, state in self.states.items():
+            if state.holding:
+                hold_key = self.key_mapper.layout.gestures[index].hold_key
+                self.key_mapper.release_key(hold_key[0], hold_key[2])
+        for timer, scancode, release in self.pulses.values():
+            self.wheel.cancel(timer)
+            self.key_mapper.release_key(scancode, release)
+        self.states.clear()
+        self.fingers.clear()
+        self.pulses.clear()
+
+    # Wheel side
+
+    def on_hold(self, index:int, generation:int):
+        with self.key_mapper.events_lock:
+            state = self.states.get(index)
+            # A re-armed timer (lift and touch again while this callback waited) isn't due yet
+            if (generation != self.generation or state is None or state.hold_timer is None
+                    or state.hold_timer.deadline > self.wheel.clock()):
+                return
+            state.hold_timer = None
+            state.holding = True
+            hold_key = self.key_mapper.layout.gestures[index].hold_key
+            self.key_mapper.press_key(hold_key[0], hold_key[1])
+
+    def on_tap(self, index:int, generation:int):
+        with self.key_mapper.events_lock:
+            state = self.states.get(index)
+            if (generation != self.generation or state is None or state.tap_timer is None
+                    or state.tap_timer.deadline > self.wheel.clock()):
+                return
+            state.tap_timer = None
+            spec = self.key_mapper.layout.gestures[index]
+            self.pulse(spec.tap_key, spec.tap_s)
+
+    def on_pulse_end(self, pulse:int, generation:int):
+        with self.key_mapper.events_lock:
+            if generation != self.generation:
+                return
+            _, scancode, release = self.pulses.pop(pulse)
+            self.key_mapper.release_key(scancode, release)
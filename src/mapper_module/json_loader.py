@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING
 
 import json
 import os
+import hashlib
 import time
 import keyboard
 import win32gui
@@ -23,7 +24,8 @@ class JSONLoader():
         # State tracking
         self.last_loaded_json_path = None
         self.last_loaded_json_timestamp = 0
-        self.json_data = {}
+        self.json_data = []
+        self.json_digest = None
         self.last_reload_time = 0
         
         # Load immediately
@@ -110,18 +112,20 @@ class JSONLoader():
         self.config.reload_config()            
         
     def process_json(self, json_file_path):
-        normalized_zones = {}
+        """Returns the layout as a list of normalized zone dicts (several zones may share a scancode)."""
+        normalized_zones = []
         
         if not os.path.exists(json_file_path):
             _str = f"Error: File '{json_file_path}' not found."
             raise RuntimeError(_str)
 
-        with open(json_file_path, mode='r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError as e:
-                _str = f"Invalid JSON syntax in '{json_file_path}': {e}"
-                raise RuntimeError(_str)
+        with open(json_file_path, mode='rb') as f:
+            raw = f.read()
+        try:
+            data = json.loads(raw.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            _str = f"Invalid JSON syntax in '{json_file_path}': {e}"
+            raise RuntimeError(_str)
 
         try:
             metadata = data["metadata"]
@@ -136,6 +140,8 @@ class JSONLoader():
 
         self.width = screen_width
         self.height = screen_height
+        # Identifies this exact layout file (keys the zone raster cache)
+        self.json_digest = hashlib.sha1(raw).hexdigest()
 
         for item in content:
             scancode = item.get("scancode")
@@ -147,8 +153,15 @@ class JSONLoader():
             is_rect = zone_type == RECT 
 
             zone_data = {}                
+            zone_data['scancode'] = scancode
             zone_data['name'] = item.get('name', '')
             zone_data['type'] = zone_type
+            zone_data['slide'] = bool(item.get('slide', False))
+            zone_data['repeat_hz'] = item.get('repeat_hz', 0)
+            if isinstance(item.get('gesture'), dict):
+                zone_data['gesture'] = item['gesture']
+            if isinstance(item.get('macro'), list):
+                zone_data['macro'] = item['macro']
             
             try:
                 if is_circ:
@@ -168,7 +181,7 @@ class JSONLoader():
                     zone_data['val3'] = float(item['val3'])
                     zone_data['val4'] = float(item['val4'])
                 
-                normalized_zones[scancode] = zone_data
+                normalized_zones.append(zone_data)
                 
             except (ValueError, KeyError) as e:
                 print(f"Skipping invalid item: {scancode} with name: {zone_data['name']}. Error: {e}")
@@ -3,15 +3,14 @@ from typing import TYPE_CHECKING
 
 import time
 import threading
-from .utils import (
-    RECT, CIRCLE, M_LEFT, M_RIGHT, M_MIDDLE,
-    MOUSE_WHEEL_CODE, SPRINT_DISTANCE_CODE, 
-    is_in_circle, is_in_rect, MapperEvent,
-    DOWN, UP, SCANCODES
-)
+from functools import partial
+from .utils import MapperEvent, DOWN, UP, PRESSED, DEFAULT_SLIDE_HYSTERESIS_PX
+from .gestures import GestureTracker
+from .scheduler import RepeatScheduler, MacroSequencer
 
 if TYPE_CHECKING:
     from .mapper import Mapper
+    from .layout import CompiledLayout
     from .utils import TouchEvent
     
 class KeyMapper():
@@ -21,61 +20,76 @@ class KeyMapper():
         self.mapper_event_dispatcher = self.mapper.mapper_event_dispatcher
         self.interception_bridge = mapper.interception_bridge
 
-        # State Tracking: { slot_int: [[scancode(int), zone_data(dict), is_wasd_finger(bool)],...] }
+        # State Tracking: { slot_int: [[zone_index(int), is_wasd_finger(bool)],...] }
         self.events_dict = {}
         self.events_lock = threading.Lock()
+        # Fingers holding each key: several zones (or fingers) may press the same key
+        self.key_holds = {}
+        # Fingers that went down on a slide zone: { slot_int: held slide zone index, or -1 between zones }
+        self.slide_slots = {}
+        self.slide_hysteresis_px = DEFAULT_SLIDE_HYSTERESIS_PX
+        # Tap / hold / double-tap zones, timed on the Mapper's shared timer wheel
+        self.gestures = GestureTracker(self, mapper.timer_wheel)
+        # Turbo zones: { slot_int: [Repeater, ...] }
+        self.repeats = RepeatScheduler(mapper.timer_wheel, self.events_lock)
+        self.repeat_slots = {}
+        # Macro zones: { slot_int: [MacroRun, ...] }
+        self.macros = MacroSequencer(mapper.timer_wheel, self.events_lock, self.press_key, self.release_key)
+        self.macro_slots = {}
+        # WASD block as last published: touches only move mapper.wasd_block, and the
+        # unblocked -> blocked edge is dispatched once per sync frame by publish_wasd_block
+        self.wasd_blocked = False
         
-        # Blacklist for O(1) filtering
-        self.ignored_names = {MOUSE_WHEEL_CODE, SPRINT_DISTANCE_CODE}
-        
-        # Optimized List for the Touch Loop
-        self.active_zones = []
+        # Compiled layout in use (the Mapper's, swapped in under events_lock)
+        self.layout:CompiledLayout = self.mapper.layout
         
         # Initialize data structures
+        self.update_config()
         self.process_json_data()
         self.mapper_event_dispatcher.register_callback("ON_JSON_RELOAD", self.process_json_data)
+        self.mapper_event_dispatcher.register_callback("ON_CONFIG_RELOAD", self.update_config)
 
     def process_json_data(self):
-        """Pre-processes JSON into a high-speed iteration list."""        
-        temp_zones = []
-        # Get raw data from the loader
-        raw_data = self.mapper.json_loader.json_data
-        
-        for scancode, value in raw_data.items():
-            # Filter out ignored functional codes
-            if value.get('name') in self.ignored_names:
-                continue
-            
-            # Pre-convert scancodes to integers once to save CPU during gameplay
-            try:
-                s_int = int(scancode, 16) if isinstance(scancode, str) else int(scancode)
-                temp_zones.append((s_int, value))
-            except (ValueError, TypeError):
-                continue
-
+        """Switches to the Mapper's newly compiled layout (held zones belong to the old one)."""
         self.release_all()
         with self.events_lock:
-            self.active_zones = temp_zones
+            self.layout = self.mapper.layout
 
-        print(f"[KeyMapper] Hot-path ready: {len(self.active_zones)} zones active.")
+        print(f"[KeyMapper] Hot-path ready: {len(self.layout)} zones active.")
 
-    def send_key_event(self, scancode, down=True):
-        """Dispatches input to Interception Bridge"""    
+    def update_config(self):
+        try:
+            self.slide_hysteresis_px = max(0.0, float(self.config.get('zones', {}).get('slide_hysteresis_px', DEFAULT_SLIDE_HYSTERESIS_PX)))
+        except (ValueError, TypeError):
+            self.slide_hysteresis_px = DEFAULT_SLIDE_HYSTERESIS_PX
 
-        # Map internal codes to Bridge methods
-        if down:
-            if scancode == M_LEFT: self.interception_bridge.left_click_down()
-            elif scancode == M_RIGHT: self.interception_bridge.right_click_down()
-            elif scancode == M_MIDDLE: self.interception_bridge.middle_click_down()
-            else: self.interception_bridge.key_down(scancode)
+        # A recompile of the same layout (e.g. new raster resolution) keeps zone indices, so held keys stay valid
+        with self.events_lock:
+            self.layout = self.mapper.layout
+
+    def press_key(self, scancode:int, press):
+        """Reference-counted key down (events_lock held); `press` is the bound bridge call."""
+        holds = self.key_holds.get(scancode, 0)
+        self.key_holds[scancode] = holds + 1
+        if holds == 0:
+            press()
+
+    def release_key(self, scancode:int, release):
+        holds = self.key_holds.get(scancode, 0) - 1
+        if holds > 0:
+            self.key_holds[scancode] = holds
         else:
-            if scancode == M_LEFT: self.interception_bridge.left_click_up()
-            elif scancode == M_RIGHT: self.interception_bridge.right_click_up()
-            elif scancode == M_MIDDLE: self.interception_bridge.middle_click_up()
-            else: self.interception_bridge.key_up(scancode)
+            self.key_holds.pop(scancode, None)
+            release()
+
+    def press_zone(self, index:int):
+        self.press_key(self.layout.scancodes[index], self.layout.press[index])
+
+    def release_zone(self, index:int):
+        self.release_key(self.layout.scancodes[index], self.layout.release[index])
 
     def touch_down(self, event:TouchEvent, is_visible:bool):        
-        """Triggered on finger contact. Scans active_zones for a hit."""
+        """Triggered on finger contact. Looks the touch up in the compiled layout for a hit."""
         if self.mapper.device_width <= 0 or self.mapper.device_height <= 0:
             return
 
@@ -83,62 +97,153 @@ class KeyMapper():
         nx = event.x / self.mapper.device_width
         ny = event.y / self.mapper.device_height
 
-        # Fast iteration through the pre-filtered list
+        # Covered zones are hits outright; only zones crossing the touched cell need the exact test
         with self.events_lock:
-            for scancode, value in self.active_zones:
-                hit = False
-                v_type = value['type']
-            
-                if v_type == CIRCLE:
-                    if is_in_circle(nx, ny, value['cx'], value['cy'], value['r']):
-                        hit = True
-                elif v_type == RECT:
-                    if is_in_rect(nx, ny, value['x1'], value['x2'], value['y1'], value['y2']):
-                        hit = True
-            
-                if is_visible:
-                    if scancode != SCANCODES[self.mapper.emulator["toggle_key"]]:
-                        hit = False
-            
-                if hit:
-                    # Successfully mapped finger to key
-                    self.send_key_event(scancode, down=True)
-                    # Create a list if it doesn't exist, then append
-                
-                    if event.slot not in self.events_dict:
-                        self.events_dict[event.slot] = []
-                    self.events_dict[event.slot].append([scancode, value, event.is_wasd])
-
-                    if event.is_wasd:
-                        self.mapper.wasd_block += 1
-                        self.mapper_event_dispatcher.dispatch(MapperEvent(action="ON_WASD_BLOCK"))
+            layout = self.layout
+            lookup = layout.visible_lookup if is_visible else layout.lookup
+            for index, needs_test in lookup(nx, ny):
+                if needs_test and not layout.contains(index, nx, ny):
+                    continue
+
+                if layout.gestures[index] is not None:
+                    self.gestures.down(event.slot, index)
+                    continue
+
+                if layout.macros[index] is not None:
+                    self.macro_slots.setdefault(event.slot, []).append(self.macros.start(layout.macros[index]))
+                    continue
+
+                if layout.repeat_hz[index]:
+                    scancode = layout.scancodes[index]
+                    repeater = self.repeats.start(partial(self.press_key, scancode, layout.press[index]),
+                                                  partial(self.release_key, scancode, layout.release[index]),
+                                                  layout.repeat_hz[index])
+                    self.repeat_slots.setdefault(event.slot, []).append(repeater)
+                    continue
+
+                # Successfully mapped finger to key
+                self.hold_zone(event, index)
+
+                # The first slide zone hit follows the finger from now on
+                if layout.slides[index] and event.slot not in self.slide_slots and not is_visible:
+                    self.slide_slots[event.slot] = index
+
+    def hold_zone(self, event:TouchEvent, index:int):
+        self.press_zone(index)
+        # Create a list if it doesn't exist, then append
+        if event.slot not in self.events_dict:
+            self.events_dict[event.slot] = []
+        self.events_dict[event.slot].append([index, event.is_wasd])
+
+        if event.is_wasd:
+            self.mapper.wasd_block += 1
+
+    def touch_move(self, event:TouchEvent, is_visible:bool):
+        """Re-hit-tests a finger held on a slide zone, switching keys as it crosses zone edges."""
+        if event.slot not in self.slide_slots or is_visible:
+            return
+        if self.mapper.device_width <= 0 or self.mapper.device_height <= 0:
+            return
+
+        nx = event.x / self.mapper.device_width
+        ny = event.y / self.mapper.device_height
+
+        with self.events_lock:
+            current = self.slide_slots.get(event.slot)
+            if current is None:
+                return
+            layout = self.layout
+
+            # Hysteresis: the held zone keeps the finger until it is clearly outside
+            if current >= 0 and layout.contains_near(current, nx, ny,
+                                                     self.slide_hysteresis_px / self.mapper.device_width,
+                                                     self.slide_hysteresis_px / self.mapper.device_height):
+                return
+
+            # Locality: zones next to the held one first, then every slide zone
+            target = -1
+            if current >= 0:
+                for index in layout.slide_neighbours[current]:
+                    if layout.contains(index, nx, ny):
+                        target = index
+                        break
+            if target < 0:
+                for index, needs_test in layout.slide_lookup(nx, ny):
+                    if index != current and (not needs_test or layout.contains(index, nx, ny)):
+                        target = index
+                        break
+
+            if target == current:
+                return
+            self.slide_slots[event.slot] = target
+
+            # Press before release, so a key shared by both zones stays down
+            if target >= 0:
+                self.hold_zone(event, target)
+            if current >= 0:
+                self.drop_zone(event.slot, current)
+
+    def drop_zone(self, slot:int, index:int):
+        data_list = self.events_dict.get(slot, [])
+        for i, (held, is_wasd) in enumerate(data_list):
+            if held == index:
+                del data_list[i]
+                self.release_zone(index)
+                if is_wasd:
+                    self.mapper.wasd_block = max(0, self.mapper.wasd_block - 1)
+                break
 
 
     def touch_up(self, event:TouchEvent):        
         """O(1) Dictionary lookup to release keys when finger lifts."""
         with self.events_lock:
+            self.slide_slots.pop(event.slot, None)
+            self.gestures.up(event.slot)
+            for repeater in self.repeat_slots.pop(event.slot, ()):
+                self.repeats.stop(repeater)
+            for run in self.macro_slots.pop(event.slot, ()):
+                self.macros.cancel(run)
             data_list = self.events_dict.pop(event.slot, [])
-            for scancode, _, is_wasd in data_list:
-                self.send_key_event(scancode, down=False)
+            for index, is_wasd in data_list:
+                self.release_zone(index)
                 if is_wasd:
                     self.mapper.wasd_block = max(0, self.mapper.wasd_block - 1)
-                    self.mapper_event_dispatcher.dispatch(MapperEvent(action="ON_WASD_BLOCK"))
     
     def process_touch(self, action, touch_event:TouchEvent, is_visible:bool):
         if action == DOWN:
             self.touch_down(touch_event, is_visible)
+
+        elif action == PRESSED:
+            self.touch_move(touch_event, is_visible)
         
         elif action == UP:
             self.touch_up(touch_event)        
 
+    def publish_wasd_block(self):
+        """End of a sync frame: tells the WASD mapper once when zones started blocking it (outside events_lock)."""
+        with self.events_lock:
+            blocked = self.mapper.wasd_block > 0
+            edge = blocked and not self.wasd_blocked
+            self.wasd_blocked = blocked
+        if edge:
+            self.mapper_event_dispatcher.dispatch(MapperEvent(action="ON_WASD_BLOCK"))
+
     def release_all(self):
         """Flushes all current input states."""
         with self.events_lock:
             for slot in list(self.events_dict.keys()):
                 data_list = self.events_dict.pop(slot, [])
-                for scancode, _, __ in data_list:
-                    self.send_key_event(scancode, down=False)
+                for index, _ in data_list:
+                    self.release_zone(index)
+            self.gestures.cancel_all()
+            self.repeats.stop_all()
+            self.repeat_slots.clear()
+            self.macros.cancel_all()
+            self.macro_slots.clear()
 
             self.events_dict.clear()
+            self.key_holds.clear()
+            self.slide_slots.clear()
             self.mapper.wasd_block = 0
+            self.wasd_blocked = False
         
\ No newline at end of file
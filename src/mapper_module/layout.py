@@ -0,0 +1,187 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from array import array
+from functools import partial
+from .utils import (
+    CIRCLE, RECT, M_LEFT, M_RIGHT, M_MIDDLE, SCANCODES,
+    MOUSE_WHEEL_CODE, SPRINT_DISTANCE_CODE, DEFAULT_RASTER_DOWNSAMPLE,
+    is_in_circle, is_in_rect
+)
+from .zone_index import ZoneGrid, zone_bounds, load_zone_raster
+from .gestures import GestureSpec
+
+if TYPE_CHECKING:
+    from .config import AppConfig
+    from .json_loader import JSONLoader
+    from .bridge import InterceptionBridge
+
+# Layout entries that carry joystick metadata rather than a key
+FUNCTIONAL_ZONE_NAMES = {MOUSE_WHEEL_CODE, SPRINT_DISTANCE_CODE}
+
+# Zone shape kinds in CompiledLayout.kinds
+KIND_CIRCLE, KIND_RECT = 0, 1
+
+# Slide zones whose bounding boxes are closer than this (normalized) are checked first when a finger leaves one
+SLIDE_NEIGHBOUR_GAP = 0.05
+
+
+def read_raster_downsample(config:AppConfig):
+    try:
+        return max(0, int(config.get('zones', {}).get('raster_downsample', DEFAULT_RASTER_DOWNSAMPLE)))
+    except (ValueError, TypeError):
+        return DEFAULT_RASTER_DOWNSAMPLE
+
+
+def parse_scancode(scancode):
+    return int(scancode, 16) if isinstance(scancode, str) else int(scancode)
+
+
+def parse_key(key):
+    """Key reference in a layout option: a SCANCODES name ("LSHIFT", "r") or a scancode."""
+    if isinstance(key, str) and key in SCANCODES:
+        return SCANCODES[key]
+    return parse_scancode(key)
+
+
+class CompiledLayout:
+    """
+    Immutable hot-path form of the loaded JSON layout, built once per load and shared read-only.
+
+    Zone i is described by scancodes[i], kinds[i] and p0..p3[i] (circle: cx, cy, r, 0;
+    rect: x1, x2, y1, y2, all normalized), and is sent with press[i]() / release[i]().
+    Several zones may share a key. The visible lookup only yields zones bound to the
+    toggle key, which are the only ones live while the cursor is shown (menu mode).
+    Slide zones ("slide": true) follow a held finger; slide_neighbours[i] lists the
+    slide zones near zone i and slide_lookup covers all of them. gestures[i] is the
+    zone's GestureSpec, or None for a zone that simply mirrors the finger; macros[i] is its
+    compiled macro script, or None; repeat_hz[i] > 0 makes a turbo zone that pulses its key while held.
+    """
+    def __init__(self, json_loader:JSONLoader, bridge:InterceptionBridge, toggle_scancode:int|None, raster_downsample:int):
+        zones = []
+        for value in json_loader.json_data:
+            if value.get('name') in FUNCTIONAL_ZONE_NAMES:
+                continue
+            if value.get('type') not in (CIRCLE, RECT):
+                continue
+            try:
+                zones.append((parse_scancode(value['scancode']), value))
+            except (ValueError, TypeError, KeyError):
+                continue
+
+        self.zones = tuple(value for _, value in zones)
+        self.scancodes = array('i', (scancode for scancode, _ in zones))
+        self.toggle_scancode = toggle_scancode
+        self.kinds = array('B')
+        self.p0, self.p1, self.p2, self.p3 = array('d'), array('d'), array('d'), array('d')
+        for _, value in zones:
+            if value['type'] == CIRCLE:
+                params = (KIND_CIRCLE, value['cx'], value['cy'], value['r'], 0.0)
+            else:
+                params = (KIND_RECT, value['x1'], value['x2'], value['y1'], value['y2'])
+            for column, param in zip((self.kinds, self.p0, self.p1, self.p2, self.p3), params):
+                column.append(param)
+
+        self.press = tuple(self.bind_send(bridge, scancode, True) for scancode, _ in zones)
+        self.release = tuple(self.bind_send(bridge, scancode, False) for scancode, _ in zones)
+
+        bounds = [zone_bounds(value) for value in self.zones]
+        self.grid = ZoneGrid(bounds)
+        self.lookup = self.grid.entries
+        if raster_downsample:
+            raster = load_zone_raster(list(self.zones), self.grid, json_loader.json_digest,
+                                      json_loader.width, json_loader.height, raster_downsample)
+            self.lookup = raster.lookup
+
+        # Menu mode: same lookup shape, restricted to toggle-key zones
+        self.visible_grid = ZoneGrid([box if scancode == toggle_scancode else None
+                                      for box, scancode in zip(bounds, self.scancodes)])
+        self.visible_lookup = self.visible_grid.entries
+
+        self.gestures = tuple(self.compile_gesture(bridge, scancode, value) for scancode, value in zones)
+
+        self.macros = tuple(None if self.gestures[i] is not None else self.compile_macro(bridge, value)
+                            for i, value in enumerate(self.zones))
+        self.repeat_hz = array('d')
+        for i, value in enumerate(self.zones):
+            try:
+                hz = max(0.0, float(value.get('repeat_hz') or 0.0))
+            except (ValueError, TypeError):
+                hz = 0.0
+            self.repeat_hz.append(0.0 if self.gestures[i] is not None or self.macros[i] is not None else hz)
+
+        # Only plain held zones slide
+        self.slides = bytearray(bool(value.get('slide')) and self.gestures[i] is None
+                                and self.macros[i] is None and not self.repeat_hz[i]
+                                for i, value in enumerate(self.zones))
+        slide_bounds = [box if slide else None for box, slide in zip(bounds, self.slides)]
+        self.slide_lookup = ZoneGrid(slide_bounds).entries
+        self.slide_neighbours = tuple(
+            tuple(j for j, other in enumerate(slide_bounds) if j != i and other is not None and self.boxes_near(box, other))
+            if box is not None else ()
+            for i, box in enumerate(slide_bounds)
+        )
+
+    @staticmethod
+    def bind_send(bridge:InterceptionBridge, scancode:int, down:bool):
+        """Resolves the bridge call for a zone once, so touches never branch on the key type."""
+        if scancode == M_LEFT: return bridge.left_click_down if down else bridge.left_click_up
+        if scancode == M_RIGHT: return bridge.right_click_down if down else bridge.right_click_up
+        if scancode == M_MIDDLE: return bridge.middle_click_down if down else bridge.middle_click_up
+        return partial(bridge.key_down if down else bridge.key_up, scancode)
+
+    def compile_gesture(self, bridge:InterceptionBridge, scancode:int, value:dict):
+        gesture = value.get('gesture')
+        if not gesture:
+            return None
+        try:
+            keys = [None, None]
+            for i, option in enumerate(('hold_key', 'double_key')):
+                if gesture.get(option) is not None:
+                    code = parse_key(gesture[option])
+                    keys[i] = (code, self.bind_send(bridge, code, True), self.bind_send(bridge, code, False))
+            tap_key = (scancode, self.bind_send(bridge, scancode, True), self.bind_send(bridge, scancode, False))
+            return GestureSpec(gesture, tap_key, *keys)
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"Skipping invalid gesture of zone '{value.get('name', '')}': {e}")
+            return None
+
+    def compile_macro(self, bridge:InterceptionBridge, value:dict):
+        """[[key, "down"|"up", delay_ms], ...] -> steps with offsets from the macro start (delays are cumulative)."""
+        macro = value.get('macro')
+        if not macro:
+            return None
+        try:
+            steps = []
+            offset = 0.0
+            for key, action, delay_ms in macro:
+                if action not in ("down", "up"):
+                    raise ValueError(f"step action must be 'down' or 'up', not '{action}'")
+                offset += max(0.0, float(delay_ms)) / 1000
+                code = parse_key(key)
+                steps.append((offset, code, action == "down",
+                              self.bind_send(bridge, code, True), self.bind_send(bridge, code, False)))
+            return tuple(steps)
+        except (ValueError, TypeError) as e:
+            print(f"Skipping invalid macro of zone '{value.get('name', '')}': {e}")
+            return None
+
+    @staticmethod
+    def boxes_near(a:tuple, b:tuple):
+        gap = SLIDE_NEIGHBOUR_GAP
+        return a[0] - gap <= b[2] and b[0] - gap <= a[2] and a[1] - gap <= b[3] and b[1] - gap <= a[3]
+
+    def __len__(self):
+        return len(self.scancodes)
+
+    def contains(self, index:int, nx:float, ny:float):
+        """Exact hit test of one zone (same predicates as the original per-dict checks)."""
+        if self.kinds[index] == KIND_CIRCLE:
+            return is_in_circle(nx, ny, self.p0[index], self.p1[index], self.p2[index])
+        return is_in_rect(nx, ny, self.p0[index], self.p1[index], self.p2[index], self.p3[index])
+
+    def contains_near(self, index:int, nx:float, ny:float, mx:float, my:float):
+        """Hit test of one zone grown by a normalized margin (slide hysteresis)."""
+        if self.kinds[index] == KIND_CIRCLE:
+            return is_in_circle(nx, ny, self.p0[index], self.p1[index], self.p2[index] + mx)
+        return is_in_rect(nx, ny, self.p0[index] - mx, self.p1[index] + mx, self.p2[index] - my, self.p3[index] + my)
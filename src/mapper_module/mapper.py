@@ -7,9 +7,15 @@ from ctypes import wintypes
 import threading
 import win32gui
 from .utils import (
-    DEF_DPI, LONG_DELAY, WINDOW_UPDATE_INTERVAL,
+    DEF_DPI, LONG_DELAY, WINDOW_UPDATE_INTERVAL, SCANCODES, ABS_UNITS,
     MapperEvent, set_dpi_awareness, rotate_resolution
     )
+from .layout import CompiledLayout, read_raster_downsample
+from .scheduler import TimerWheel
+from .telemetry import (
+    BridgeTelemetry, K_ENQUEUED, M_ENQUEUED, B_ENQUEUED, MOVES_DROPPED,
+    KEY_LATENCY, MOVE_LATENCY, BUTTON_LATENCY, KEY_INJECT, MOUSE_INJECT
+    )
 
 if TYPE_CHECKING:
     from .json_loader import JSONLoader
@@ -53,6 +59,7 @@ class Mapper():
         self.pps = pps
         self.event_count = 0
         self.last_pulse_time = time.perf_counter()
+        self.last_telemetry = None
         
         # Window Tracking Setup
         self.screen_w = ctypes.windll.user32.GetSystemMetrics(0)
@@ -62,12 +69,24 @@ class Mapper():
         self.game_window_class_name = None
         self.game_window_info = None
         self.window_update_interval = WINDOW_UPDATE_INTERVAL
+        # Layout -> absolute desktop units affine (a, b, c, d, e, f), replaced whole on every change
+        self.abs_transform = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
         
+        # Shared timer wheel for timed key output (serviced off the reader thread)
+        self.timer_wheel = TimerWheel()
+        self.timer_wheel.start()
+
         # Config & State
         self.wasd_block = 0
+        # Compiled layout shared read-only with the mappers (replaced, never mutated, on reload)
+        self.layout = None
+        self.raster_downsample = None
         self.update_config() 
+        self.touch_reader.bind_matrix_change(self.update_transform)
         
+        # Registered before the mappers' callbacks, so they always see the new layout
         self.mapper_event_dispatcher.register_callback("ON_CONFIG_RELOAD", self.update_config)
+        self.mapper_event_dispatcher.register_callback("ON_JSON_RELOAD", self.update_layout)
         
         # Start the window tracking thread
         self.running = True
@@ -81,7 +100,45 @@ class Mapper():
             self.device_height = self.json_loader.height
             self.dpi = self.json_loader.dpi
             print(f"[INFO] Mapping from Device synced to Resolution: {self.device_width}x{self.device_height}, DPI: {self.dpi}")
+        self.update_transform()
+
+        raster_downsample = read_raster_downsample(self.config)
+        if raster_downsample != self.raster_downsample:
+            self.raster_downsample = raster_downsample
+            self.update_layout()
+
+    def update_layout(self):
+        """Compiles the loaded JSON layout for the touch hot path."""
+        toggle_scancode = SCANCODES.get(self.emulator.get("toggle_key"))
+        self.layout = CompiledLayout(self.json_loader, self.interception_bridge, toggle_scancode, self.raster_downsample)
+        print(f"[INFO] Layout compiled: {len(self.layout)} zones.")
             
+    def update_transform(self):
+        """
+        Recomposes abs_transform: rotated layout space -> the game window's client rect (the whole
+        screen while no window is bound) -> absolute desktop units. Runs when the rotation, the
+        device resolution or the window geometry changes; touch handlers only read the tuple.
+        """
+        # Inputs read and the tuple published under one lock, so two updates racing (window
+        # thread vs rotation) can't publish a transform built from the older inputs last
+        with self.lock:
+            info = self.game_window_info
+            layout_w, layout_h = rotate_resolution(self.device_width, self.device_height, self.touch_reader.rotation)
+            if not layout_w or not layout_h:
+                return
+
+            if info and info['width'] > 0 and info['height'] > 0:
+                left, top, width, height = info['left'], info['top'], info['width'], info['height']
+            else:
+                left, top, width, height = 0, 0, self.screen_w, self.screen_h
+            ux = ABS_UNITS / self.screen_w
+            uy = ABS_UNITS / self.screen_h
+            self.abs_transform = (width / layout_w * ux, 0.0, left * ux, 0.0, height / layout_h * uy, top * uy)
+
+    @staticmethod
+    def window_geometry(info:dict|None):
+        return None if info is None else (info['left'], info['top'], info['width'], info['height'])
+
     # Window Management
     
     def get_window_class_name(self, hwnd):
@@ -176,8 +233,11 @@ class Mapper():
                                             
                     # ATOMIC SWAP: Only hold lock to update the dict reference
                     with self.lock:
+                        moved = self.window_geometry(new_info) != self.window_geometry(self.game_window_info)
                         self.game_window_info = new_info
                         self.window_lost = False
+                    if moved:
+                        self.update_transform()
                         
                 else:
                     # WINDOW IS LOST: Handle scanning                        
@@ -186,6 +246,7 @@ class Mapper():
                         with self.lock:
                             self.window_lost = True
                             self.game_window_info = None
+                        self.update_transform()
                                                 
                     try:
                         # Get window title class name if it doesn't exist
@@ -200,6 +261,7 @@ class Mapper():
                         with self.lock:
                             self.game_window_info = discovered_info
                             self.window_lost = False
+                        self.update_transform()
                         print("[INFO] New window handle bound.")
                             
                     except RuntimeError:
@@ -238,12 +300,9 @@ class Mapper():
         return target_info
     
     def device_to_game_abs(self, x, y):
-        """Thread-safe absolute mapping."""
-        with self.lock:
-            rot = self.touch_reader.rotation
-        
-        rot_dev_w, rot_dev_h = rotate_resolution(self.device_width, self.device_height, rot)
-        return (x / rot_dev_w) * self.screen_w, (y / rot_dev_h) * self.screen_h
+        """Layout coordinates -> absolute desktop units inside the game window (lock-free)."""
+        a, b, c, d, e, f = self.abs_transform
+        return int(a * x + b * y + c), int(d * x + e * y + f)
     
     def dp_to_px(self, dp):
         return dp * (self.dpi / DEF_DPI)
@@ -267,5 +326,19 @@ class Mapper():
             block_indicator = f"[BLOCK ON ({self.wasd_block})]" if self.wasd_block > 0 else "[OPEN]"
 
             print(f"[Monitor] Rate: {pps:>5.1f} Hz | Status: {status:<15} | WASD: {block_indicator:<12}")
+            self.print_bridge_telemetry()
+
+    def print_bridge_telemetry(self):
+        """Per-interval bridge stats: queue high-water marks, drops and p99 latencies."""
+        telemetry = self.interception_bridge.telemetry
+        snapshot = telemetry.snapshot()
+        window = BridgeTelemetry.diff(snapshot, self.last_telemetry)
+        self.last_telemetry = snapshot
+        telemetry.reset_high_water_marks()
 
+        hwm = "/".join(str(int(window[i + 2])) for i in (K_ENQUEUED, M_ENQUEUED, B_ENQUEUED))
+        p99 = lambda hist: f"{BridgeTelemetry.percentile_ms(window, hist, 0.99):.2f}" if BridgeTelemetry.count(window, hist) else "-"
 
+        print(f"          Bridge: Queue HWM k/m/b: {hwm} | Dropped moves: {int(window[MOVES_DROPPED])} | "
+              f"p99 ms key/move/click: {p99(KEY_LATENCY)}/{p99(MOVE_LATENCY)}/{p99(BUTTON_LATENCY)} | "
+              f"Inject p99 ms k/m: {p99(KEY_INJECT)}/{p99(MOUSE_INJECT)}")
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import math
+from .utils import (
+    ACCEL_NONE, ACCEL_POWER, ACCEL_CLASSIC, ACCEL_POINTS,
+    DEFAULT_ACCEL, DEFAULT_ACCEL_EXPONENT, DEFAULT_ACCEL_REF_SPEED, DEFAULT_ACCEL_GAIN, DEFAULT_ACCEL_CAP,
+    ACCEL_TABLE_SIZE, ACCEL_TABLE_MIN_SPEED, ACCEL_TABLE_MAX_SPEED,
+    PREDICT_OFF, PREDICT_CV, PREDICT_KALMAN,
+    DEFAULT_PREDICT, DEFAULT_PREDICT_HORIZON_MS, DEFAULT_PREDICT_MAX_LEAD_PX,
+    DEFAULT_PREDICT_PROCESS_NOISE, DEFAULT_PREDICT_MEASUREMENT_NOISE
+)
+
+TWO_PI = 2.0 * math.pi
+# Sample interval assumed until two timestamped samples have been seen (typical ADB rate)
+DEFAULT_SAMPLE_INTERVAL = 1.0 / 120
+# Acceleration measures speed over at least this much travel time: single-sample gaps
+# (of arrival times above all, which ADB delivers in bunches) are mostly timing noise
+ACCEL_SPEED_WINDOW = 0.024
+# Constant-velocity predictor: EMA weight of each new sample velocity
+PREDICT_CV_ALPHA = 0.5
+# Weight of each new gap in the measured sample interval
+PREDICT_INTERVAL_ALPHA = 0.1
+# Missing this many sample intervals (or the horizon, if longer) means the finger stopped
+PREDICT_SETTLE_INTERVALS = 3
+
+
+class OneEuroFilter:
+    """
+    Adaptive low-pass over the 2D position of one finger (Casiez et al., the "1 Euro filter").
+
+    The cutoff follows the filtered speed, min_cutoff + beta * |v|, so a finger held still is
+    smoothed hard while a flick passes almost untouched. Both axes share the speed estimate.
+    State is a handful of floats updated in place (read the result from .x/.y); the 2*pi
+    factors are folded in at configure time and the derivative alpha, which only depends on
+    the sample interval, is reused while the interval repeats.
+    """
+    def __init__(self, min_cutoff:float, beta:float, d_cutoff:float):
+        self.configure(min_cutoff, beta, d_cutoff)
+        self.reset(0.0, 0.0, 0.0)
+
+    def configure(self, min_cutoff:float, beta:float, d_cutoff:float):
+        self.two_pi_min_cutoff = TWO_PI * min_cutoff
+        self.two_pi_beta = TWO_PI * beta
+        self.two_pi_d_cutoff = TWO_PI * d_cutoff
+        self.alpha_d_interval = None
+        self.alpha_d = 1.0
+
+    def reset(self, x:float, y:float, t:float):
+        """Starts a new stroke at (x, y) without smoothing towards the previous one."""
+        self.x = x
+        self.y = y
+        self.vx = 0.0
+        self.vy = 0.0
+        self.t = t
+        self.interval = DEFAULT_SAMPLE_INTERVAL
+
+    def update(self, x:float, y:float, t:float):
+        te = t - self.t
+        if te > 0:
+            self.t = t
+            self.interval = te
+        else:
+            # Untimed or same-frame sample: assume the last known spacing
+            te = self.interval
+
+        if te != self.alpha_d_interval:
+            r = self.two_pi_d_cutoff * te
+            self.alpha_d = r / (r + 1.0)
+            self.alpha_d_interval = te
+        alpha_d = self.alpha_d
+
+        # Smoothed speed, then the position with a cutoff that grows with it
+        self.vx += alpha_d * ((x - self.x) / te - self.vx)
+        self.vy += alpha_d * ((y - self.y) / te - self.vy)
+        speed = math.sqrt(self.vx * self.vx + self.vy * self.vy)
+        r = (self.two_pi_min_cutoff + self.two_pi_beta * speed) * te
+        alpha = r / (r + 1.0)
+        self.x += alpha * (x - self.x)
+        self.y += alpha * (y - self.y)
+
+
+class AccelCurve:
+    """
+    Mouse acceleration as a dense speed -> gain table, compiled once from the [mouse] curve
+    settings so the hot path does a lookup and a lerp instead of pow(). Speeds are finger
+    speeds in device px/s, indexed by their log: power curves are straight lines there, and
+    the slow end, where they bend hardest, gets as many entries per octave as the fast end.
+    Outside [min_speed, max_speed] the gain stays flat.
+    """
+    def __init__(self, gain_of, size:int=ACCEL_TABLE_SIZE, min_speed:float=ACCEL_TABLE_MIN_SPEED, max_speed:float=ACCEL_TABLE_MAX_SPEED):
+        self.min_speed = min_speed
+        self.log_min = math.log(min_speed)
+        # Step in log(px/s)
+        self.step = math.log(max_speed / min_speed) / size
+        self.inv_step = 1.0 / self.step
+        self.last = size
+        # A tuple hands out its stored floats; an array would box a new one per read
+        self.table = tuple(gain_of(min_speed * math.exp(i * self.step)) for i in range(size + 1))
+
+    def gain(self, speed:float):
+        if speed <= self.min_speed:
+            return self.table[0]
+        pos = (math.log(speed) - self.log_min) * self.inv_step
+        i = int(pos)
+        if i >= self.last:
+            return self.table[self.last]
+        g0 = self.table[i]
+        return g0 + (self.table[i + 1] - g0) * (pos - i)
+
+
+def compile_accel_curve(mouse_cfg:dict):
+    """
+    AccelCurve of the [mouse] settings, or None for a plain linear response:
+      power   - gain = (speed / accel_ref_speed) ** (accel_exponent - 1), up to accel_cap
+      classic - gain = 1 + accel_gain * speed / accel_ref_speed, up to accel_cap
+      points  - piecewise linear through accel_points = [[speed, gain], ...]
+    """
+    kind = str(mouse_cfg.get('accel', DEFAULT_ACCEL)).lower()
+    if kind == ACCEL_NONE:
+        return None
+    try:
+        cap = float(mouse_cfg.get('accel_cap', DEFAULT_ACCEL_CAP))
+        ref = float(mouse_cfg.get('accel_ref_speed', DEFAULT_ACCEL_REF_SPEED))
+        if kind == ACCEL_POWER:
+            exponent = float(mouse_cfg.get('accel_exponent', DEFAULT_ACCEL_EXPONENT))
+            # Floor of 1px/s keeps exponents below 1 finite at rest
+            return AccelCurve(lambda v: min(cap, (max(v, 1.0) / ref) ** (exponent - 1.0)))
+        if kind == ACCEL_CLASSIC:
+            gain = float(mouse_cfg.get('accel_gain', DEFAULT_ACCEL_GAIN))
+            return AccelCurve(lambda v: min(cap, 1.0 + gain * v / ref))
+        if kind == ACCEL_POINTS:
+            points = sorted((float(v), float(g)) for v, g in mouse_cfg.get('accel_points', []))
+            if not points:
+                raise ValueError("accel_points is empty")
+            return AccelCurve(lambda v: piecewise_gain(points, v))
+        raise ValueError(f"unknown curve '{kind}'")
+    except (ValueError, TypeError, ZeroDivisionError) as e:
+        print(f"[Warning] Ignoring mouse acceleration curve: {e}")
+        return None
+
+
+def piecewise_gain(points:list[tuple[float, float]], speed:float):
+    if speed <= points[0][0]:
+        return points[0][1]
+    for (v0, g0), (v1, g1) in zip(points, points[1:]):
+        if speed <= v1:
+            return g0 + (g1 - g0) * (speed - v0) / (v1 - v0) if v1 > v0 else g1
+    return points[-1][1]
+
+
+class MotionPredictor:
+    """
+    Extrapolates a finger along its velocity to hide transport latency.
+
+    After update(x, y, t), .x/.y is the real sample plus a lead of velocity * horizon (at most
+    max_lead px long). The lead is re-derived from every real sample rather than accumulated,
+    so the output never strays from the finger by more than the current lead, and settle()
+    drops it when the finger stops. Velocity comes from an EMA of sample velocities ("cv") or
+    from a constant-velocity Kalman filter ("kalman"); both axes share the Kalman covariance,
+    since they see the same timing and noise. A horizon of 0 predicts one measured sample interval ahead.
+    t should be the time the sample was taken (TouchEvent.ts when known): arrival times bunch
+    up in ADB delivery, and a gap of microseconds inside a bunch would blow up the velocity.
+    """
+    def __init__(self, mode:str, horizon_s:float, max_lead:float, process_noise:float, measurement_noise:float):
+        self.kalman = mode == PREDICT_KALMAN
+        self.horizon = horizon_s
+        self.max_lead = max_lead
+        self.q = process_noise
+        self.r = measurement_noise
+        self.interval = DEFAULT_SAMPLE_INTERVAL
+        self.reset(0.0, 0.0, 0.0)
+
+    def reset(self, x:float, y:float, t:float):
+        self.real_x = self.x = x
+        self.real_y = self.y = y
+        self.t = t
+        self.vx = 0.0
+        self.vy = 0.0
+        # Kalman state: filtered position and (shared) covariance [[p00, p01], [p01, p11]]
+        self.kx = x
+        self.ky = y
+        self.p00 = self.r
+        self.p01 = 0.0
+        self.p11 = 1.0e6
+
+    def update(self, x:float, y:float, t:float):
+        dt = t - self.t
+        if dt > 0:
+            self.t = t
+            self.interval += PREDICT_INTERVAL_ALPHA * (dt - self.interval)
+        else:
+            dt = self.interval
+
+        if self.kalman:
+            # Predict (constant velocity, white acceleration noise), then correct with the sample
+            q = self.q
+            dt2 = dt * dt
+            p00 = self.p00 + dt * (2.0 * self.p01 + dt * self.p11) + q * dt2 * dt2 * 0.25
+            p01 = self.p01 + dt * self.p11 + q * dt2 * dt * 0.5
+            p11 = self.p11 + q * dt2
+            s = p00 + self.r
+            k0 = p00 / s
+            k1 = p01 / s
+            ex = x - (self.kx + self.vx * dt)
+            ey = y - (self.ky + self.vy * dt)
+            self.kx += self.vx * dt + k0 * ex
+            self.ky += self.vy * dt + k0 * ey
+            self.vx += k1 * ex
+            self.vy += k1 * ey
+            self.p00 = (1.0 - k0) * p00
+            self.p01 = (1.0 - k0) * p01
+            self.p11 = p11 - k1 * p01
+        else:
+            self.vx += PREDICT_CV_ALPHA * ((x - self.real_x) / dt - self.vx)
+            self.vy += PREDICT_CV_ALPHA * ((y - self.real_y) / dt - self.vy)
+
+        self.real_x = x
+        self.real_y = y
+        horizon = self.horizon if self.horizon > 0 else self.interval
+        lead_x = self.vx * horizon
+        lead_y = self.vy * horizon
+        lead_sq = lead_x * lead_x + lead_y * lead_y
+        if lead_sq > self.max_lead * self.max_lead:
+            shrink = self.max_lead / math.sqrt(lead_sq)
+            lead_x *= shrink
+            lead_y *= shrink
+        self.x = x + lead_x
+        self.y = y + lead_y
+
+    def settle(self):
+        """The finger stopped (or lifted): the output falls back onto the last real sample."""
+        self.x = self.real_x
+        self.y = self.real_y
+        self.vx = 0.0
+        self.vy = 0.0
+        self.kx = self.real_x
+        self.ky = self.real_y
+        self.p01 = 0.0
+
+
+def compile_predictor(mouse_cfg:dict):
+    """MotionPredictor of the [mouse] predict settings, or None when prediction is off."""
+    mode = str(mouse_cfg.get('predict', DEFAULT_PREDICT)).lower()
+    if mode == PREDICT_OFF:
+        return None
+    try:
+        if mode not in (PREDICT_CV, PREDICT_KALMAN):
+            raise ValueError(f"unknown predictor '{mode}'")
+        return MotionPredictor(mode,
+                               max(0.0, float(mouse_cfg.get('predict_horizon_ms', DEFAULT_PREDICT_HORIZON_MS))) / 1000,
+                               max(0.0, float(mouse_cfg.get('predict_max_lead_px', DEFAULT_PREDICT_MAX_LEAD_PX))),
+                               float(mouse_cfg.get('predict_process_noise', DEFAULT_PREDICT_PROCESS_NOISE)),
+                               max(1e-6, float(mouse_cfg.get('predict_measurement_noise', DEFAULT_PREDICT_MEASUREMENT_NOISE))))
+    except (ValueError, TypeError) as e:
+        print(f"[Warning] Ignoring mouse prediction: {e}")
+        return None
@@ -1,8 +1,15 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 
+import math
+import time
+from collections import deque
 from .utils import (
-    DOWN, UP, PRESSED,
+    DOWN, UP, PRESSED, DEFAULT_MENU_ABSOLUTE,
+    DEFAULT_ONE_EURO, DEFAULT_ONE_EURO_MIN_CUTOFF, DEFAULT_ONE_EURO_BETA, DEFAULT_ONE_EURO_D_CUTOFF
+)
+from .motion import (
+    OneEuroFilter, compile_accel_curve, compile_predictor, ACCEL_SPEED_WINDOW, PREDICT_SETTLE_INTERVALS
 )
 
 if TYPE_CHECKING:
@@ -22,6 +29,31 @@ class MouseMapper():
         self.acc_y = 0.0
         self.left_down = False
         self.scaling_factor = 1.0
+        # Menu mode: map every sample to an absolute position instead of moving relatively
+        self.menu_absolute = DEFAULT_MENU_ABSOLUTE
+        self.abs_x = None
+        self.abs_y = None
+        # Optional One Euro smoothing of the finger position (None = raw deltas)
+        self.smoother = None
+        # Optional speed -> gain curve (None = linear) and the windowed speed it is looked up with:
+        # (sample time, distance travelled) of the last ACCEL_SPEED_WINDOW of the stroke
+        self.accel = None
+        self.travel = 0.0
+        self.travel_history = deque()
+        self.speed = 0.0
+        # Optional motion prediction; its lead is taken back when the finger stops or lifts.
+        # The anchors stay on the real position: lead_x/lead_y is the lead already sent, in output pixels.
+        self.predictor = None
+        self.lead_x = 0.0
+        self.lead_y = 0.0
+        self.wheel = mapper.timer_wheel
+        self.settle_timer = None
+        self.last_sample = 0.0
+        # Sample time of the newest sample (kernel time when the reader has it, else arrival):
+        # the predictor measures velocity on it, while last_sample stays on the wheel clock
+        self.sample_t = 0.0
+        # Bumped on every touch down/up, so a settle timer of an earlier stroke does nothing
+        self.stroke = 0
 
         self.update_config()
 
@@ -47,6 +79,12 @@ class MouseMapper():
                     resolution_ratio = 1.0
 
                 self.scaling_factor = base_sens * resolution_ratio
+                self.menu_absolute = bool(mouse_cfg.get('menu_absolute', DEFAULT_MENU_ABSOLUTE))
+                self.update_smoother(mouse_cfg)
+                self.accel = compile_accel_curve(mouse_cfg)
+                if self.accel is not None:
+                    print(f"[Mouse] Acceleration curve '{mouse_cfg.get('accel')}' compiled ({self.accel.last + 1} entries)")
+                self.update_predictor(mouse_cfg)
                 
                 print(f"[Mouse] Sync: PC width ({pc_w}px) / Phone width ({dev_w}px) = Ratio ({resolution_ratio:.2f})")
                 print(f"[Mouse] Final Scaling Factor: {self.scaling_factor:.4f} (User Sensitivity: {base_sens}x)")
@@ -55,6 +93,38 @@ class MouseMapper():
             print(f"[Error] Mouse config update failed: {e}")
             self.scaling_factor = 1.0
 
+    def update_smoother(self, mouse_cfg:dict):
+        if not mouse_cfg.get('one_euro', DEFAULT_ONE_EURO):
+            self.smoother = None
+            return
+        try:
+            params = (float(mouse_cfg.get('min_cutoff', DEFAULT_ONE_EURO_MIN_CUTOFF)),
+                      float(mouse_cfg.get('beta', DEFAULT_ONE_EURO_BETA)),
+                      float(mouse_cfg.get('d_cutoff', DEFAULT_ONE_EURO_D_CUTOFF)))
+        except (ValueError, TypeError):
+            params = (DEFAULT_ONE_EURO_MIN_CUTOFF, DEFAULT_ONE_EURO_BETA, DEFAULT_ONE_EURO_D_CUTOFF)
+
+        smoother = OneEuroFilter(*params)
+        if self.prev_x is not None:
+            # Enabled mid-stroke: carry on from where the finger is
+            smoother.reset(self.prev_x, self.prev_y, time.perf_counter())
+        self.smoother = smoother
+        print(f"[Mouse] One Euro smoothing: min_cutoff {params[0]}Hz, beta {params[1]}, d_cutoff {params[2]}Hz")
+
+    def update_predictor(self, mouse_cfg:dict):
+        if self.predictor is not None and self.prev_x is not None:
+            # Swapped mid-stroke: drop the old lead before the new predictor takes over
+            self.settle()
+        self.wheel.cancel(self.settle_timer)
+        self.settle_timer = None
+        predictor = compile_predictor(mouse_cfg)
+        if predictor is not None and self.prev_x is not None:
+            predictor.reset(self.prev_x, self.prev_y, self.sample_t)
+        self.predictor = predictor
+        if predictor is not None:
+            horizon = f"{predictor.horizon * 1000:g}ms" if predictor.horizon > 0 else "measured"
+            print(f"[Mouse] Motion prediction '{mouse_cfg.get('predict')}': horizon {horizon}, max lead {predictor.max_lead:g}px")
+
     def touch_down(self, touch_event:TouchEvent, is_visible:bool):
         """
         Anchor the start position and reset precision accumulators
@@ -63,9 +133,25 @@ class MouseMapper():
         self.prev_y = touch_event.y
         self.acc_x = 0.0
         self.acc_y = 0.0
+        self.lead_x = 0.0
+        self.lead_y = 0.0
+        self.travel = 0.0
+        self.travel_history.clear()
+        self.sample_t = touch_event.ts or touch_event.t
+        self.travel_history.append((self.sample_t, 0.0))
+        self.speed = 0.0
+        if self.smoother is not None:
+            self.smoother.reset(self.prev_x, self.prev_y, touch_event.t)
+        if self.predictor is not None:
+            self.predictor.reset(self.prev_x, self.prev_y, self.sample_t)
+        self.wheel.cancel(self.settle_timer)
+        self.settle_timer = None
+        self.stroke += 1
 
         if is_visible:           
             _x, _y = self.mapper.device_to_game_abs(self.prev_x, self.prev_y)
+            self.abs_x = _x
+            self.abs_y = _y
             self.interception_bridge.mouse_move_abs(_x, _y)
             self.interception_bridge.left_click_down()
             self.left_down = True
@@ -80,18 +166,77 @@ class MouseMapper():
             self.touch_down(touch_event, is_visible)
             return
 
+        if is_visible and self.menu_absolute:
+            # Menu: the cursor stays under the finger (the relative anchors are left alone)
+            _x, _y = self.mapper.device_to_game_abs(touch_event.x, touch_event.y)
+            if _x != self.abs_x or _y != self.abs_y:
+                self.abs_x = _x
+                self.abs_y = _y
+                self.interception_bridge.mouse_move_abs(_x, _y)
+            return
+
+        x = touch_event.x
+        y = touch_event.y
+        sample_t = self.sample_t = touch_event.ts or touch_event.t
+        # Smooth the position first, so scaling and sub-pixel carry see the filtered motion
+        smoother = self.smoother
+        if smoother is not None:
+            smoother.update(x, y, touch_event.t)
+            x = smoother.x
+            y = smoother.y
+        # Then predict ahead; the lead is sent through the same gain as the motion, and settle() takes it back
+        predictor = self.predictor
+        if predictor is not None:
+            predictor.update(x, y, sample_t)
+            self.last_sample = touch_event.t
+            if self.settle_timer is None:
+                self.settle_timer = self.wheel.schedule_at(self.settle_deadline(), self.on_settle, self.stroke)
+
         # Calculate Raw Delta
-        raw_dx = touch_event.x - self.prev_x
-        raw_dy = touch_event.y - self.prev_y
+        raw_dx = x - self.prev_x
+        raw_dy = y - self.prev_y
 
         # Update anchors immediately
-        self.prev_x = touch_event.x
-        self.prev_y = touch_event.y
+        self.prev_x = x
+        self.prev_y = y
 
         # Apply Multiplier and add previous remainders (Sub-pixel precision)
         # Using float math here is necessary for 1:1 feel
-        calc_dx = (raw_dx * self.scaling_factor) + self.acc_x
-        calc_dy = (raw_dy * self.scaling_factor) + self.acc_y
+        scale = self.scaling_factor
+        accel = self.accel
+        if accel is not None:
+            # Speed over the last ACCEL_SPEED_WINDOW, on kernel sample times when the reader has them
+            t = sample_t
+            self.travel += math.sqrt(raw_dx*raw_dx + raw_dy*raw_dy)
+            history = self.travel_history
+            history.append((t, self.travel))
+            while len(history) > 1 and t - history[1][0] >= ACCEL_SPEED_WINDOW:
+                history.popleft()
+            t0, travel0 = history[0]
+            if t > t0:
+                self.speed = (self.travel - travel0) / (t - t0)
+            # AccelCurve.gain, inlined: log-speed table lookup and lerp
+            table = accel.table
+            if self.speed <= accel.min_speed:
+                scale *= table[0]
+            else:
+                pos = (math.log(self.speed) - accel.log_min) * accel.inv_step
+                i = int(pos)
+                if i >= accel.last:
+                    scale *= table[accel.last]
+                else:
+                    g0 = table[i]
+                    scale *= g0 + (table[i + 1] - g0) * (pos - i)
+        calc_dx = (raw_dx * scale) + self.acc_x
+        calc_dy = (raw_dy * scale) + self.acc_y
+        if predictor is not None:
+            # Move the sent lead to the new one, in output pixels
+            lead_x = (predictor.x - x) * scale
+            lead_y = (predictor.y - y) * scale
+            calc_dx += lead_x - self.lead_x
+            calc_dy += lead_y - self.lead_y
+            self.lead_x = lead_x
+            self.lead_y = lead_y
 
         # Truncate to Integer (Actual pixels to move)
         final_dx = int(calc_dx)
@@ -111,7 +256,46 @@ class MouseMapper():
         # Physical movement execution
         self.interception_bridge.mouse_move_rel(final_dx, final_dy)
 
+    def settle_deadline(self):
+        predictor = self.predictor
+        return self.last_sample + max(PREDICT_SETTLE_INTERVALS * predictor.interval, predictor.horizon)
+
+    def settle(self):
+        """Moves the cursor from the predicted position back onto the real one (config_lock held)."""
+        self.predictor.settle()
+        # Exactly the lead that was sent, whatever gain it went out with
+        calc_dx = self.acc_x - self.lead_x
+        calc_dy = self.acc_y - self.lead_y
+        self.lead_x = 0.0
+        self.lead_y = 0.0
+        final_dx = int(calc_dx)
+        final_dy = int(calc_dy)
+        self.acc_x = calc_dx - final_dx
+        self.acc_y = calc_dy - final_dy
+        if final_dx or final_dy:
+            self.interception_bridge.mouse_move_rel(final_dx, final_dy)
+
+    def on_settle(self, stroke:int):
+        with self.config.config_lock:
+            if stroke != self.stroke:
+                return
+            if self.predictor is None or self.prev_x is None:
+                self.settle_timer = None
+                return
+            # Samples kept arriving since this was scheduled: wait for the quiet period after the last one
+            deadline = self.settle_deadline()
+            if deadline > self.wheel.clock():
+                self.settle_timer = self.wheel.schedule_at(deadline, self.on_settle, stroke)
+                return
+            self.settle_timer = None
+            self.settle()
+
     def touch_up(self):
+        if self.predictor is not None and self.prev_x is not None:
+            self.settle()
+        self.wheel.cancel(self.settle_timer)
+        self.settle_timer = None
+        self.stroke += 1
         self.prev_x = None
         self.prev_y = None
         self.acc_x = 0.0
@@ -0,0 +1,119 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from .utils import DOWN, UP, PRESSED
+
+if TYPE_CHECKING:
+    from .mapper import Mapper
+    from .mouse_mapper import MouseMapper
+    from .key_mapper import KeyMapper
+    from .wasd_mapper import WASDMapper
+    from .utils import TouchEvent
+
+# Handler table index of a finger: action | ROLE_MOUSE_BIT * is_mouse | ROLE_WASD_BIT * is_wasd
+ROLE_MOUSE_BIT = 4
+ROLE_WASD_BIT = 8
+PIPELINE_SLOTS = 16
+
+
+def handler_index(action:int, is_mouse:bool, is_wasd:bool):
+    return action | (ROLE_MOUSE_BIT if is_mouse else 0) | (ROLE_WASD_BIT if is_wasd else 0)
+
+
+def bind_visible(method, is_visible:bool):
+    """method(touch_event, is_visible) as a one-argument stage (a keyword partial costs several times more per call)."""
+    def stage(touch_event:TouchEvent):
+        method(touch_event, is_visible)
+    return stage
+
+
+def chain(stages:list):
+    """One callable running the stages in order on a TouchEvent (None for no stages)."""
+    if not stages:
+        return None
+    if len(stages) == 1:
+        return stages[0]
+    head = stages[0]
+    tail = chain(stages[1:])
+
+    def run(touch_event:TouchEvent):
+        # A failing stage must not skip the rest (an UP would leave the key mapper's key held)
+        try:
+            head(touch_event)
+        finally:
+            tail(touch_event)
+    return run
+
+
+def compile_handlers(mouse_mapper:MouseMapper, key_mapper:KeyMapper, wasd_mapper:WASDMapper, is_visible:bool):
+    """
+    Handler table of one menu mode: entry handler_index(action, is_mouse, is_wasd) is the chain of
+    mapper calls that finger needs, with is_visible bound and the action already dispatched.
+    Stages that would return straight away for this mode and layout are left out.
+    """
+    layout = key_mapper.layout
+    has_slides = any(layout.slides)
+    has_visible_zones = layout.toggle_scancode is not None and layout.toggle_scancode in layout.scancodes
+
+    handlers = [None] * PIPELINE_SLOTS
+    for is_mouse in (False, True):
+        for is_wasd in (False, True):
+            for action in (DOWN, UP, PRESSED):
+                stages = []
+                # Same order as the per-event dispatch: mouse, keys, joystick
+                if is_mouse:
+                    if action == DOWN:
+                        stages.append(bind_visible(mouse_mapper.touch_down, is_visible))
+                    elif action == PRESSED:
+                        stages.append(bind_visible(mouse_mapper.touch_pressed, is_visible))
+                    else:
+                        stages.append(lambda touch_event, touch_up=mouse_mapper.touch_up: touch_up())
+
+                if action == DOWN:
+                    if not is_visible or has_visible_zones:
+                        stages.append(bind_visible(key_mapper.touch_down, is_visible))
+                elif action == PRESSED:
+                    # Only slide zones track a held finger, and never in menu mode
+                    if not is_visible and has_slides:
+                        stages.append(bind_visible(key_mapper.touch_move, False))
+                else:
+                    stages.append(key_mapper.touch_up)
+
+                if is_wasd:
+                    if action == UP:
+                        stages.append(lambda touch_event, touch_up=wasd_mapper.touch_up: touch_up())
+                    elif not is_visible:
+                        # In menu mode the joystick was released on the switch and ignores the finger
+                        method = wasd_mapper.touch_down if action == DOWN else wasd_mapper.touch_pressed
+                        stages.append(bind_visible(method, False))
+
+                handlers[handler_index(action, is_mouse, is_wasd)] = chain(stages)
+    return tuple(handlers)
+
+
+def compile_pipeline(mapper:Mapper, mouse_mapper:MouseMapper, key_mapper:KeyMapper, wasd_mapper:WASDMapper, is_visible:bool):
+    """
+    Frame processor for TouchReader.bind_frame_processor, specialized for the current layout
+    and menu mode. Recompile (and rebind) whenever either changes; the old one keeps working
+    until the swap, so a frame in flight finishes on the pipeline it started with.
+    """
+    handlers = compile_handlers(mouse_mapper, key_mapper, wasd_mapper, is_visible)
+    bridge = mapper.interception_bridge
+    begin_frame = bridge.begin_frame
+    end_frame = bridge.end_frame
+
+    def process_frame(frame:list[tuple[int, TouchEvent]]):
+        mapper.event_count += len(frame)
+        begin_frame()
+        try:
+            for action, touch_event in frame:
+                handler = handlers[action | (ROLE_MOUSE_BIT if touch_event.is_mouse else 0) | (ROLE_WASD_BIT if touch_event.is_wasd else 0)]
+                if handler is not None:
+                    # One finger's error must not drop the rest of the frame: the reader has
+                    # already retired this frame's UP slots, so a skipped UP is a stuck key
+                    try:
+                        handler(touch_event)
+                    except: pass
+        finally:
+            end_frame()
+    return process_frame
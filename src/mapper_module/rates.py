@@ -0,0 +1,67 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from .utils import DEFAULT_ROLE_RATE_HZ, DEFAULT_WASD_ON_CHANGE
+
+if TYPE_CHECKING:
+    from .config import AppConfig
+
+# Finger roles, as TouchReader assigns them
+ROLE_MOUSE = 0
+ROLE_WASD = 1
+ROLE_KEYS = 2
+ROLE_NAMES = ("mouse", "wasd", "keys")
+
+
+class RatePolicy:
+    """
+    Decides which movement (PRESSED) samples TouchReader dispatches, per finger role.
+
+    Each role has its own minimum interval between dispatches ([rates] <role>_hz, 0 falls back
+    to the ADB rate cap). With wasd_on_change the WASD finger also passes whenever the bound
+    change detector says the sample would change the held keys, so sector flips are never held
+    back by the cap while plain drift inside a sector stays throttled.
+    """
+    def __init__(self, config:AppConfig, rate_cap:float, max_slots:int):
+        self.config = config
+        self.rate_cap = rate_cap
+        self.intervals = [self.interval_of(0.0)] * len(ROLE_NAMES)
+        self.wasd_on_change = DEFAULT_WASD_ON_CHANGE
+        self.change_detector = None
+        self.last_dispatch_times = [0.0] * max_slots
+
+    def interval_of(self, hz:float):
+        if hz <= 0:
+            hz = self.rate_cap
+        return 1.0 / hz if hz > 0 else 0.0
+
+    def update_config(self, config:AppConfig):
+        """Reads [rates] (caller holds config_lock)."""
+        rates = config.get('rates', {})
+        intervals = []
+        for name in ROLE_NAMES:
+            try:
+                intervals.append(self.interval_of(float(rates.get(f"{name}_hz", DEFAULT_ROLE_RATE_HZ))))
+            except (ValueError, TypeError):
+                intervals.append(self.interval_of(DEFAULT_ROLE_RATE_HZ))
+        self.intervals = intervals
+        self.wasd_on_change = bool(rates.get('wasd_on_change', DEFAULT_WASD_ON_CHANGE))
+
+        hz = ", ".join(f"{name} {1.0 / interval:.0f}Hz" if interval else f"{name} uncapped"
+                       for name, interval in zip(ROLE_NAMES, intervals))
+        print(f"[TouchReader] Movement rates: {hz}" + (" (WASD key changes bypass the cap)" if self.wasd_on_change else ""))
+
+    def bind_change_detector(self, change_detector):
+        """change_detector(x, y) -> True when a WASD sample at (x, y) would change the held keys."""
+        self.change_detector = change_detector
+
+    def admit(self, slot:int, role:int, now:float, x:float, y:float):
+        if now - self.last_dispatch_times[slot] < self.intervals[role]:
+            if role != ROLE_WASD or not self.wasd_on_change or self.change_detector is None:
+                return False
+            # The detector reads mapper state that config reloads rewrite
+            with self.config.config_lock:
+                if not self.change_detector(x, y):
+                    return False
+        self.last_dispatch_times[slot] = now
+        return True
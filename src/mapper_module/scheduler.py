@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import time
+import threading
+from .utils import SPIN_THRESHOLD, precise_sleep_until
+
+# Wheel geometry: 1ms ticks, 256 buckets (timers further out than one turn wait for their round)
+TIMER_RESOLUTION = 0.001
+TIMER_WHEEL_SLOTS = 256
+# Longest the service thread sleeps with nothing scheduled before re-checking `running`
+TIMER_IDLE_WAIT = 0.1
+# Event waits are only as fine as the OS timer (~15ms on Windows); closer deadlines use short sleeps
+TIMER_COARSE_WAIT = 0.02
+
+# Turbo zones: fastest repeat rate and the pressed share of each period
+MAX_REPEAT_HZ = 100.0
+REPEAT_DUTY = 0.5
+
+
+class Timer:
+    __slots__ = ('deadline', 'tick', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline:float, tick:int, callback, args:tuple):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel shared by the timed key output features (gestures, turbo, macros).
+
+    Timers are filed by deadline tick; advance(now) fires everything due, in deadline order,
+    outside the wheel lock (callbacks may schedule or cancel timers). start() services the
+    wheel from its own thread, so callers such as TouchReader.handle_sync never sleep or poll.
+    The clock is injectable: with a virtual clock, call advance() directly instead of start().
+    """
+    def __init__(self, clock=time.perf_counter, resolution:float=TIMER_RESOLUTION, slots:int=TIMER_WHEEL_SLOTS):
+        self.clock = clock
+        self.resolution = resolution
+        self.slots = slots
+        self.buckets = [[] for _ in range(slots)]
+        self.current_tick = int(clock() / resolution)
+        self.pending = 0
+        self.earliest = None
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    # Scheduling
+
+    def schedule_at(self, deadline:float, callback, *args):
+        tick = int(deadline / self.resolution)
+        timer = Timer(deadline, tick, callback, args)
+        with self.lock:
+            # Overdue timers go in the current bucket and fire on the next advance
+            self.buckets[max(tick, self.current_tick) % self.slots].append(timer)
+            self.pending += 1
+            if self.earliest is None or deadline < self.earliest:
+                self.earliest = deadline
+                self.wakeup.set()
+        return timer
+
+    def schedule(self, delay:float, callback, *args):
+        return self.schedule_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, timer:Timer|None):
+        """Cancelled timers are skipped when due (cheaper than unlinking them)."""
+        if timer is not None:
+            timer.cancelled = True
+
+    def next_deadline(self):
+        with self.lock:
+            return self.earliest
+
+    # Servicing
+
+    def advance(self, now:float):
+        """Fires every timer due at `now`; returns how many ran."""
+        target = int(now / self.resolution)
+        due = []
+        with self.lock:
+            if self.pending == 0:
+                self.current_tick = max(self.current_tick, target)
+                return 0
+
+            # Whole ticks before the target are due entirely; the target tick only up to `now`
+            for tick in range(self.current_tick, self.current_tick + min(target - self.current_tick + 1, self.slots)):
+                bucket = self.buckets[tick % self.slots]
+                if not bucket:
+                    continue
+                keep = []
+                for timer in bucket:
+                    if timer.cancelled:
+                        self.pending -= 1
+                    elif timer.deadline <= now:
+                        due.append(timer)
+                        self.pending -= 1
+                    else:
+                        keep.append(timer)
+                self.buckets[tick % self.slots] = keep
+
+            self.current_tick = max(self.current_tick, target)
+            self.earliest = self.find_earliest()
+
+        due.sort(key=lambda timer: timer.deadline)
+        fired = 0
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"[Scheduler] Timer callback failed: {e}")
+            fired += 1
+        return fired
+
+    def find_earliest(self):
+        """Earliest live deadline (caller holds the lock)."""
+        if self.pending == 0:
+            return None
+        earliest = None
+        for bucket in self.buckets:
+            for timer in bucket:
+                if not timer.cancelled and (earliest is None or timer.deadline < earliest):
+                    earliest = timer.deadline
+        return earliest
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.service, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def service(self):
+        while self.running:
+            deadline = self.next_deadline()
+            if deadline is None:
+                self.wakeup.wait(TIMER_IDLE_WAIT)
+                self.wakeup.clear()
+                continue
+
+            # Long waits can be cut short by a new earlier timer; close ones re-check every tick, then spin
+            remaining = deadline - self.clock()
+            if remaining > TIMER_COARSE_WAIT:
+                self.wakeup.wait(remaining - TIMER_COARSE_WAIT)
+                self.wakeup.clear()
+                continue
+            if remaining > SPIN_THRESHOLD:
+                time.sleep(self.resolution)
+                continue
+
+            precise_sleep_until(deadline)
+            self.advance(self.clock())
+
+
+class Repeater:
+    __slots__ = ('press', 'release', 'period', 'high', 'start', 'count', 'down', 'active', 'timer')
+
+    def __init__(self, press, release, period:float, high:float, start:float):
+        self.press = press
+        self.release = release
+        self.period = period
+        self.high = high
+        self.start = start
+        self.count = 0
+        self.down = False
+        self.active = True
+        self.timer = None
+
+
+class RepeatScheduler:
+    """
+    Turbo output on the timer wheel: each Repeater presses at start + n * period and releases
+    `duty` of a period later. Deadlines are phase-locked to the start, so wake-up lateness never
+    accumulates; pulses missed under load are skipped rather than sent as a burst.
+
+    `lock` is the owner's state lock: start/stop/stop_all are called with it held, and the
+    wheel callbacks take it, so press/release always run under it and never after a stop.
+    """
+    def __init__(self, wheel:TimerWheel, lock:threading.Lock, max_hz:float=MAX_REPEAT_HZ, duty:float=REPEAT_DUTY):
+        self.wheel = wheel
+        self.lock = lock
+        self.max_hz = max_hz
+        self.duty = duty
+        self.repeaters = set()
+
+    def start(self, press, release, hz:float):
+        period = 1.0 / min(hz, self.max_hz)
+        repeater = Repeater(press, release, period, period * self.duty, self.wheel.clock())
+        self.repeaters.add(repeater)
+        # First pulse right away, on the caller's thread
+        repeater.press()
+        repeater.down = True
+        repeater.timer = self.wheel.schedule_at(repeater.start + repeater.high, self.on_edge, repeater)
+        return repeater
+
+    def stop(self, repeater:Repeater):
+        if not repeater.active:
+            return
+        repeater.active = False
+        self.wheel.cancel(repeater.timer)
+        self.repeaters.discard(repeater)
+        if repeater.down:
+            repeater.down = False
+            repeater.release()
+
+    def stop_all(self):
+        for repeater in list(self.repeaters):
+            self.stop(repeater)
+
+    def on_edge(self, repeater:Repeater):
+        with self.lock:
+            if not repeater.active:
+                return
+            if repeater.down:
+                repeater.release()
+                repeater.down = False
+                repeater.count += 1
+                # Skip whole periods that are already over instead of bursting to catch up
+                behind = int((self.wheel.clock() - repeater.start) / repeater.period)
+                if behind > repeater.count:
+                    repeater.count = behind
+                deadline = repeater.start + repeater.count * repeater.period
+            else:
+                repeater.press()
+                repeater.down = True
+                deadline = repeater.start + repeater.count * repeater.period + repeater.high
+            repeater.timer = self.wheel.schedule_at(deadline, self.on_edge, repeater)
+
+
+class MacroRun:
+    __slots__ = ('steps', 'next_step', 'start', 'held', 'active', 'timer')
+
+    def __init__(self, steps:tuple, start:float):
+        self.steps = steps
+        self.next_step = 0
+        self.start = start
+        # Keys this run pressed and hasn't released yet: { scancode: release }
+        self.held = {}
+        self.active = True
+        self.timer = None
+
+
+class MacroSequencer:
+    """
+    Runs macro scripts on the timer wheel. A script is a tuple of (offset_s, scancode, down,
+    press, release) steps with offsets from the start, so every step lands on its own deadline
+    however late earlier wake-ups were. Any number of runs share the wheel thread; starting one
+    never blocks the caller, and cancel() drops the remaining steps and releases held keys.
+
+    `lock` is the owner's state lock, as for RepeatScheduler; keys are sent through the owner's
+    press_key(scancode, press) / release_key(scancode, release) so they share its key bookkeeping.
+    """
+    def __init__(self, wheel:TimerWheel, lock:threading.Lock, press_key, release_key):
+        self.wheel = wheel
+        self.lock = lock
+        self.press_key = press_key
+        self.release_key = release_key
+        self.runs = set()
+
+    def start(self, steps:tuple):
+        run = MacroRun(steps, self.wheel.clock())
+        self.runs.add(run)
+        self.run_due(run)
+        return run
+
+    def cancel(self, run:MacroRun):
+        if not run.active:
+            return
+        run.active = False
+        self.wheel.cancel(run.timer)
+        self.runs.discard(run)
+        for scancode, release in run.held.items():
+            self.release_key(scancode, release)
+        run.held.clear()
+
+    def cancel_all(self):
+        for run in list(self.runs):
+            self.cancel(run)
+
+    def on_step(self, run:MacroRun):
+        with self.lock:
+            if run.active:
+                self.run_due(run)
+
+    def run_due(self, run:MacroRun):
+        """Plays every step that is due, then waits for the next one (lock held)."""
+        now = self.wheel.clock()
+        steps = run.steps
+        # Compared as deadlines (not elapsed time), so a step fired at exactly its deadline always counts as due
+        while run.next_step < len(steps) and run.start + steps[run.next_step][0] <= now:
+            _, scancode, down, press, release = steps[run.next_step]
+            run.next_step += 1
+            if down and scancode not in run.held:
+                run.held[scancode] = release
+                self.press_key(scancode, press)
+            elif not down and scancode in run.held:
+                self.release_key(scancode, run.held.pop(scancode))
+
+        if run.next_step < len(steps):
+            run.timer = self.wheel.schedule_at(run.start + steps[run.next_step][0], self.on_step, run)
+        else:
+            # Finished: keys still down stay held until the finger lifts
+            run.timer = None
+
+
+class DutyModulator:
+    """
+    Fixed-frequency pulse-width modulation of a few on/off channels on the timer wheel.
+    Channel i is on for the first duties[i] of every period (0 = off, 1 = held), and
+    output(mask) is called with the bitmask of channels that are on whenever it changes.
+    Period starts are phase-locked to the first set(); periods missed under load are skipped.
+    With no channel between 0 and 1 nothing is scheduled and the mask just holds.
+
+    `lock` is the owner's state lock, as for RepeatScheduler: set/stop are called with it
+    held and the wheel callback takes it, so output always runs under it.
+    """
+    def __init__(self, wheel:TimerWheel, lock:threading.Lock, output, max_hz:float=MAX_REPEAT_HZ):
+        self.wheel = wheel
+        self.lock = lock
+        self.output = output
+        self.max_hz = max_hz
+        self.period = 1.0 / max_hz
+        self.duties = ()
+        self.mask = 0
+        self.start = 0.0
+        self.count = 0
+        self.running = False
+        self.timer = None
+        self.next_edge = None
+        # Bumped on every reschedule, so only the latest timer acts
+        self.token = 0
+
+    def set(self, duties:tuple, hz:float):
+        period = 1.0 / min(max(hz, 1e-3), self.max_hz)
+        if not self.running or period != self.period:
+            self.period = period
+            self.start = self.wheel.clock()
+            self.count = 0
+            self.running = True
+        self.duties = duties
+        self.update()
+
+    def stop(self):
+        """Cancels the modulation; the caller releases whatever the last mask held."""
+        self.wheel.cancel(self.timer)
+        self.timer = None
+        self.next_edge = None
+        self.token += 1
+        self.running = False
+        self.duties = ()
+        self.mask = 0
+
+    def on_edge(self, token:int):
+        with self.lock:
+            if token == self.token and self.running:
+                self.next_edge = None
+                self.update()
+
+    def update(self):
+        """Applies the mask of the current phase and waits for the next edge (lock held)."""
+        now = self.wheel.clock()
+        period = self.period
+        # Compared as deadlines, so an edge fired exactly on time always moves to the next period
+        if self.start + (self.count + 1) * period <= now:
+            self.count = max(self.count + 1, int((now - self.start) / period))
+        period_start = self.start + self.count * period
+
+        mask = 0
+        modulated = False
+        # Same expression as the check above, so the wake-up at this deadline always counts as the next period
+        next_edge = self.start + (self.count + 1) * period
+        for i, duty in enumerate(self.duties):
+            if duty >= 1.0:
+                mask |= 1 << i
+            elif duty > 0.0:
+                modulated = True
+                off = period_start + duty * period
+                if off > now:
+                    mask |= 1 << i
+                    if off < next_edge:
+                        next_edge = off
+
+        if not modulated:
+            next_edge = None
+            self.running = False
+        # Duty updates arrive with every touch sample; most leave the next edge where it was
+        if next_edge != self.next_edge:
+            self.wheel.cancel(self.timer)
+            self.token += 1
+            self.next_edge = next_edge
+            self.timer = None if next_edge is None else self.wheel.schedule_at(next_edge, self.on_edge, self.token)
+
+        if mask != self.mask:
+            self.mask = mask
+            self.output(mask)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from .utils import SPIN_THRESHOLD, SPIN_TICK_SHARE
+
+# Input interval smoothing for the spread window (EMA weight of each new gap)
+INTERVAL_EMA_ALPHA = 0.2
+# Gaps longer than this are treated as a new stroke, not as a slow sample rate
+INTERVAL_RESET_GAP = 0.1
+# Carries this close to a whole pixel are float error from splitting a delta, not a remainder
+CARRY_EPSILON = 1e-9
+
+
+class MotionShaper:
+    """
+    Re-times relative mouse deltas onto a fixed-rate output clock.
+
+    Every incoming delta is split evenly over the next `n` output ticks, where `n`
+    follows the measured input interval but never exceeds the latency budget, so no
+    motion is ever held back longer than the budget allows. Sub-pixel remainders
+    are carried between ticks, so the total emitted motion always matches the input.
+    """
+    def __init__(self, output_hz:float, latency_budget_ms:float):
+        self.configure(output_hz, latency_budget_ms)
+
+    def configure(self, output_hz:float, latency_budget_ms:float):
+        self.output_hz = float(output_hz)
+        self.tick_interval = 1.0 / self.output_hz
+        self.budget_ticks = max(1, int(round(latency_budget_ms / 1000.0 * self.output_hz)))
+        # Spin part of the wait for a tick (see precise_sleep_until): short enough to block between ticks
+        self.spin = min(SPIN_THRESHOLD, self.tick_interval * SPIN_TICK_SHARE)
+
+        # Ring buffer of planned motion per upcoming tick (fixed size, no per-sample allocation)
+        self.plan_x = [0.0] * self.budget_ticks
+        self.plan_y = [0.0] * self.budget_ticks
+        self.head = 0
+        self.pending_ticks = 0
+
+        # Sub-pixel carry
+        self.acc_x = 0.0
+        self.acc_y = 0.0
+
+        # Input rate tracking (starts by assuming input arrives once per budget)
+        self.last_input = None
+        self.input_interval = self.budget_ticks * self.tick_interval
+
+    def push(self, dx:float, dy:float, now:float):
+        """Plans a new delta across the upcoming ticks."""
+        if self.last_input is not None:
+            gap = now - self.last_input
+            if gap < INTERVAL_RESET_GAP:
+                self.input_interval += (gap - self.input_interval) * INTERVAL_EMA_ALPHA
+        self.last_input = now
+
+        size = self.budget_ticks
+        n = int(self.input_interval * self.output_hz + 0.5)
+        if n < 1: n = 1
+        elif n > size: n = size
+
+        step_x = dx / n
+        step_y = dy / n
+        plan_x = self.plan_x
+        plan_y = self.plan_y
+        i = self.head
+        for _ in range(n):
+            plan_x[i] += step_x
+            plan_y[i] += step_y
+            i += 1
+            if i == size: i = 0
+
+        if n > self.pending_ticks:
+            self.pending_ticks = n
+
+    def tick(self):
+        """Returns the whole-pixel motion due on this tick."""
+        i = self.head
+        calc_x = self.plan_x[i] + self.acc_x
+        calc_y = self.plan_y[i] + self.acc_y
+        self.plan_x[i] = 0.0
+        self.plan_y[i] = 0.0
+
+        i += 1
+        self.head = 0 if i == self.budget_ticks else i
+        if self.pending_ticks > 0:
+            self.pending_ticks -= 1
+
+        return self.emit(calc_x, calc_y)
+
+    def flush(self):
+        """Collapses all planned motion into one delta (used before buttons so clicks land in place)."""
+        calc_x = sum(self.plan_x) + self.acc_x
+        calc_y = sum(self.plan_y) + self.acc_y
+        for i in range(self.budget_ticks):
+            self.plan_x[i] = 0.0
+            self.plan_y[i] = 0.0
+        self.pending_ticks = 0
+
+        return self.emit(calc_x, calc_y)
+
+    def emit(self, calc_x:float, calc_y:float):
+        """Whole pixels of calc_x/calc_y, carrying the remainder (snapped, so n * (d / n) loses nothing)."""
+        out_x = round(calc_x)
+        if abs(calc_x - out_x) > CARRY_EPSILON:
+            out_x = int(calc_x)
+        out_y = round(calc_y)
+        if abs(calc_y - out_y) > CARRY_EPSILON:
+            out_y = int(calc_y)
+        self.acc_x = calc_x - out_x
+        self.acc_y = calc_y - out_y
+        return out_x, out_y
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import os
+import time
+import struct
+from abc import ABC, abstractmethod
+from .utils import (
+    MOUSE_MOVE_RELATIVE, MOUSE_MOVE_ABSOLUTE, MOUSE_VIRTUAL_DESKTOP,
+    LEFT_BUTTON_DOWN, LEFT_BUTTON_UP,
+    RIGHT_BUTTON_DOWN, RIGHT_BUTTON_UP,
+    MIDDLE_BUTTON_DOWN, MIDDLE_BUTTON_UP,
+    KEYBOARD_DEVICE,
+    SINK_INTERCEPTION, SINK_UINPUT, SINK_NULL, SINK_RECORDING
+)
+
+# Recording format: file magic, then fixed-size little-endian records
+# (perf_counter_ns, stroke kind, a, b)
+RECORDING_MAGIC = b"T2KSTRK1"
+RECORD = struct.Struct("<QBii")
+STROKE_KEY, STROKE_BUTTON, STROKE_MOVE_REL, STROKE_MOVE_ABS = 0, 1, 2, 3
+
+# Extended (E0) scancodes -> Linux input keycodes. Plain set-1 scancodes already equal their keycodes.
+LINUX_EXTENDED_KEYCODES = {
+    0xE047: 102, # HOME
+    0xE048: 103, # UP
+    0xE049: 104, # PAGEUP
+    0xE04B: 105, # LEFT
+    0xE04D: 106, # RIGHT
+    0xE04F: 107, # END
+    0xE050: 108, # DOWN
+    0xE051: 109, # PAGEDOWN
+    0xE052: 110, # INSERT
+    0xE053: 111, # DELETE
+    0xE01D: 97,  # RIGHTCTRL
+    0xE038: 100, # RIGHTALT
+    0xE01C: 96,  # KPENTER
+    0xE035: 98,  # KPSLASH
+}
+
+
+class OutputSink(ABC):
+    """
+    Injection backend used by the keyboard and mouse workers.
+    Each worker process opens its own instance; x/y of move_abs are in 0-65535 desktop units.
+    """
+    name = "base"
+
+    @abstractmethod
+    def key(self, code:int, state:int): ...
+    @abstractmethod
+    def button(self, flags:int): ...
+    @abstractmethod
+    def move_rel(self, dx:int, dy:int): ...
+    @abstractmethod
+    def move_abs(self, x:int, y:int): ...
+    def close(self): pass
+
+
+class InterceptionSink(OutputSink):
+    """Windows Interception driver (the default backend)."""
+    name = SINK_INTERCEPTION
+
+    def __init__(self, device:str):
+        from interception import Interception, KeyStroke, MouseStroke
+        self.KeyStroke = KeyStroke
+        self.MouseStroke = MouseStroke
+        self.ctx = Interception()
+        self.handle = self.ctx.keyboard if device == KEYBOARD_DEVICE else self.ctx.mouse
+
+    def key(self, code, state):
+        self.ctx.send(self.handle, self.KeyStroke(code, state))
+
+    def button(self, flags):
+        self.ctx.send(self.handle, self.MouseStroke(MOUSE_MOVE_RELATIVE, flags, 0, 0, 0))
+
+    def move_rel(self, dx, dy):
+        self.ctx.send(self.handle, self.MouseStroke(MOUSE_MOVE_RELATIVE, MOUSE_MOVE_RELATIVE, 0, dx, dy))
+
+    def move_abs(self, x, y):
+        self.ctx.send(self.handle, self.MouseStroke(MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP, MOUSE_MOVE_ABSOLUTE, 0, x, y))
+
+
+class UInputSink(OutputSink):
+    """Linux uinput virtual devices (requires the optional 'evdev' package and write access to /dev/uinput)."""
+    name = SINK_UINPUT
+
+    def __init__(self, device:str):
+        try:
+            from evdev import UInput, AbsInfo, ecodes
+        except ImportError as e:
+            raise RuntimeError("The uinput sink requires the 'evdev' package.") from e
+
+        self.ecodes = ecodes
+        self.abs_ui = None
+        if device == KEYBOARD_DEVICE:
+            keycodes = list(range(1, 0x59)) + list(LINUX_EXTENDED_KEYCODES.values())
+            self.ui = UInput({ecodes.EV_KEY: keycodes}, name="Touch2Key Keyboard")
+        else:
+            self.buttons = (
+                (LEFT_BUTTON_DOWN, LEFT_BUTTON_UP, ecodes.BTN_LEFT),
+                (RIGHT_BUTTON_DOWN, RIGHT_BUTTON_UP, ecodes.BTN_RIGHT),
+                (MIDDLE_BUTTON_DOWN, MIDDLE_BUTTON_UP, ecodes.BTN_MIDDLE),
+            )
+            self.ui = UInput({
+                ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE],
+                ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y],
+            }, name="Touch2Key Mouse")
+            # Absolute positioning needs its own pointer device
+            axis = AbsInfo(value=0, min=0, max=65535, fuzz=0, flat=0, resolution=0)
+            self.abs_ui = UInput({
+                ecodes.EV_KEY: [ecodes.BTN_LEFT],
+                ecodes.EV_ABS: [(ecodes.ABS_X, axis), (ecodes.ABS_Y, axis)],
+            }, name="Touch2Key Pointer")
+
+    def key(self, code, state):
+        keycode = LINUX_EXTENDED_KEYCODES.get(code, code)
+        self.ui.write(self.ecodes.EV_KEY, keycode, 0 if state else 1)
+        self.ui.syn()
+
+    def button(self, flags):
+        for down_flag, up_flag, btn in self.buttons:
+            if flags & down_flag:
+                self.ui.write(self.ecodes.EV_KEY, btn, 1)
+            elif flags & up_flag:
+                self.ui.write(self.ecodes.EV_KEY, btn, 0)
+        self.ui.syn()
+
+    def move_rel(self, dx, dy):
+        if dx: self.ui.write(self.ecodes.EV_REL, self.ecodes.REL_X, dx)
+        if dy: self.ui.write(self.ecodes.EV_REL, self.ecodes.REL_Y, dy)
+        self.ui.syn()
+
+    def move_abs(self, x, y):
+        self.abs_ui.write(self.ecodes.EV_ABS, self.ecodes.ABS_X, x)
+        self.abs_ui.write(self.ecodes.EV_ABS, self.ecodes.ABS_Y, y)
+        self.abs_ui.syn()
+
+    def close(self):
+        self.ui.close()
+        if self.abs_ui is not None:
+            self.abs_ui.close()
+
+
+class NullSink(OutputSink):
+    """Discards strokes (throughput tests); only counts them."""
+    name = SINK_NULL
+
+    def __init__(self, device:str):
+        self.count = 0
+
+    def key(self, code, state): self.count += 1
+    def button(self, flags): self.count += 1
+    def move_rel(self, dx, dy): self.count += 1
+    def move_abs(self, x, y): self.count += 1
+
+
+class RecordingSink(OutputSink):
+    """
+    Timestamps every stroke. With a path, records are appended to a compact binary file
+    (one file per worker); without one they are kept in memory as tuples.
+    Workers are stopped by terminate/kill, so every record is flushed as it is written, and a
+    restarted worker appends to the file instead of truncating it.
+    """
+    name = SINK_RECORDING
+
+    def __init__(self, device:str, path:str|None=None, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.records = []
+        self.file = None
+        if path:
+            root, ext = os.path.splitext(path)
+            self.path = f"{root}.{device}{ext or '.bin'}"
+            self.file = open(self.path, "ab")
+            if self.file.tell() == 0:
+                self.file.write(RECORDING_MAGIC)
+                self.file.flush()
+
+    def record(self, kind, a, b):
+        if self.file is not None:
+            self.file.write(RECORD.pack(self.clock(), kind, a, b))
+            self.file.flush()
+        else:
+            self.records.append((self.clock(), kind, a, b))
+
+    def key(self, code, state): self.record(STROKE_KEY, code, state)
+    def button(self, flags): self.record(STROKE_BUTTON, flags, 0)
+    def move_rel(self, dx, dy): self.record(STROKE_MOVE_REL, dx, dy)
+    def move_abs(self, x, y): self.record(STROKE_MOVE_ABS, x, y)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_recording(path:str):
+    """Returns the (t_ns, kind, a, b) records of a recording file."""
+    with open(path, "rb") as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise RuntimeError(f"'{path}' is not a stroke recording.")
+        return list(RECORD.iter_unpack(f.read()))
+
+
+SINKS = {
+    SINK_INTERCEPTION: InterceptionSink,
+    SINK_UINPUT: UInputSink,
+    SINK_NULL: NullSink,
+    SINK_RECORDING: RecordingSink,
+}
+
+def create_sink(sink_spec:tuple[str, dict], device:str) -> OutputSink:
+    name, options = sink_spec
+    if name not in SINKS:
+        raise RuntimeError(f"Unknown output sink '{name}'. Available: {', '.join(SINKS)}")
+    return SINKS[name](device, **options)
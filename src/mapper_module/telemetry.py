@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+
+# Latency histograms use log2 microsecond buckets: [0,1), [1,2), [2,4) ... the last one is open-ended (>= ~65ms)
+HIST_BUCKETS = 18
+# Each histogram slot is its buckets followed by count, total seconds and worst seconds
+HIST_SIZE = HIST_BUCKETS + 3
+
+# Queue counters per lane (enqueued by main, dequeued by the worker, high-water mark kept by main)
+K_ENQUEUED, K_DEQUEUED, K_DEPTH_HWM = 0, 1, 2
+M_ENQUEUED, M_DEQUEUED, M_DEPTH_HWM = 3, 4, 5
+B_ENQUEUED, B_DEQUEUED, B_DEPTH_HWM = 6, 7, 8
+MOVES_DROPPED = 9
+
+# Histograms (enqueue-to-send latency per stroke kind, and time spent inside the sink call)
+KEY_LATENCY = 10
+MOVE_LATENCY = KEY_LATENCY + HIST_SIZE
+BUTTON_LATENCY = MOVE_LATENCY + HIST_SIZE
+KEY_INJECT = BUTTON_LATENCY + HIST_SIZE
+MOUSE_INJECT = KEY_INJECT + HIST_SIZE
+TELEMETRY_SIZE = MOUSE_INJECT + HIST_SIZE
+
+
+class BridgeTelemetry:
+    """
+    Bridge counters in one shared RawArray. Every cell has a single writing process: the
+    workers own the *_DEQUEUED counters and their histograms, the main process owns the rest.
+    Several main-process threads write (touch reader, timer wheel, release_all, supervisor),
+    so the main-side writers take a process-local lock; worker writes need none. The main
+    process reads a snapshot with one slice copy.
+    """
+    def __init__(self):
+        self.values = multiprocessing.RawArray('d', TELEMETRY_SIZE)
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Workers get the shared values; the lock only orders threads of one process
+        return {'values': self.values}
+
+    def __setstate__(self, state):
+        self.values = state['values']
+        self.lock = threading.Lock()
+
+    # Writers (main process)
+
+    def enqueued(self, enq_index:int, n:int=1):
+        """Counts items put on a lane (enq_index is *_ENQUEUED; dequeued and HWM follow it)."""
+        values = self.values
+        with self.lock:
+            values[enq_index] += n
+            depth = values[enq_index] - values[enq_index + 1]
+            if depth > values[enq_index + 2]:
+                values[enq_index + 2] = depth
+
+    def abandoned(self, enq_index:int):
+        """Counts whatever is still on a lane that was replaced as dequeued (its depth drops to zero, worker gone)."""
+        values = self.values
+        with self.lock:
+            values[enq_index + 1] = values[enq_index]
+
+    def dropped_move(self):
+        with self.lock:
+            self.values[MOVES_DROPPED] += 1
+
+    def reset_high_water_marks(self):
+        with self.lock:
+            for enq_index in (K_ENQUEUED, M_ENQUEUED, B_ENQUEUED):
+                self.values[enq_index + 2] = self.values[enq_index] - self.values[enq_index + 1]
+
+    # Writers (workers)
+
+    def dequeued(self, enq_index:int, n:int=1):
+        self.values[enq_index + 1] += n
+
+    def observe(self, hist:int, seconds:float):
+        values = self.values
+        bucket = int(seconds * 1e6).bit_length() if seconds > 0 else 0
+        if bucket >= HIST_BUCKETS:
+            bucket = HIST_BUCKETS - 1
+        values[hist + bucket] += 1
+        values[hist + HIST_BUCKETS] += 1
+        values[hist + HIST_BUCKETS + 1] += seconds
+        if seconds > values[hist + HIST_BUCKETS + 2]:
+            values[hist + HIST_BUCKETS + 2] = seconds
+
+    # Readers (operate on snapshots so a report is self-consistent)
+
+    def snapshot(self):
+        return self.values[:]
+
+    @staticmethod
+    def diff(current:list, previous:list|None):
+        """Counter and histogram deltas between two snapshots (worst and HWM cells keep their current value)."""
+        if previous is None:
+            return list(current)
+        delta = [c - p for c, p in zip(current, previous)]
+        for enq_index in (K_ENQUEUED, M_ENQUEUED, B_ENQUEUED):
+            delta[enq_index + 2] = current[enq_index + 2]
+        for hist in (KEY_LATENCY, MOVE_LATENCY, BUTTON_LATENCY, KEY_INJECT, MOUSE_INJECT):
+            delta[hist + HIST_BUCKETS + 2] = current[hist + HIST_BUCKETS + 2]
+        return delta
+
+    @staticmethod
+    def depth(snapshot:list, enq_index:int):
+        return int(snapshot[enq_index] - snapshot[enq_index + 1])
+
+    @staticmethod
+    def count(snapshot:list, hist:int):
+        return int(snapshot[hist + HIST_BUCKETS])
+
+    @staticmethod
+    def mean_ms(snapshot:list, hist:int):
+        count = snapshot[hist + HIST_BUCKETS]
+        return snapshot[hist + HIST_BUCKETS + 1] / count * 1000 if count else 0.0
+
+    @staticmethod
+    def worst_ms(snapshot:list, hist:int):
+        return snapshot[hist + HIST_BUCKETS + 2] * 1000
+
+    @staticmethod
+    def percentile_ms(snapshot:list, hist:int, q:float):
+        """Upper bound (ms) of the bucket holding the q-th percentile."""
+        count = snapshot[hist + HIST_BUCKETS]
+        if not count:
+            return 0.0
+        target = count * q
+        seen = 0
+        for bucket in range(HIST_BUCKETS):
+            seen += snapshot[hist + bucket]
+            if seen >= target:
+                return (1 << bucket) / 1000
+        return (1 << (HIST_BUCKETS - 1)) / 1000
@@ -9,9 +9,10 @@ from .utils import (
     TouchEvent, ADB_EXE, DOWN, UP, PRESSED, IDLE,
     ROTATION_POLL_INTERVAL, SHORT_DELAY, LONG_DELAY,
     get_adb_device, is_device_online,
-    get_screen_size, maintain_bridge_health,
+    get_screen_size,
     wireless_connect
     )
+from .rates import RatePolicy, ROLE_MOUSE, ROLE_WASD, ROLE_KEYS
 
 if TYPE_CHECKING:
     from .config import AppConfig
@@ -49,19 +50,24 @@ class TouchReader():
         self.json_height = self.height
         self.scale_x = 1
         self.scale_y = 1
+        # Raw ABS -> layout affine; replaced whole (never mutated), so readers take it without rotation_lock
         self.matrix = (0, 0, 0, 0, 0, 0)
+        # Called (outside the locks) whenever the matrix changes
+        self.matrix_change_processor = None
+        # Kernel timestamp of the current sync frame (getevent -t; 0 until one is seen)
+        self.sample_t = 0.0
         
-        init_time = 0
-        self.update_config()
-
-        # PERFORMANCE TUNING
+        # PERFORMANCE TUNING: movement dispatch rate per finger role
         self.adb_rate_cap = rate_cap
-        self.move_interval = 1.0 / self.adb_rate_cap if self.adb_rate_cap > 0 else 0
-        self.last_dispatch_times = []
-        for _ in range(self.max_slots):
-            self.last_dispatch_times.append(init_time)
+        self.rate_policy = RatePolicy(config, rate_cap, self.max_slots)
+
+        self.update_config()
         
         self.touch_event_processor = None
+        # Called once per sync frame with every changed finger: [(action, TouchEvent), ...] (replaces touch_event_processor)
+        self.frame_processor = None
+        # Called once after every sync frame, when all of its slot events are processed
+        self.sync_end_processor = None
         
         self.mapper_event_dispatcher.register_callback("ON_CONFIG_RELOAD", self.update_config)
         self.mapper_event_dispatcher.register_callback("ON_MENU_MODE_TOGGLE", self.set_is_visible)
@@ -133,8 +139,7 @@ class TouchReader():
                         with self.config.config_lock:
                             self.device = None
                     else:
-                        with self.rotation_lock:
-                            self.update_matrix()
+                        self.refresh_matrix()
 
     def find_touch_device_event(self):
         try:
@@ -180,12 +185,13 @@ class TouchReader():
         
                 print(f"[INFO] Auto-Scaling Active: X={self.scale_x:.2f}, Y={self.scale_y:.2f}")
 
+                self.rate_policy.update_config(self.config)
+
             except Exception as e:
                 print(f"[ERROR] Config update failed: {e}")
                 return
             
-        with self.rotation_lock:
-            self.update_matrix()         
+        self.refresh_matrix()
 
     def update_rotation(self):
         patterns = [r"mCurrentRotation=(\d+)", r"rotation=(\d+)", r"mCurrentOrientation=(\d+)", r"mUserRotation=(\d+)"]
@@ -193,22 +199,28 @@ class TouchReader():
             if not self.device:
                 time.sleep(SHORT_DELAY)
                 continue
-                
-            # Restart failed child processes
-            with self.interception_bridge.bridge_lock:
-                maintain_bridge_health(self.interception_bridge)
+
             try:
                 result = subprocess.run([ADB_EXE, "-s", self.device, "shell", "dumpsys", "display"], capture_output=True, text=True, timeout=1)
                 for pat in patterns:
                     m = re.search(pat, result.stdout)
                     if m:
-                        with self.rotation_lock: 
-                            self.rotation = int(m.group(1)) % 4
-                            self.update_matrix()
+                        self.refresh_matrix(int(m.group(1)) % 4)
                         break
             except: pass
             time.sleep(self.rotation_poll_interval)
     
+    def refresh_matrix(self, rotation:int|None=None):
+        """Rebuilds the matrix (for a new rotation, if given) and reports a change."""
+        with self.rotation_lock:
+            previous = self.matrix
+            if rotation is not None:
+                self.rotation = rotation
+            self.update_matrix()
+            changed = self.matrix != previous
+        if changed and self.matrix_change_processor:
+            self.matrix_change_processor()
+
     def update_matrix(self):
         sx = 1/self.scale_x
         sy = 1/self.scale_y
@@ -229,8 +241,7 @@ class TouchReader():
             self.side_limit = h // 2
 
     def rotate_norm_coordinates(self, x, y):
-        with self.rotation_lock:
-            return self.rotate_norm_coordinates_local(x, y, self.matrix)    
+        return self.rotate_norm_coordinates_local(x, y, self.matrix)
 
     def rotate_norm_coordinates_local(self, x, y, matrix):
         if x is None or y is None:
@@ -304,13 +315,12 @@ class TouchReader():
                 continue
             
             else:
-                with self.rotation_lock:
-                    self.update_matrix()
+                self.refresh_matrix()
             
             self.touch_lost = False
 
             self.process = subprocess.Popen(
-                [ADB_EXE, "-s", self.device, "shell", "getevent", "-l", self.device_touch_event],
+                [ADB_EXE, "-s", self.device, "shell", "getevent", "-lt", self.device_touch_event],
                 stdout=subprocess.PIPE, text=True, bufsize=0 
             )
 
@@ -359,6 +369,10 @@ class TouchReader():
                     
 
                     elif "SYN_REPORT" == code:
+                        # "[  1234.567890] EV_SYN SYN_REPORT 00000000": kernel time of the frame
+                        end = line.find(']')
+                        if line[0] == '[' and end > 0:
+                            self.sample_t = float(line[1:end])
                         self.handle_sync()
                         
             except Exception as e:
@@ -375,9 +389,9 @@ class TouchReader():
 
     def handle_sync(self, lift_up=False):
         now = time.perf_counter()
+        sample_t = self.sample_t
         # Grab a local snapshot of the matrix once per sync
-        with self.rotation_lock:
-            matrix_snapshot = self.matrix
+        matrix_snapshot = self.matrix
 
         # Only update identities if a slot state changed from DOWN or UP
         needs_identity_update = any(s['state'] in [DOWN, UP] for s in self.slots.values())
@@ -385,25 +399,38 @@ class TouchReader():
             with self.finger_lock:
                 self.update_finger_identities()
                 
+        frame = [] if self.frame_processor else None
         for slot, data in list(self.slots.items()):
             if lift_up: data['state'] = UP
             if data['state'] == IDLE: continue
 
-            # Rate Limit for movement (PRESSED state) only
-            if data['state'] == PRESSED:
-                if (now - self.last_dispatch_times[slot]) < self.move_interval:
-                    continue
-                self.last_dispatch_times[slot] = now
-            
             rx, ry = self.rotate_norm_coordinates_local(data['x'], data['y'], matrix_snapshot)
             m_s = self.mouse_slot
             w_s = self.wasd_slot
+
+            # Rate Limit for movement (PRESSED state) only, by finger role
+            if data['state'] == PRESSED:
+                role = ROLE_MOUSE if slot == m_s else ROLE_WASD if slot == w_s else ROLE_KEYS
+                if not self.rate_policy.admit(slot, role, now, rx, ry):
+                    continue
             
             if data['state'] == UP:
                 m_s = self.last_mouse_slot
                 w_s = self.last_wasd_slot
 
-            if self.touch_event_processor:
+            if frame is not None:
+                frame.append((data['state'], TouchEvent(
+                    slot=slot,
+                    id=data['tid'],
+                    x=rx, y=ry,
+                    sx=data['start_x'], sy=data['start_y'],
+                    is_mouse=(slot == m_s),
+                    is_wasd=(slot == w_s),
+                    t=now,
+                    ts=sample_t,
+                    )))
+
+            elif self.touch_event_processor:
                 with self.config.config_lock:
                     try:
                         action = data['state']                   
@@ -414,6 +441,8 @@ class TouchReader():
                             sx=data['start_x'], sy=data['start_y'],
                             is_mouse=(slot == m_s), 
                             is_wasd=(slot == w_s),
+                            t=now,
+                            ts=sample_t,
                             )
                         self.touch_event_processor(action, touch_event) 
                     except: pass                     
@@ -423,6 +452,18 @@ class TouchReader():
             elif data['state'] == UP:
                 self.reset_slot(slot)
 
+        if frame:
+            with self.config.config_lock:
+                try:
+                    self.frame_processor(frame)
+                except: pass
+
+        if self.sync_end_processor:
+            with self.config.config_lock:
+                try:
+                    self.sync_end_processor()
+                except: pass
+
     def stop_process(self):
         with self.config.config_lock:
             self.device = None
@@ -448,3 +489,15 @@ class TouchReader():
     
     def bind_touch_event(self, touch_event_processor):
         self.touch_event_processor = touch_event_processor
+
+    def bind_frame_processor(self, frame_processor):
+        self.frame_processor = frame_processor
+
+    def bind_sync_end(self, sync_end_processor):
+        self.sync_end_processor = sync_end_processor
+
+    def bind_matrix_change(self, matrix_change_processor):
+        self.matrix_change_processor = matrix_change_processor
+
+    def bind_change_detector(self, change_detector):
+        self.rate_policy.bind_change_detector(change_detector)
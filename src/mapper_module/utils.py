@@ -10,8 +10,7 @@ import tomlkit
 import re
 import psutil
 import time
-import multiprocessing
-from datetime import datetime as _datetime
+import queue
 from typing import Literal
 import random
 from pathlib import Path
@@ -20,7 +19,7 @@ import colorsys
 if TYPE_CHECKING:
     from multiprocessing import Process
     from multiprocessing import Queue
-    from .bridge import InterceptionBridge
+    from .telemetry import BridgeTelemetry
 
 # Get location of this file: .../mapper_project/src/mapper_module
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -36,15 +35,17 @@ ADB_EXE = os.path.join(PROJECT_ROOT, "bin", "platform-tools", "adb.exe")
 TOML_PATH = os.path.join(PROJECT_ROOT, "settings.toml")
 IMAGES_FOLDER = os.path.join(SRC_DIR, "resources", "images")
 JSONS_FOLDER = os.path.join(SRC_DIR, "resources", "jsons")
+CACHE_FOLDER = os.path.join(PROJECT_ROOT, "cache")
 
 # Constants   
 
 DEF_DPI = 160
 
-DOWN = "DOWN"
-UP = "UP"
-PRESSED = "PRESSED"
-IDLE = "IDLE"
+# Touch slot states / actions (small ints: they index the compiled pipeline's handler table)
+IDLE = 0
+DOWN = 1
+UP = 2
+PRESSED = 3
 
 CIRCLE = "CIRCLE"
 RECT = "RECT"
@@ -64,6 +65,64 @@ ROTATION_POLL_INTERVAL = 0.5
 #  1ms (10,000 units of 100ns)
 NT_TIMER_RES = 10000
 
+# Final stretch of a precise wait that is spun instead of slept (OS timer granularity)
+SPIN_THRESHOLD = 0.002
+# Fixed-rate loops spin for at most this share of their tick, so they still block between ticks
+SPIN_TICK_SHARE = 0.25
+
+# Worker supervision (shared-memory heartbeats, seconds)
+HB_MAIN, HB_KEYBOARD, HB_MOUSE = 0, 1, 2
+HEARTBEAT_INTERVAL = 0.01       # Idle workers wake this often to beat
+HEARTBEAT_TIMEOUT = 0.08        # A worker silent for longer is treated as hung (twice the longest click dwell)
+SUPERVISOR_POLL_INTERVAL = 0.02
+WORKER_STARTUP_GRACE = 3.0      # Spawning a worker process is slow on Windows
+RESTART_BACKOFF = 0.5           # Wait before the first restart, doubled for each failed one
+RESTART_BACKOFF_MAX = 8.0
+RESTART_LIMIT = 5               # Failed restarts in a row before falling back to the null sink
+RESTART_STABLE_AFTER = 30.0     # A worker up this long resets its failure count
+MAIN_HEARTBEAT_TIMEOUT = 1.0    # Workers release everything and exit if main goes silent
+
+# Latest absolute cursor position, shared with the mouse worker (RawArray('d') fields).
+# Writers bump ABS_SEQ to odd before and back to even after an update; ABS_WAKE is set while a wake token is out.
+ABS_SEQ, ABS_X, ABS_Y, ABS_T, ABS_WAKE = 0, 1, 2, 3, 4
+ABS_SLOT_SIZE = 5
+
+# Mouse output shaper defaults (0 Hz = inject each coalesced delta immediately)
+DEFAULT_MOUSE_OUTPUT_HZ = 0
+DEFAULT_MOUSE_OUTPUT_LATENCY_MS = 8.0
+
+# One Euro smoothing of the mouse finger (cutoffs in Hz, beta per device px/s)
+DEFAULT_ONE_EURO = False
+# Menu mode: the cursor follows the finger absolutely instead of by relative (gameplay-scaled) moves
+DEFAULT_MENU_ABSOLUTE = True
+DEFAULT_ONE_EURO_MIN_CUTOFF = 1.0
+DEFAULT_ONE_EURO_BETA = 0.007
+DEFAULT_ONE_EURO_D_CUTOFF = 1.0
+
+# Mouse acceleration curve ([mouse] accel = none | power | classic | points), over finger speed in device px/s
+ACCEL_NONE = "none"
+ACCEL_POWER = "power"
+ACCEL_CLASSIC = "classic"
+ACCEL_POINTS = "points"
+DEFAULT_ACCEL = ACCEL_NONE
+DEFAULT_ACCEL_EXPONENT = 1.5
+DEFAULT_ACCEL_REF_SPEED = 1000.0
+DEFAULT_ACCEL_GAIN = 1.0
+DEFAULT_ACCEL_CAP = 4.0
+# Mouse finger prediction ([mouse] predict = off | cv | kalman); a 0ms horizon uses the measured sample interval
+PREDICT_OFF = "off"
+PREDICT_CV = "cv"
+PREDICT_KALMAN = "kalman"
+DEFAULT_PREDICT = PREDICT_OFF
+DEFAULT_PREDICT_HORIZON_MS = 20.0
+DEFAULT_PREDICT_MAX_LEAD_PX = 40.0
+DEFAULT_PREDICT_PROCESS_NOISE = 5.0e6     # Kalman: finger acceleration variance, (px/s^2)^2
+DEFAULT_PREDICT_MEASUREMENT_NOISE = 1.0   # Kalman: digitizer noise variance, px^2
+# Compiled curve: gain sampled at ACCEL_TABLE_SIZE log-spaced speeds, held flat outside the range
+ACCEL_TABLE_SIZE = 2048
+ACCEL_TABLE_MIN_SPEED = 1.0
+ACCEL_TABLE_MAX_SPEED = 100000.0  # Well past any finger, so the flat tail is never reached in practice
+
 # Fallback Performance Constants
 # Limits PRESSED events to 250 updates per second
 DEFAULT_ADB_RATE_CAP = 250
@@ -76,6 +135,41 @@ MOUSE_VIRTUAL_DESKTOP = 0x02
 LEFT_BUTTON_DOWN, LEFT_BUTTON_UP = 0x0001, 0x0002
 RIGHT_BUTTON_DOWN, RIGHT_BUTTON_UP = 0x0004, 0x0008
 MIDDLE_BUTTON_DOWN, MIDDLE_BUTTON_UP = 0x0010, 0x0020
+BUTTON_DOWN_MASK = LEFT_BUTTON_DOWN | RIGHT_BUTTON_DOWN | MIDDLE_BUTTON_DOWN
+BUTTON_UP_FLAGS = {
+    LEFT_BUTTON_DOWN: LEFT_BUTTON_UP,
+    RIGHT_BUTTON_DOWN: RIGHT_BUTTON_UP,
+    MIDDLE_BUTTON_DOWN: MIDDLE_BUTTON_UP,
+}
+
+# Output sinks (selected by [output] sink in settings.toml)
+SINK_INTERCEPTION = "interception"
+SINK_UINPUT = "uinput"
+SINK_NULL = "null"
+SINK_RECORDING = "recording"
+DEFAULT_SINK = SINK_INTERCEPTION
+# Workers record here when [output] recording_path is empty (one file per device, appended to)
+DEFAULT_RECORDING_PATH = os.path.join(CACHE_FOLDER, "recording.bin")
+KEYBOARD_DEVICE = "keyboard"
+MOUSE_DEVICE = "mouse"
+
+# Zone raster: one cell per N device pixels (0 = grid lookup only)
+DEFAULT_RASTER_DOWNSAMPLE = 4
+# Slide zones: a held finger must leave its zone by this many device pixels before it switches keys
+DEFAULT_SLIDE_HYSTERESIS_PX = 12.0
+
+# Movement dispatch per finger role ([rates]): 0 Hz = the ADB rate cap; the WASD finger
+# may also skip its cap whenever a sample would change the held keys
+DEFAULT_ROLE_RATE_HZ = 0.0
+DEFAULT_WASD_ON_CHANGE = True
+
+# Analog joystick: WASD pulse frequency when [joystick] analog is on
+DEFAULT_ANALOG_PWM_HZ = 20.0
+
+# Desktop size used when the platform can't report one
+DEFAULT_DESKTOP_SIZE = (1920, 1080)
+# Absolute pointer coordinates span 0..ABS_UNITS across the desktop
+ABS_UNITS = 65535
 
 DEF_EMULATOR_ID = 0
 EMULATORS = {
@@ -219,7 +313,7 @@ SCANCODES.update({
 
 
 class TouchEvent:
-    def __init__(self, slot:float, id:float, x:float, y:float, sx:float, sy:float, is_mouse:bool, is_wasd:bool):
+    def __init__(self, slot:float, id:float, x:float, y:float, sx:float, sy:float, is_mouse:bool, is_wasd:bool, t:float=0.0, ts:float=0.0):
         self.slot = slot
         self.id = id
         self.x = x
@@ -228,6 +322,11 @@ class TouchEvent:
         self.sy = sy
         self.is_mouse = is_mouse
         self.is_wasd = is_wasd
+        # perf_counter time of the sync frame that delivered the sample (0 when unknown)
+        self.t = t
+        # Device kernel time the sample was taken (getevent -t, seconds; 0 when unknown).
+        # Unlike t it isn't bunched up by ADB delivery, but it is on the device's clock.
+        self.ts = ts
         
     def show(self):
         return f"Slot: {self.slot}, ID: {self.id}, X: {self.x}, Y: {self.y}, SX: {self.sx}, SY: {self.sy}, isMouse: {self.is_mouse}, isWASD: {self.is_wasd}"
@@ -376,6 +475,12 @@ def wireless_connect(device:str|None=None, continous=True):
     
         error_2 = False
 
+def get_desktop_size():
+    """Primary screen size in pixels (falls back to DEFAULT_DESKTOP_SIZE off Windows)."""
+    if os.name == "nt":
+        return ctypes.windll.user32.GetSystemMetrics(0), ctypes.windll.user32.GetSystemMetrics(1)
+    return DEFAULT_DESKTOP_SIZE
+
 def set_dpi_awareness():
     try:
         ctypes.windll.shcore.SetProcessDpiAwareness(1) 
@@ -429,6 +534,24 @@ def create_default_toml():
     # [mouse] - Sensitivity settings
     mouse = tomlkit.table()
     mouse.add("sensitivity", 1.0)
+    mouse.add("output_hz", DEFAULT_MOUSE_OUTPUT_HZ)
+    mouse.add("output_latency_ms", DEFAULT_MOUSE_OUTPUT_LATENCY_MS)
+    mouse.add("menu_absolute", DEFAULT_MENU_ABSOLUTE)
+    mouse.add("one_euro", DEFAULT_ONE_EURO)
+    mouse.add("min_cutoff", DEFAULT_ONE_EURO_MIN_CUTOFF)
+    mouse.add("beta", DEFAULT_ONE_EURO_BETA)
+    mouse.add("d_cutoff", DEFAULT_ONE_EURO_D_CUTOFF)
+    mouse.add("accel", DEFAULT_ACCEL)
+    mouse.add("accel_exponent", DEFAULT_ACCEL_EXPONENT)
+    mouse.add("accel_ref_speed", DEFAULT_ACCEL_REF_SPEED)
+    mouse.add("accel_gain", DEFAULT_ACCEL_GAIN)
+    mouse.add("accel_cap", DEFAULT_ACCEL_CAP)
+    mouse.add("accel_points", [])
+    mouse.add("predict", DEFAULT_PREDICT)
+    mouse.add("predict_horizon_ms", DEFAULT_PREDICT_HORIZON_MS)
+    mouse.add("predict_max_lead_px", DEFAULT_PREDICT_MAX_LEAD_PX)
+    mouse.add("predict_process_noise", DEFAULT_PREDICT_PROCESS_NOISE)
+    mouse.add("predict_measurement_noise", DEFAULT_PREDICT_MEASUREMENT_NOISE)
     doc.add("mouse", mouse)
 
     # [joystick] - Movement and radius settings
@@ -437,8 +560,30 @@ def create_default_toml():
     joystick.add("hysteresis", 5.0)
     joystick.add("mouse_wheel_radius", 0.0)
     joystick.add("sprint_distance", 0.0)
+    joystick.add("analog", False)
+    joystick.add("pwm_hz", DEFAULT_ANALOG_PWM_HZ)
     doc.add("joystick", joystick)
 
+    # [rates] - Movement dispatch rate per finger role (0 = ADB rate cap)
+    rates = tomlkit.table()
+    rates.add("mouse_hz", DEFAULT_ROLE_RATE_HZ)
+    rates.add("wasd_hz", DEFAULT_ROLE_RATE_HZ)
+    rates.add("keys_hz", DEFAULT_ROLE_RATE_HZ)
+    rates.add("wasd_on_change", DEFAULT_WASD_ON_CHANGE)
+    doc.add("rates", rates)
+
+    # [zones] - Touch-down hit testing
+    zones = tomlkit.table()
+    zones.add("raster_downsample", DEFAULT_RASTER_DOWNSAMPLE)
+    zones.add("slide_hysteresis_px", DEFAULT_SLIDE_HYSTERESIS_PX)
+    doc.add("zones", zones)
+
+    # [output] - Injection backend
+    output = tomlkit.table()
+    output.add("sink", DEFAULT_SINK)
+    output.add("recording_path", "")
+    doc.add("output", output)
+
     try:
         # Opening with "w" automatically clears (truncates) the file before writing
         with open(TOML_PATH, "w", encoding="utf-8") as f:
@@ -514,7 +659,20 @@ def rotate_resolution(x, y, rotation):
 
     return res_x, res_y
 
-def set_high_priority(pid, label, priority_level=psutil.HIGH_PRIORITY_CLASS):
+def precise_sleep_until(deadline:float, spin:float=SPIN_THRESHOLD):
+    """
+    Sleeps until `deadline` (perf_counter seconds), spinning through the last `spin` seconds
+    the OS timer can't resolve. Loops with ticks shorter than SPIN_THRESHOLD pass a smaller
+    spin, or they would spin the whole tick (time.sleep uses a high-resolution waitable timer
+    on Windows with Python 3.11+, so the sleep part lands close).
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        time.sleep(0)
+
+def set_high_priority(pid, label, priority_level=getattr(psutil, "HIGH_PRIORITY_CLASS", -10)):
     try:
         p = psutil.Process(pid)
         p.nice(priority_level)
@@ -526,54 +684,109 @@ def set_high_priority(pid, label, priority_level=psutil.HIGH_PRIORITY_CLASS):
         
 
 # Worker: Keyboard (Isolated)
-def keyboard_worker(k_queue:Queue):
+def keyboard_worker(k_queue:Queue, heartbeats, telemetry:BridgeTelemetry, sink_spec:tuple[str, dict]=(DEFAULT_SINK, {})):
     """ Dedicated process for Keyboard events only. """
-    from interception import Interception, KeyStroke
-    k_ctx = Interception()
-    k_handle = k_ctx.keyboard
+    from .sinks import create_sink
+    from .telemetry import K_ENQUEUED, KEY_LATENCY, KEY_INJECT
+    _perf = time.perf_counter
+
+    sink = create_sink(sink_spec, KEYBOARD_DEVICE)
     # Keep track of keys we've pressed so we know what to release
     pressed_keys = set()
     running = True
     
     while running:
         try:
-            # 15.0 seconds timeout: If no heartbeat/input from Main, release everything
-            code, state = k_queue.get(timeout=15.0)
-
-            # state 0 = Down, 1 = Up (Interception standard)
-            if state == 0:
-                pressed_keys.add(code)
-            else:
-                pressed_keys.discard(code)
+            # Beat, then wait briefly so an idle worker keeps beating
+            now = _perf()
+            heartbeats[HB_KEYBOARD] = now
+            try:
+                item = k_queue.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                # Main went silent (crashed or hung): don't leave keys stuck down
+                if now - heartbeats[HB_MAIN] > MAIN_HEARTBEAT_TIMEOUT:
+                    raise RuntimeError("Main process heartbeat lost")
+                continue
+            telemetry.dequeued(K_ENQUEUED)
+
+            # Batches (e.g. release_all) arrive as a list of strokes
+            strokes = item if type(item) is list else (item,)
+            for code, state, t_enqueued in strokes:
+                # state 0 = Down, 1 = Up (Interception standard)
+                if state == 0:
+                    pressed_keys.add(code)
+                else:
+                    pressed_keys.discard(code)
             
-            k_ctx.send(k_handle, KeyStroke(code, state))
+                t_send = _perf()
+                sink.key(code, state)
+                t_sent = _perf()
+                telemetry.observe(KEY_INJECT, t_sent - t_send)
+                telemetry.observe(KEY_LATENCY, t_sent - t_enqueued)
   
-        except Exception:
-            # This triggers if k_queue.get(timeout=15.0) times out
+        except Exception as e:
             if pressed_keys:
-                print(f"[Watchdog] Keyboard worker timeout. Releasing {len(pressed_keys)} keys.")
+                print(f"[Watchdog] Keyboard worker stopping ({e}). Releasing {len(pressed_keys)} keys.")
                 for code in list(pressed_keys):
-                    k_ctx.send(k_handle, KeyStroke(code, 1))
+                    sink.key(code, 1)
                 pressed_keys.clear()
             running = False
+
+    sink.close()
                             
 
 # Worker: Mouse (Isolated with Coalescing)
-def mouse_worker(m_queue:Queue):
-    """ Dedicated process for Mouse events only. """
-    ctypes.windll.ntdll.NtSetTimerResolution(NT_TIMER_RES, 1, ctypes.byref(ctypes.c_ulong()))
+def mouse_worker(m_queue:Queue, b_queue:Queue, abs_slot, heartbeats, telemetry:BridgeTelemetry, shaper_settings:tuple[float, float]=(DEFAULT_MOUSE_OUTPUT_HZ, DEFAULT_MOUSE_OUTPUT_LATENCY_MS), sink_spec:tuple[str, dict]=(DEFAULT_SINK, {})):
+    """
+    Dedicated process for Mouse events only.
+    Buttons arrive on their own lane (b_queue) and are always served first; motion
+    stamped before a click is pulled forward and injected just ahead of it.
+    Absolute moves are not queued: "move_abs" items only wake the worker, which then
+    injects whatever position abs_slot holds by then (the newest, never a stale one).
+    """
+    if os.name == "nt":
+        ctypes.windll.ntdll.NtSetTimerResolution(NT_TIMER_RES, 1, ctypes.byref(ctypes.c_ulong()))
         
-    from interception import Interception, MouseStroke
+    from .sinks import create_sink
+    from .shaper import MotionShaper
+    from .telemetry import M_ENQUEUED, B_ENQUEUED, MOVE_LATENCY, BUTTON_LATENCY, MOUSE_INJECT
     import time
     import random
 
     _sleep = time.sleep
     _random = random.random
-
-    m_ctx = Interception()
-    m_handle = m_ctx.mouse
+    _perf = time.perf_counter
+
+    sink = create_sink(sink_spec, MOUSE_DEVICE)
+
+    def inject_rel(dx, dy, t_enqueued):
+        t_send = _perf()
+        sink.move_rel(dx, dy)
+        t_sent = _perf()
+        telemetry.observe(MOUSE_INJECT, t_sent - t_send)
+        telemetry.observe(MOVE_LATENCY, t_sent - t_enqueued)
+
+    def inject_abs(x, y, t_enqueued):
+        t_send = _perf()
+        sink.move_abs(x, y)
+        t_sent = _perf()
+        telemetry.observe(MOUSE_INJECT, t_sent - t_send)
+        telemetry.observe(MOVE_LATENCY, t_sent - t_enqueued)
+
+    def read_abs():
+        """Consistent (seq, x, y, t) of the abs slot; clears the wake flag first, so later writes wake us again."""
+        abs_slot[ABS_WAKE] = 0.0
+        while True:
+            seq = abs_slot[ABS_SEQ]
+            x, y, t = abs_slot[ABS_X], abs_slot[ABS_Y], abs_slot[ABS_T]
+            if not int(seq) & 1 and abs_slot[ABS_SEQ] == seq:
+                return seq, x, y, t
+
+    # Positions written before this worker started are stale
+    abs_seq = read_abs()[0]
     
     acc_dx, acc_dy = 0, 0
+    acc_t = 0.0 # Enqueue time of the oldest move in the accumulator
     pending_task = None
     
     left_down = False
@@ -584,34 +797,141 @@ def mouse_worker(m_queue:Queue):
     MAX_COALESCE = 20  # Limit move processing to prevent button lag
     MIN_DWELL = 0.025 
     DELTA_DWELL = 0.015
-    DOWN_TUPLE = (LEFT_BUTTON_DOWN, RIGHT_BUTTON_DOWN, MIDDLE_BUTTON_DOWN)
+
+    # Optional fixed-rate output clock
+    output_hz, latency_ms = shaper_settings
+    shaper = MotionShaper(output_hz, latency_ms) if output_hz > 0 else None
+    next_tick = 0.0
+    shaped_t = 0.0 # Enqueue time of the newest delta handed to the shaper
 
     while running:
         try:
-            # 15.0 seconds timeout: If no heartbeat/input from Main, release everything
-            if pending_task:
-                task, data = pending_task
-                pending_task = None
-            else:
-                task, data = m_queue.get(timeout=15.0)
+            heartbeats[HB_MOUSE] = _perf()
 
-            if task == "button":
-                m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_RELATIVE, data, 0, 0, 0))
+            # Priority lane: check for a button before touching any motion
+            try:
+                _, flags, t_button = b_queue.get_nowait()
+                telemetry.dequeued(B_ENQUEUED)
+            except queue.Empty:
+                flags = None
+
+            if flags is not None:
+                # Catch up on motion queued before the click, leave later motion queued
+                caught_up = []
+                if pending_task is not None and pending_task[2] <= t_button:
+                    caught_up.append(pending_task)
+                    pending_task = None
+                while pending_task is None:
+                    try:
+                        item = m_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    telemetry.dequeued(M_ENQUEUED)
+                    if item[2] > t_button:
+                        pending_task = item
+                    else:
+                        caught_up.append(item)
+
+                for task, data, t_enqueued in caught_up:
+                    if task == "move_rel":
+                        if acc_dx == 0 and acc_dy == 0:
+                            acc_t = t_enqueued
+                        acc_dx += data[0]
+                        acc_dy += data[1]
+                    elif task == "shaper":
+                        if shaper is not None:
+                            dx, dy = shaper.flush()
+                            acc_dx += dx
+                            acc_dy += dy
+                        shaper = MotionShaper(data[0], data[1]) if data[0] > 0 else None
+
+                # Planned and caught-up motion must land before the click
+                if shaper is not None and shaper.pending_ticks > 0:
+                    dx, dy = shaper.flush()
+                    if acc_dx == 0 and acc_dy == 0:
+                        acc_t = t_button
+                    acc_dx += dx
+                    acc_dy += dy
+                if acc_dx != 0 or acc_dy != 0:
+                    inject_rel(acc_dx, acc_dy, acc_t)
+                    acc_dx, acc_dy = 0, 0
+
+                # The cursor must be where the finger was when it clicked
+                if abs_slot[ABS_SEQ] != abs_seq:
+                    seq, x, y, t_abs = read_abs()
+                    if seq != abs_seq and t_abs <= t_button:
+                        abs_seq = seq
+                        inject_abs(int(x), int(y), t_abs)
+
+                t_send = _perf()
+                sink.button(flags)
+                t_sent = _perf()
+                telemetry.observe(MOUSE_INJECT, t_sent - t_send)
+                telemetry.observe(BUTTON_LATENCY, t_sent - t_button)
                 
-                if data == LEFT_BUTTON_DOWN: left_down = True
-                elif data == LEFT_BUTTON_UP: left_down = False
-                elif data == RIGHT_BUTTON_DOWN: right_down = True
-                elif data == RIGHT_BUTTON_UP: right_down = False
-                elif data == MIDDLE_BUTTON_DOWN: middle_down = True
-                elif data == MIDDLE_BUTTON_UP: middle_down = False
+                # Flags may be combined (batched releases)
+                if flags & LEFT_BUTTON_DOWN: left_down = True
+                elif flags & LEFT_BUTTON_UP: left_down = False
+                if flags & RIGHT_BUTTON_DOWN: right_down = True
+                elif flags & RIGHT_BUTTON_UP: right_down = False
+                if flags & MIDDLE_BUTTON_DOWN: middle_down = True
+                elif flags & MIDDLE_BUTTON_UP: middle_down = False
                 
                 # Check for "DOWN" mouse button events
-                if data in DOWN_TUPLE:
+                if flags & BUTTON_DOWN_MASK:
                      _sleep(MIN_DWELL + _random() * DELTA_DWELL)
                 else:
                     _sleep(0.005) # Tiny release gap
+                # The dwell is the longest the loop goes without beating
+                heartbeats[HB_MOUSE] = _perf()
+                continue
+
+            if pending_task:
+                task, data, t_enqueued = pending_task
+                pending_task = None
+            elif shaper is not None and shaper.pending_ticks > 0:
+                # Shaped output: emit the tick that is due, then poll without blocking
+                now = _perf()
+                if now >= next_tick:
+                    dx, dy = shaper.tick()
+                    if dx != 0 or dy != 0:
+                        inject_rel(dx, dy, shaped_t)
+                    next_tick += shaper.tick_interval
+                    # Never burst to catch up on missed ticks
+                    if now - next_tick > shaper.tick_interval:
+                        next_tick = now + shaper.tick_interval
+                    continue
+                try:
+                    task, data, t_enqueued = m_queue.get_nowait()
+                except queue.Empty:
+                    precise_sleep_until(next_tick, shaper.spin)
+                    continue
+                telemetry.dequeued(M_ENQUEUED)
+            elif abs_slot[ABS_SEQ] != abs_seq:
+                # A position whose wake token didn't fit in the queue (or was read early)
+                task, data, t_enqueued = "move_abs", None, 0.0
+            else:
+                # Wait briefly so an idle worker keeps beating (buttons post a wake token here)
+                try:
+                    task, data, t_enqueued = m_queue.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    # Main went silent (crashed or hung): don't leave buttons stuck down
+                    if _perf() - heartbeats[HB_MAIN] > MAIN_HEARTBEAT_TIMEOUT:
+                        raise RuntimeError("Main process heartbeat lost")
+                    continue
+                telemetry.dequeued(M_ENQUEUED)
+
+            if task == "move_rel" and shaper is not None:
+                # Hand the delta to the output clock, starting it if it was idle
+                now = _perf()
+                if shaper.pending_ticks == 0:
+                    next_tick = now
+                shaper.push(data[0], data[1], now)
+                shaped_t = t_enqueued
 
             elif task == "move_rel":
+                if acc_dx == 0 and acc_dy == 0:
+                    acc_t = t_enqueued
                 acc_dx += data[0]
                 acc_dy += data[1]
 
@@ -620,70 +940,54 @@ def mouse_worker(m_queue:Queue):
                 coalesce_count = 0
                 while not m_queue.empty() and coalesce_count < MAX_COALESCE:
                     try:
-                        next_task, next_data = m_queue.get_nowait()
-                        if next_task == "move_rel":
-                            acc_dx += next_data[0]
-                            acc_dy += next_data[1]
+                        next_item = m_queue.get_nowait()
+                        telemetry.dequeued(M_ENQUEUED)
+                        if next_item[0] == "move_rel":
+                            acc_dx += next_item[1][0]
+                            acc_dy += next_item[1][1]
                             coalesce_count += 1
                         else:
-                            pending_task = (next_task, next_data)
+                            pending_task = next_item
                             break 
                     except: 
                         break
 
                 if acc_dx != 0 or acc_dy != 0:
-                    m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_RELATIVE, MOUSE_MOVE_RELATIVE, 0, acc_dx, acc_dy))
+                    inject_rel(acc_dx, acc_dy, acc_t)
                     acc_dx, acc_dy = 0, 0
                 
                 _sleep(0.0005)
 
             elif task == "move_abs":
-                x, y = data
-                m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP, MOUSE_MOVE_ABSOLUTE, 0, x, y))
-                _sleep(0.001)
+                seq, x, y, t_abs = read_abs()
+                if seq != abs_seq:
+                    abs_seq = seq
+                    inject_abs(int(x), int(y), t_abs)
+
+            elif task == "shaper":
+                # Profile reload: drain the old clock, then switch output mode
+                if shaper is not None:
+                    dx, dy = shaper.flush()
+                    if dx != 0 or dy != 0:
+                        inject_rel(dx, dy, t_enqueued)
+                output_hz, latency_ms = data
+                shaper = MotionShaper(output_hz, latency_ms) if output_hz > 0 else None
 
-        except Exception: # Timeout
-            print("[Watchdog] Mouse worker timeout. Releasing buttons.")
+        except Exception as e:
+            print(f"[Watchdog] Mouse worker stopping ({e}). Releasing buttons.")
             if left_down:
-                m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_RELATIVE, LEFT_BUTTON_UP, 0, 0, 0))
+                sink.button(LEFT_BUTTON_UP)
                 left_down = False
             if right_down:
-                m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_RELATIVE, RIGHT_BUTTON_UP, 0, 0, 0))
+                sink.button(RIGHT_BUTTON_UP)
                 right_down = False
             if middle_down:
-                m_ctx.send(m_handle, MouseStroke(MOUSE_MOVE_RELATIVE, MIDDLE_BUTTON_UP, 0, 0, 0))
+                sink.button(MIDDLE_BUTTON_UP)
                 middle_down = False
             running = False
-            
-
-def maintain_bridge_health(bridge: InterceptionBridge):
-    # Check Keyboard Worker
-    if not bridge.k_proc.is_alive():
-        print(f"\n[CRITICAL] {_datetime.now().strftime('%H:%M:%S')} - Keyboard Worker Died!")
-        bridge.k_proc = multiprocessing.Process(target=keyboard_worker, name="Keyboard Worker", args=(bridge.k_queue,), daemon=True)
-        bridge.k_proc.start()
-        # Re-apply High Priority to the new PID
-        set_high_priority(bridge.k_proc.pid, "Revived Keyboard")
-        # Safety: Clear the queue to prevent a backlog of old 'stuck' keys firing at once
-        while not bridge.k_queue.empty():
-            try:
-                bridge.k_queue.get_nowait()
-            except: 
-                break
-
-    # Check Mouse Worker
-    if not bridge.m_proc.is_alive():
-        print(f"\n[CRITICAL] {_datetime.now().strftime('%H:%M:%S')} - Mouse Worker Died!")
-        bridge.m_proc = multiprocessing.Process(target=mouse_worker, name="Mouse Worker", args=(bridge.m_queue,), daemon=True)
-        bridge.m_proc.start()
-        set_high_priority(bridge.m_proc.pid, "Revived Mouse")
-        # Safety: Clear the queue to prevent a backlog of old 'stuck' mouse movements firing at once
-        while not bridge.m_queue.empty():
-            try: 
-                bridge.m_queue.get_nowait()
-            except: 
-                break
 
+    sink.close()
+            
 
 def stop_process(process:Process):
     if process.is_alive():
@@ -9,16 +9,104 @@ class State(IntFlag):
     S = 1 << 2
     D = 1 << 3
 
+# Keys held in each sector (0: Right, counting towards Down)
+SECTOR_STATES = (
+    State.D,                      # 0: Right
+    State.S | State.D,            # 1: Down-Right
+    State.S,                      # 2: Down
+    State.S | State.A,            # 3: Down-Left
+    State.A,                      # 4: Left
+    State.W | State.A,            # 5: Up-Left
+    State.W,                      # 6: Up
+    State.W | State.D             # 7: Up-Right
+)
+# Analog mode: the diagonal sector next to each cardinal one, by sign of the minor component
+# (cardinal sector: (diagonal when the minor component is positive, when it is negative))
+ADJACENT_DIAGONALS = {0: (1, 7), 2: (1, 3), 4: (3, 5), 6: (7, 5)}
+# DutyModulator channels of the analog joystick
+CHANNEL_DIAGONAL = 1 << 0
+CHANNEL_SPRINT = 1 << 1
+
+# Joystick states as small ints: 0 = idle, 1 + sector = walking, + SPRINT_OFFSET while sprinting
+WASD_STATES = 9
+SPRINT_OFFSET = WASD_STATES
 
 import math
+import threading
 from .utils import (
-    SCANCODES, UP, DOWN, PRESSED
+    SCANCODES, UP, DOWN, PRESSED, DEFAULT_ANALOG_PWM_HZ
 )
+from .scheduler import DutyModulator
 
 if TYPE_CHECKING:
     from .mapper import Mapper
     from .utils import TouchEvent
 
+# Octant edges sit at odd multiples of 22.5deg: |vy| < tan(22.5deg) * |vx| is within 22.5deg of the x axis
+TAN_PI_8 = math.tan(math.pi / 8)
+
+# Unit direction of each sector centre (screen y grows downwards, so sector 2 is Down)
+SQRT_HALF = math.sqrt(0.5)
+SECTOR_DIRECTIONS = (
+    (1.0, 0.0), (SQRT_HALF, SQRT_HALF), (0.0, 1.0), (-SQRT_HALF, SQRT_HALF),
+    (-1.0, 0.0), (-SQRT_HALF, -SQRT_HALF), (0.0, -1.0), (SQRT_HALF, -SQRT_HALF)
+)
+
+
+def octant(vx:float, vy:float):
+    """Sector 0-7 of a joystick vector (0 = Right, counting towards Down), from slope comparisons only."""
+    ax = vx if vx >= 0 else -vx
+    ay = vy if vy >= 0 else -vy
+    if ay < TAN_PI_8 * ax:
+        return 0 if vx >= 0 else 4
+    if ax < TAN_PI_8 * ay:
+        return 2 if vy > 0 else 6
+    if vx > 0:
+        return 1 if vy > 0 else 7
+    return 3 if vy > 0 else 5
+
+
+def sector_windows(hysteresis:float):
+    """
+    Per sector (ux, uy, px, py, sign) bounds of the widened sector, pi/8 + hysteresis either side of
+    its centre: a vector stays in it while vx*ux + vy*uy > sign * |vx*px + vy*py| (the vector's along
+    and across components, scaled by sin and cos of the half-width). Returns None when every
+    direction stays in the current sector.
+    """
+    half_width = math.pi / 8 + hysteresis
+    if half_width >= math.pi:
+        return None
+    if half_width <= 0:
+        return ((0.0, 0.0, 0.0, 0.0, 1.0),) * 8
+    s, c = math.sin(half_width), math.cos(half_width)
+    sign = 1.0 if c >= 0 else -1.0
+    return tuple((dx * s, dy * s, -dy * c, dx * c, sign) for dx, dy in SECTOR_DIRECTIONS)
+
+
+def build_transitions(keys:dict, sprint_code:int|None):
+    """
+    table[from][to] = tuple of (scancode, 0 = Down / 1 = Up) strokes moving between joystick states.
+    Releases go first, then the sprint change, then presses. There are no sprint states without a sprint key.
+    """
+    masks = (State.NONE,) + SECTOR_STATES
+    count = WASD_STATES * 2 if sprint_code is not None else WASD_STATES
+    directions = (State.W, State.A, State.S, State.D)
+    table = []
+    for current in range(count):
+        row = []
+        for target in range(count):
+            current_mask, target_mask = masks[current % WASD_STATES], masks[target % WASD_STATES]
+            current_sprint, target_sprint = current >= SPRINT_OFFSET, target >= SPRINT_OFFSET
+            strokes = [(keys[k], 1) for k in directions if current_mask & k and not target_mask & k]
+            if current_sprint and not target_sprint:
+                strokes.append((sprint_code, 1))
+            elif target_sprint and not current_sprint:
+                strokes.append((sprint_code, 0))
+            strokes += [(keys[k], 0) for k in directions if target_mask & k and not current_mask & k]
+            row.append(tuple(strokes))
+        table.append(tuple(row))
+    return tuple(table)
+
 
 class WASDMapper():
     def __init__(self, mapper:Mapper):
@@ -42,28 +130,22 @@ class WASDMapper():
         self.KEY_S = int(SCANCODES["s"], 16) if isinstance(SCANCODES["s"], str) else int(SCANCODES["s"])
         self.KEY_D = int(SCANCODES["d"], 16) if isinstance(SCANCODES["d"], str) else int(SCANCODES["d"])
 
-        self.sector_to_state = {
-            0: State.D,                      # 0: Right
-            1: State.S | State.D,            # 1: Down-Right
-            2: State.S,                      # 2: Down
-            3: State.S | State.A,            # 3: Down-Left
-            4: State.A,                      # 4: Left
-            5: State.W | State.A,            # 5: Up-Left
-            6: State.W,                      # 6: Up
-            7: State.W | State.D             # 7: Up-Right
-        }
-
-        self.state_value_to_key = {
-            1: self.KEY_W,
-            2: self.KEY_A,
-            4: self.KEY_S,
-            8: self.KEY_D       
-        }
-
-        self.PI_8 = math.pi / 8
-        self.INV_PI_4 = 1.0 / (math.pi / 4.0)
-        self.sprinting = False
-        self.current_mask = State.NONE
+        # Every state change as ready-made strokes, sent to the bridge as one batch
+        self.transitions = build_transitions(
+            {State.W: self.KEY_W, State.A: self.KEY_A, State.S: self.KEY_S, State.D: self.KEY_D},
+            self.sprint_key_code)
+
+        self.hysteresis = math.radians(5.0)
+        self.sector_windows = sector_windows(self.hysteresis)
+        self.state = 0
+        # Guards the key state: analog pulses change it from the timer wheel thread
+        self.state_lock = threading.Lock()
+
+        # Analog mode: hold the cardinal key, pulse the diagonal (and sprint) on the shared timer wheel
+        self.analog = False
+        self.pwm_hz = DEFAULT_ANALOG_PWM_HZ
+        self.analog_sectors = (0, 1)
+        self.modulator = DutyModulator(mapper.timer_wheel, self.state_lock, self.apply_channels)
         self.center_x = 0.0
         self.center_y = 0.0
         self.last_sector = None
@@ -93,6 +175,9 @@ class WASDMapper():
                 joystick_conf = self.config.config_data.get('joystick', {})
                 self.deadzone = joystick_conf.get('deadzone', 0.1)
                 self.hysteresis = math.radians(joystick_conf.get('hysteresis', 5.0))
+                self.sector_windows = sector_windows(self.hysteresis)
+                self.analog = bool(joystick_conf.get('analog', False))
+                self.pwm_hz = max(1.0, float(joystick_conf.get('pwm_hz', DEFAULT_ANALOG_PWM_HZ)))
                 
                 # Get Mouse Settings (Sensitivity)
                 # We reuse the mouse sensitivity here!
@@ -159,7 +244,7 @@ class WASDMapper():
         # Deadzone Check (Optimized)
         if dist_sq < self.deadzone_sq:
             # If we are inside deadzone, lift keys
-            if self.current_mask != State.NONE:
+            if self.state != 0:
                 self.touch_up()
             return
 
@@ -175,64 +260,120 @@ class WASDMapper():
             vx = touch_event.x - self.center_x
             vy = touch_event.y - self.center_y
             
-        # Angle Calculation
-        angle_rad = math.atan2(vy, vx)
-        if angle_rad < 0: angle_rad += 2 * math.pi  
-        new_sector = int((angle_rad + self.PI_8) * self.INV_PI_4) % 8
-                
-        # Hysteresis Logic     
-        if self.last_sector is not None:
-            current_sector_center = self.last_sector * (math.pi / 4)
-            angle_diff = (angle_rad - current_sector_center + math.pi) % (2 * math.pi) - math.pi
-            if abs(angle_diff) < (self.PI_8 + self.hysteresis):
-                new_sector = self.last_sector
+        if self.analog:
+            self.apply_analog(vx, vy, dist_sq)
+            return
 
+        new_sector = self.sector_of(vx, vy)
         self.last_sector = new_sector
 
         # Sprint Check
         # Uses the SENSITIVITY-SCALED threshold
-        sprint = False
+        target = new_sector + 1
         if self.sprint_key_code is not None:
             if dist_sq > self.effective_inner_sq:
-                sprint = True
+                target += SPRINT_OFFSET
+
+        with self.state_lock:
+            if self.modulator.running:
+                # Analog mode was switched off mid-stroke
+                self.modulator.stop()
+            self.apply_state(target)
 
-        self.apply_keys(new_sector, sprint)
+    def sector_of(self, vx:float, vy:float):
+        """Sector of a joystick vector. Hysteresis: the current sector holds while inside its widened window."""
+        if self.last_sector is not None:
+            windows = self.sector_windows
+            if windows is None:
+                return self.last_sector
+            ux, uy, px, py, sign = windows[self.last_sector]
+            across = vx * px + vy * py
+            if vx * ux + vy * uy > sign * (across if across >= 0 else -across):
+                return self.last_sector
+        return octant(vx, vy)
+
+    def would_change(self, x:float, y:float):
+        """
+        True when a joystick sample at (x, y) would change the held keys (sector, sprint, or
+        lifting in the deadzone), without applying it. TouchReader uses it to let such samples
+        past the WASD rate cap. In analog mode only the key pair counts; duty changes can wait.
+        """
+        if self.mapper.wasd_block > 0:
+            return self.state != 0
+        vx = x - self.center_x
+        vy = y - self.center_y
+        dist_sq = vx*vx + vy*vy
+        if dist_sq < self.deadzone_sq:
+            return self.state != 0
+
+        # The leash moves the centre along the vector, so the direction is the same either way
+        if self.analog:
+            if self.state == 0:
+                return True
+            cardinal, diagonal, _ = self.analog_axes(vx, vy)
+            return (cardinal, diagonal) != self.analog_sectors
+
+        target = self.sector_of(vx, vy) + 1
+        if self.sprint_key_code is not None and dist_sq > self.effective_inner_sq:
+            target += SPRINT_OFFSET
+        return target != self.state
+
+    @staticmethod
+    def analog_axes(vx:float, vy:float):
+        """(nearest cardinal sector, diagonal sector next to it, minor/major component ratio)."""
+        ax = vx if vx >= 0 else -vx
+        ay = vy if vy >= 0 else -vy
+        if ax >= ay:
+            cardinal = 0 if vx >= 0 else 4
+            # ax == 0 only at the exact centre (possible with a zero deadzone)
+            return cardinal, ADJACENT_DIAGONALS[cardinal][0 if vy > 0 else 1], ay / ax if ax else 0.0
+        cardinal = 2 if vy > 0 else 6
+        return cardinal, ADJACENT_DIAGONALS[cardinal][0 if vx > 0 else 1], ax / ay
+
+    def apply_analog(self, vx:float, vy:float, dist_sq:float):
+        """
+        Reproduces the exact stick angle: the nearest cardinal key is held and the diagonal next
+        to it is pulsed for the share of time that averages out to the angle, assuming the game
+        moves diagonals at full speed (not sqrt(2)). Between the sprint distance and the leash
+        the sprint key is pulsed in proportion to the deflection.
+        """
+        cardinal, diagonal, ratio = self.analog_axes(vx, vy)
+        # Average of (1 - d) * cardinal + d * diagonal (unit vectors) has slope `ratio`
+        diagonal_duty = ratio / (SQRT_HALF + ratio * (1.0 - SQRT_HALF))
+
+        sprint_duty = 0.0
+        if self.sprint_key_code is not None and dist_sq > self.effective_inner_sq:
+            inner = self.effective_inner_sq ** 0.5
+            ramp = self.raw_outer_radius - inner
+            sprint_duty = min(1.0, (dist_sq ** 0.5 - inner) / ramp) if ramp > 0 else 1.0
+
+        with self.state_lock:
+            self.analog_sectors = (cardinal, diagonal)
+            self.modulator.set((diagonal_duty, sprint_duty), self.pwm_hz)
+            # The sectors may have changed under an unchanged mask
+            self.apply_channels(self.modulator.mask)
+
+    def apply_channels(self, mask:int):
+        cardinal, diagonal = self.analog_sectors
+        target = (diagonal if mask & CHANNEL_DIAGONAL else cardinal) + 1
+        if mask & CHANNEL_SPRINT:
+            target += SPRINT_OFFSET
+        self.apply_state(target)
 
     def touch_up(self):        
-        for k in self.current_mask:
-            if k.value > 0:
-                self.interception_bridge.key_up(self.state_value_to_key[k.value])
-        if self.sprint_key_code is not None and self.sprinting:
-            self.interception_bridge.key_up(self.sprint_key_code)
-
-        self.sprinting = False
-        self.current_mask = State.NONE
+        with self.state_lock:
+            self.modulator.stop()
+            self.apply_state(0)
         self.center_x = 0.0
         self.center_y = 0.0
         self.last_sector = None
 
-    def apply_keys(self, sector, sprint):
-        target_mask = self.sector_to_state[sector]
-        to_release = self.current_mask & ~target_mask
-        to_press = target_mask & ~self.current_mask
-
-        for k in to_release: 
-            if k.value > 0:
-                self.interception_bridge.key_up(self.state_value_to_key[k.value])
-
-        if self.sprint_key_code is not None:
-            if self.sprinting and not sprint:
-                self.interception_bridge.key_up(self.sprint_key_code)
-                self.sprinting = False
-            elif not self.sprinting and sprint:
-                self.interception_bridge.key_down(self.sprint_key_code)
-                self.sprinting = True
-
-        for k in to_press:
-            if k.value > 0:
-                self.interception_bridge.key_down(self.state_value_to_key[k.value])
-
-        self.current_mask = target_mask
+    def apply_state(self, target:int):
+        """Moves to a joystick state (state_lock held)."""
+        if target != self.state:
+            strokes = self.transitions[self.state][target]
+            self.state = target
+            self.interception_bridge.send_keys(strokes)
 
     def process_touch(self, action, touch_event:TouchEvent, is_visible:bool):
         if action == PRESSED:
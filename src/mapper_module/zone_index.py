@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import os
+import json
+import math
+import numpy as np
+from .utils import CIRCLE, RECT, CACHE_FOLDER
+
+# Grid resolution bounds (cells per axis); the actual size follows the zone count
+MIN_GRID_CELLS = 4
+MAX_GRID_CELLS = 64
+
+# Bump when the raster layout changes so stale cache files are never loaded
+RASTER_VERSION = 2
+# Raster cells are widened by this much (normalized) before being classified,
+# so float rounding of a touch can never land it outside the cell it was classified for
+RASTER_EPSILON = 1e-9
+
+
+def zone_bounds(value:dict):
+    """Normalized (left, top, right, bottom) bounding box of a zone."""
+    if value['type'] == CIRCLE:
+        cx, cy, r = value['cx'], value['cy'], value['r']
+        return cx - r, cy - r, cx + r, cy + r
+    elif value['type'] == RECT:
+        return (min(value['x1'], value['x2']), min(value['y1'], value['y2']),
+                max(value['x1'], value['x2']), max(value['y1'], value['y2']))
+    return None
+
+
+class ZoneGrid:
+    """
+    Uniform grid over normalized layout space. Each cell lists (in layout order) the zones
+    whose bounding box overlaps it, so a touch only needs exact tests against a few candidates.
+    Touches and zones outside [0, 1] are clamped to the border cells.
+    """
+    def __init__(self, bounds:list[tuple[float, float, float, float]|None], cells:int|None=None):
+        if cells is None:
+            cells = int(math.sqrt(len(bounds)) * 2)
+        self.cells = max(MIN_GRID_CELLS, min(MAX_GRID_CELLS, cells))
+
+        grid = [[] for _ in range(self.cells * self.cells)]
+        for index, box in enumerate(bounds):
+            if box is None:
+                continue
+            left, top, right, bottom = box
+            col_0, col_1 = self.cell_of(left), self.cell_of(right)
+            row_0, row_1 = self.cell_of(top), self.cell_of(bottom)
+            for row in range(row_0, row_1 + 1):
+                for col in range(col_0, col_1 + 1):
+                    grid[row * self.cells + col].append(index)
+
+        self.grid = tuple(tuple(cell) for cell in grid)
+        # Same cells in ZoneRaster entry form: every candidate still needs its exact test
+        self.grid_entries = tuple(tuple((index, True) for index in cell) for cell in self.grid)
+
+    def cell_of(self, v:float):
+        i = int(v * self.cells)
+        if i < 0: return 0
+        if i >= self.cells: return self.cells - 1
+        return i
+
+    def candidates(self, nx:float, ny:float):
+        """Zone indices that may contain the normalized point."""
+        cells = self.cells
+        col = int(nx * cells)
+        row = int(ny * cells)
+        if col < 0: col = 0
+        elif col >= cells: col = cells - 1
+        if row < 0: row = 0
+        elif row >= cells: row = cells - 1
+        return self.grid[row * cells + col]
+
+    def entries(self, nx:float, ny:float):
+        """Candidates of the normalized point as (zone index, needs exact test) pairs."""
+        cells = self.cells
+        col = int(nx * cells)
+        row = int(ny * cells)
+        if col < 0: col = 0
+        elif col >= cells: col = cells - 1
+        if row < 0: row = 0
+        elif row >= cells: row = cells - 1
+        return self.grid_entries[row * cells + col]
+
+
+class ZoneRaster:
+    """
+    Zone lookup map at (downsampled) device resolution. Every cell holds an id into a table
+    of (zone index, needs exact test) tuples in layout order: zones covering the whole cell
+    are certain hits, zones crossing it are edge candidates that still get the analytic test,
+    so results match is_in_circle/is_in_rect exactly. Touches outside [0, 1) use the grid.
+    """
+    def __init__(self, ids:np.ndarray, table:tuple, grid:ZoneGrid):
+        self.ids = ids
+        self.table = table
+        self.grid = grid
+        self.rows, self.cols = ids.shape
+
+    def lookup(self, nx:float, ny:float):
+        if 0.0 <= nx < 1.0 and 0.0 <= ny < 1.0:
+            return self.table[self.ids.item(int(ny * self.rows), int(nx * self.cols))]
+        return self.grid.entries(nx, ny)
+
+
+def raster_shape(width:int, height:int, downsample:int):
+    """(rows, cols) of a raster over a width x height layout."""
+    return max(1, math.ceil(height / downsample)), max(1, math.ceil(width / downsample))
+
+
+def build_raster(values:list[dict], rows:int, cols:int):
+    """Classifies every cell against every zone; returns (ids, table)."""
+    ids = np.zeros((rows, cols), dtype=np.uint32)
+    table = [()]
+    interned = {(): 0}
+
+    xs = np.arange(cols + 1) / cols
+    ys = np.arange(rows + 1) / rows
+
+    for index, value in enumerate(values):
+        box = zone_bounds(value)
+        if box is None:
+            continue
+        left, top, right, bottom = box
+        if right < 0.0 or bottom < 0.0 or left >= 1.0 or top >= 1.0:
+            continue
+
+        # Cells around the bounding box (one extra on each side absorbs rounding)
+        c0 = max(0, int(left * cols) - 1)
+        c1 = min(cols - 1, int(right * cols) + 1)
+        r0 = max(0, int(top * rows) - 1)
+        r1 = min(rows - 1, int(bottom * rows) + 1)
+
+        cell_l = xs[c0:c1 + 1][np.newaxis, :] - RASTER_EPSILON
+        cell_r = xs[c0 + 1:c1 + 2][np.newaxis, :] + RASTER_EPSILON
+        cell_t = ys[r0:r1 + 1][:, np.newaxis] - RASTER_EPSILON
+        cell_b = ys[r0 + 1:r1 + 2][:, np.newaxis] + RASTER_EPSILON
+
+        if value['type'] == CIRCLE:
+            cx, cy, r = value['cx'], value['cy'], value['r']
+            near_x = np.clip(cx, cell_l, cell_r) - cx
+            near_y = np.clip(cy, cell_t, cell_b) - cy
+            far_x = np.maximum(np.abs(cell_l - cx), np.abs(cell_r - cx))
+            far_y = np.maximum(np.abs(cell_t - cy), np.abs(cell_b - cy))
+            overlap = near_x**2 + near_y**2 <= r*r
+            inside = far_x**2 + far_y**2 <= r*r
+        else:
+            # is_in_rect takes the corners as given (x1 <= x2, y1 <= y2 for a hit)
+            x1, x2, y1, y2 = value['x1'], value['x2'], value['y1'], value['y2']
+            overlap = (cell_r >= x1) & (cell_l <= x2) & (cell_b >= y1) & (cell_t <= y2)
+            inside = (cell_l >= x1) & (cell_r <= x2) & (cell_t >= y1) & (cell_b <= y2)
+
+        # 0 = untouched, 1 = edge, 2 = covered; each (old entry, code) pair maps to one new entry
+        code = overlap.astype(np.int64) + (inside & overlap)
+        block = ids[r0:r1 + 1, c0:c1 + 1]
+        keys, inverse = np.unique(block.astype(np.int64) * 3 + code, return_inverse=True)
+        remap = np.empty(len(keys), dtype=np.uint32)
+        for j, key in enumerate(keys.tolist()):
+            old, c = divmod(key, 3)
+            entry = table[old] if c == 0 else table[old] + ((index, c == 1),)
+            if entry not in interned:
+                interned[entry] = len(table)
+                table.append(entry)
+            remap[j] = interned[entry]
+        ids[r0:r1 + 1, c0:c1 + 1] = remap[inverse.reshape(block.shape)]
+
+    if len(table) <= np.iinfo(np.uint16).max:
+        ids = ids.astype(np.uint16)
+    return ids, tuple(table)
+
+
+def load_zone_raster(values:list[dict], grid:ZoneGrid, digest:str|None, width:int, height:int, downsample:int):
+    """
+    Returns the ZoneRaster of a layout, memory-mapping it from the cache when this exact
+    layout file (digest) was rasterized at this resolution before, building and caching it otherwise.
+    """
+    rows, cols = raster_shape(width, height, downsample)
+    base = None
+    if digest:
+        base = os.path.join(CACHE_FOLDER, f"zones_v{RASTER_VERSION}_{digest}_{cols}x{rows}")
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                table = tuple(tuple((index, needs_test) for index, needs_test in entry) for entry in json.load(f))
+            ids = np.load(base + ".npy", mmap_mode='r')
+            if ids.shape == (rows, cols):
+                print(f"[Layout] Zone raster {cols}x{rows} mapped from cache.")
+                return ZoneRaster(ids, table, grid)
+        except (OSError, ValueError):
+            pass
+
+    ids, table = build_raster(values, rows, cols)
+    print(f"[Layout] Zone raster {cols}x{rows} built ({len(table)} overlap lists).")
+
+    if base is not None:
+        try:
+            os.makedirs(CACHE_FOLDER, exist_ok=True)
+            # Table first, raster last: a raster file only exists next to a complete table
+            with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(table, f)
+            os.replace(base + ".json.tmp", base + ".json")
+            with open(base + ".npy.tmp", "wb") as f:
+                np.save(f, ids)
+            os.replace(base + ".npy.tmp", base + ".npy")
+        except OSError as e:
+            print(f"[Warning] Could not cache zone raster: {e}")
+
+    return ZoneRaster(ids, table, grid)